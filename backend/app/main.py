@@ -2,7 +2,11 @@ from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from . import api, models, database
+from .services import artifact_store, lazy_imports, metadata_cache, reference_data
+from .services.shared_state import get_shared_state
+from .services.workers import run_in_background
 from .routers import auth, identifiers, datasources, rdf, graphdb
+import asyncio
 import logging
 import time
 
@@ -13,6 +17,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Source versions and bundled resource tables are cached instead of fetched on every mapping
+metadata_cache.install()
+
 app = FastAPI(title="BioDataFuse API")
 
 # Request logging middleware
@@ -94,4 +101,13 @@ async def startup_event():
     async with database.engine.begin() as conn:
         await conn.run_sync(models.Base.metadata.create_all)
     logger.info("Database tables created")
+    # Opening the shared state fails fast on a misconfigured backend, and drops values that expired while we were down
+    get_shared_state().sweep()
+    # Retention, unreferenced files and quotas of generated artifacts
+    run_in_background(artifact_store.run_sweeper(database.AsyncSessionLocal), "Artifact sweeper")
+    # Convert file-based reference datasets in the background, requests that need them before it finishes wait on it
+    asyncio.get_running_loop().run_in_executor(None, reference_data.prewarm)
+    # Annotators, rdflib, matplotlib etc. are imported on first use, load them now without delaying startup
+    if lazy_imports.PREWARM_IMPORTS:
+        asyncio.get_running_loop().run_in_executor(None, lazy_imports.prewarm)
 
@@ -1,15 +1,19 @@
 from pathlib import Path
+from typing import List
 from sqlalchemy import select
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from ..database import get_db
 from ..services.analysis_service import AnalysisService
+from ..services.network_analysis_service import AVAILABLE_METRICS, NetworkAnalysisService
 from ..models import Annotation
+from ..services.lazy_imports import lazy_import
 from .auth import get_current_user
-import matplotlib.pyplot as plt
 import io
 import base64
 
+plt = lazy_import("matplotlib.pyplot")
+
 router = APIRouter(prefix="/visualize&analysis", tags=["Analysis"])
 
 def fig_to_base64(fig):
@@ -96,3 +100,46 @@ async def get_edge_counts(
             return {"image": fig_to_base64(fig)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/metrics/{set_id}")
+async def get_network_metrics(
+    set_id: int,
+    metrics: List[str] = Query(["degree"]),
+    include_ids: bool = True,
+    db: AsyncSession = Depends(get_db),
+    # current_user=Depends(get_current_user)
+    ):
+    """
+    Network metrics computed on the server for the latest annotation of an identifier set.
+    Only the requested metric arrays are returned, aligned with `node_ids`.
+    """
+    unknown = [metric for metric in metrics if metric not in AVAILABLE_METRICS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown metrics: {', '.join(unknown)}. Available: {', '.join(AVAILABLE_METRICS)}"
+        )
+
+    try:
+        result = await db.execute(
+            select(Annotation)
+            .where(Annotation.identifier_set_id == set_id)
+            .order_by(Annotation.id.desc())
+        )
+        annotation = result.scalars().first()
+
+        if not annotation or not annotation.combined_df:
+            raise HTTPException(status_code=404, detail="Processed annotation not found.")
+
+        network_analysis_service = NetworkAnalysisService(db)
+        data, error = await network_analysis_service.get_metrics(
+            annotation, Path(f"./data/processed/{set_id}"), metrics, include_ids=include_ids
+        )
+        if error:
+            raise HTTPException(status_code=500, detail=error)
+        return data
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
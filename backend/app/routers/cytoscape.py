@@ -1,9 +1,13 @@
+from typing import Optional
 from pydantic import BaseModel
 from sqlalchemy import select
 from pathlib import Path
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from ..services.cytoscape_service import CytoscapeService
+from ..services.subgraph_service import SeedsNotFound, SubgraphService
+from ..services.aggregation_service import AggregationService, GROUP_BY_OPTIONS, UnknownGroup
+from ..services.layout_service import LayoutService, LAYOUT_NAMES
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..database import get_db
@@ -12,12 +16,14 @@ from .auth import get_current_user
 from fastapi.responses import FileResponse
 
 from ..models import Annotation
-from ..schemas import CytoscapeResponse
+from ..schemas import CytoscapeResponse, SubgraphRequest
 
 router = APIRouter(prefix="/visualize&analysis", tags=["Visualization"])
 
 class CytoscapeRequest(BaseModel):
     graph_name: str
+    # Name of a precomputed server-side layout to attach node positions from
+    layout: Optional[str] = None
 
 @router.post("/cytoscape/download/{set_id}")
 async def download_graph_file(
@@ -123,12 +129,179 @@ async def get_cytoscape_graph_data(
         if error:
             raise HTTPException(status_code=500, detail=error)
 
-        return {
+        response = {
             "graph_data": cytoscape_json_data,
             "network_name": req.graph_name
         }
+        if req.layout:
+            if req.layout not in LAYOUT_NAMES:
+                raise HTTPException(status_code=400, detail=f"layout must be one of: {', '.join(LAYOUT_NAMES)}")
+            positions, error = await LayoutService(db).get_positions(annotation, graph_dir, req.layout)
+            if error:
+                raise HTTPException(status_code=500, detail=error)
+            LayoutService.apply_positions(cytoscape_json_data["elements"], positions)
+            response["layout"] = {"name": "preset", "source": req.layout}
+
+        return response
+
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@router.post("/subgraph/{set_id}")
+async def get_subgraph(
+    set_id: int,
+    req: SubgraphRequest,
+    current_user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Returns the k-hop neighborhood of the seed identifiers in Cytoscape element format,
+    optionally restricted to some node types, node sources and edge types.
+    """
+    try:
+        result = await db.execute(
+            select(Annotation)
+            .where(Annotation.identifier_set_id == set_id)
+            .order_by(Annotation.id.desc())
+        )
+        annotation = result.scalars().first()
+
+        if not annotation or not annotation.combined_df:
+            raise HTTPException(status_code=404, detail="Processed annotation not found.")
+        if not req.seeds:
+            raise HTTPException(status_code=400, detail="At least one seed identifier is required.")
+
+        graph_dir = Path(f"./data/processed/{set_id}")
+        subgraph_service = SubgraphService(db)
+        try:
+            subgraph, error = await subgraph_service.get_neighborhood(
+                annotation,
+                graph_dir,
+                seeds=req.seeds,
+                depth=req.depth,
+                node_types=req.node_types,
+                node_sources=req.node_sources,
+                edge_types=req.edge_types,
+            )
+        except SeedsNotFound as e:
+            raise HTTPException(status_code=404, detail=str(e))
+
+        if error:
+            raise HTTPException(status_code=500, detail=error)
+
+        if req.layout:
+            if req.layout not in LAYOUT_NAMES:
+                raise HTTPException(status_code=400, detail=f"layout must be one of: {', '.join(LAYOUT_NAMES)}")
+            positions, error = await LayoutService(db).get_positions(annotation, graph_dir, req.layout)
+            if error:
+                raise HTTPException(status_code=500, detail=error)
+            LayoutService.apply_positions(subgraph["elements"], positions)
+            subgraph["layout"] = {"name": "preset", "source": req.layout}
+
+        return {"graph_data": {"elements": subgraph.pop("elements")}, **subgraph}
+
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+async def _get_latest_annotation(db: AsyncSession, set_id: int) -> Annotation:
+    result = await db.execute(
+        select(Annotation)
+        .where(Annotation.identifier_set_id == set_id)
+        .order_by(Annotation.id.desc())
+    )
+    annotation = result.scalars().first()
+    if not annotation or not annotation.combined_df:
+        raise HTTPException(status_code=404, detail="Processed annotation not found.")
+    return annotation
+
+
+@router.get("/lod/{set_id}")
+async def get_aggregated_graph(
+    set_id: int,
+    group_by: str = Query("type"),
+    current_user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Level-of-detail view of the graph: nodes collapsed into super-nodes by type, source,
+    type and source, or community, connected by edges weighted with the number of collapsed edges.
+    """
+    if group_by not in GROUP_BY_OPTIONS:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of: {', '.join(GROUP_BY_OPTIONS)}")
+    try:
+        annotation = await _get_latest_annotation(db, set_id)
+        aggregation_service = AggregationService(db)
+        overview, error = await aggregation_service.get_overview(
+            annotation, Path(f"./data/processed/{set_id}"), group_by
+        )
+        if error:
+            raise HTTPException(status_code=500, detail=error)
+        return {"graph_data": {"elements": overview.pop("elements")}, **overview}
+
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@router.get("/lod/{set_id}/expand")
+async def expand_aggregated_group(
+    set_id: int,
+    group_id: str = Query(...),
+    group_by: str = Query("type"),
+    current_user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Elements replacing one super-node of the level-of-detail view with its member nodes."""
+    if group_by not in GROUP_BY_OPTIONS:
+        raise HTTPException(status_code=400, detail=f"group_by must be one of: {', '.join(GROUP_BY_OPTIONS)}")
+    try:
+        annotation = await _get_latest_annotation(db, set_id)
+        aggregation_service = AggregationService(db)
+        try:
+            expanded, error = await aggregation_service.expand_group(
+                annotation, Path(f"./data/processed/{set_id}"), group_by, group_id
+            )
+        except UnknownGroup as e:
+            raise HTTPException(status_code=404, detail=str(e))
+        if error:
+            raise HTTPException(status_code=500, detail=error)
+        return {"graph_data": {"elements": expanded.pop("elements")}, **expanded}
+
+    except HTTPException as he:
+        raise he
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@router.get("/layout/{set_id}")
+async def get_graph_layout(
+    set_id: int,
+    layout: str = Query("force"),
+    current_user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Precomputed node positions for the latest graph of an identifier set.
+    Positions are computed once per graph version and layout, then served from storage.
+    """
+    if layout not in LAYOUT_NAMES:
+        raise HTTPException(status_code=400, detail=f"layout must be one of: {', '.join(LAYOUT_NAMES)}")
+    try:
+        annotation = await _get_latest_annotation(db, set_id)
+        positions, error = await LayoutService(db).get_positions(
+            annotation, Path(f"./data/processed/{set_id}"), layout
+        )
+        if error:
+            raise HTTPException(status_code=500, detail=error)
+        return {"layout": layout, "positions": positions}
 
     except HTTPException as he:
         raise he
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
@@ -1,12 +1,12 @@
 from fastapi import APIRouter, HTTPException, Depends
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from ..database import get_db
 from ..models import RDFGeneration
+from ..services import zip_stream
 from .auth import get_current_user
 import os
-import tempfile
-import zipfile
+from pathlib import Path
 from typing import Optional
 from sqlalchemy import select
 
@@ -220,18 +220,17 @@ async def download_all_files(
     if not generation.generated_files:
         raise HTTPException(status_code=404, detail="No generated files found")
     
-    # Create a temporary ZIP file
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.zip') as temp_zip:
-        with zipfile.ZipFile(temp_zip.name, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-            for file in generation.generated_files:
-                file_path = file.get('path')
-                file_name = file.get('name')
-                
-                if file_path and file_name and os.path.exists(file_path):
-                    zip_file.write(file_path, file_name)
-        
-        return FileResponse(
-            path=temp_zip.name,
-            filename=f"{generation.graph_name}_generated_files.zip",
-            media_type='application/zip'
-        )
\ No newline at end of file
+    members = [
+        (Path(file['path']), file['name'])
+        for file in generation.generated_files
+        if file.get('path') and file.get('name') and os.path.exists(file['path'])
+    ]
+    if not members:
+        raise HTTPException(status_code=404, detail="No generated files found on disk")
+    
+    filename = f"{generation.graph_name}_generated_files.zip"
+    return StreamingResponse(
+        zip_stream.stream_zip(members),
+        media_type='application/zip',
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
\ No newline at end of file
@@ -3,9 +3,6 @@ from typing import Dict, List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Body
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from pyBiodatafuse.graph.rdf import BDFGraph
-from pyBiodatafuse.graph.rdf.graphdb import GraphDBManager
-
 from ..database import get_db
 from ..schemas import (
     GraphDBConnectionRequest,
@@ -17,7 +14,7 @@ from ..schemas import (
     GraphDBQueryResponse,
     GraphDBTripleCountResponse,
 )
-from ..services.rdf_service import RDFService
+from ..services.rdf_service import RDFService, BDFGraph, GraphDBManager
 from .auth import get_current_user
 import os
 import logging
@@ -198,9 +195,9 @@ async def upload_rdf_graph(
         if not file_info or not os.path.exists(file_info['path']):
             raise ValueError("RDF file not found")
         
-        # Read TTL into rdflib Graph
+        # Read the main file (Turtle or N-Triples) into an rdflib Graph
         g = rdflib.Graph()
-        g.parse(file_info['path'], format='turtle')
+        g.parse(file_info['path'], format=rdflib.util.guess_format(file_info['path']) or 'turtle')
         
         # Upload using your GraphDBManager
         GraphDBManager.upload_to_graphdb(
@@ -1,3 +1,6 @@
+import os
+import tempfile
+from pathlib import Path
 from typing import List, Optional
 
 from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile, status
@@ -10,6 +13,22 @@ from .auth import get_current_user
 
 router = APIRouter(prefix="/identifiers", tags=["Identifiers"])
 
+# Uploads are copied to disk in chunks of this size, so the request never holds the whole file
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+async def _spool_upload(file: UploadFile) -> Path:
+    suffix = Path(file.filename or "").suffix
+    fd, path = tempfile.mkstemp(prefix="identifiers_", suffix=suffix)
+    try:
+        with os.fdopen(fd, "wb") as spooled:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                spooled.write(chunk)
+    except Exception:
+        os.unlink(path)
+        raise
+    return Path(path)
+
 
 @router.post("", response_model=schemas.IdentifierProcessingResponse)
 async def process_identifiers(
@@ -42,23 +61,26 @@ async def process_identifiers(
         HTTPException: If there is an error during identifier set creation or processing.
     """
     identifier_service = IdentifierService(db)
-    file_content = None
     if file:
-        file_content = await file.read()  # <- this is bytes
+        file_path = await _spool_upload(file)
         file_type = file.content_type
     else:
-        file_content = None
+        file_path = None
         file_type = None
 
-    identifier_set = await identifier_service.create_identifier_set(
-        user_id=current_user.id,
-        identifier_type=identifier_type,
-        text_input=text_input,
-        file_content=file_content,
-        input_species=input_species,
-        column_name=column_name,
-        file_type=file_type
-    )
+    try:
+        identifier_set = await identifier_service.create_identifier_set(
+            user_id=current_user.id,
+            identifier_type=identifier_type,
+            text_input=text_input,
+            input_species=input_species,
+            column_name=column_name,
+            file_type=file_type,
+            file_path=file_path,
+        )
+    finally:
+        if file_path:
+            file_path.unlink(missing_ok=True)
     return schemas.IdentifierProcessingResponse(
         set_id=identifier_set.id,
         status=identifier_set.status,
@@ -1,20 +1,20 @@
 from typing import Dict, List, Optional
+import asyncio
 import os
-import tempfile
 import uuid
-import zipfile
 from pathlib import Path
 import logging
 
-from fastapi import APIRouter, Depends, HTTPException, Response
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 
 from ..database import get_db
-from ..schemas import RDFGenerationRequest, RDFGenerationResponse
+from ..schemas import RDFGenerationRequest, RDFGenerationResponse, SPARQLQueryRequest
 from ..services.rdf_service import RDFService
+from ..services import artifact_store, rdf_formats, shape_service, sparql_service, zip_stream
 from .auth import get_current_user
 from ..models import RDFGeneration
 
@@ -37,6 +37,17 @@ async def get_generation_by_id(db: AsyncSession, generation_id: str, user_id: in
         raise HTTPException(status_code=404, detail="Generation not found")
     return generation
 
+async def ensure_file_on_disk(rdf_service: RDFService, file_info: dict, detail: str = "File not found on disk"):
+    """Raise 404 unless the file exists, deferred artifacts (UML diagrams) are rendered on first access"""
+    try:
+        available = await rdf_service.ensure_file(file_info)
+    except Exception as e:
+        logger.error(f"❌ Could not produce {file_info.get('name')}: {str(e)}")
+        raise HTTPException(status_code=503, detail=f"Could not render {file_info.get('name')}: {str(e)}")
+    if not available:
+        raise HTTPException(status_code=404, detail=detail)
+
+
 def find_file_by_pattern(generated_files: list, pattern: str) -> Optional[dict]:
     """Find a file in generated_files that matches a pattern"""
     for file in generated_files:
@@ -56,6 +67,7 @@ async def generate_rdf(
         logger.info(f"🔧 Starting RDF generation for user {current_user.id}")
         
         rdf_service = RDFService(db)
+        await asyncio.get_running_loop().run_in_executor(None, artifact_store.check_quota, current_user.id)
         generation_id = str(uuid.uuid4())
         
         # Generate the main RDF graph using the service
@@ -74,6 +86,8 @@ async def generate_rdf(
             shex_threshold=request.shex_threshold,
             user_id=current_user.id,
             custom_namespaces=request.custom_namespaces if hasattr(request, 'custom_namespaces') else None,
+            generation_id=generation_id,
+            rdf_format=request.rdf_format,
         )
         
         # Extract generated files from the result
@@ -119,17 +133,156 @@ async def generate_rdf(
             "graph_name": request.graph_name,
             "generated_files": generated_files,
             "message": "RDF graph generated successfully",
-            "status": "completed"
+            "status": "completed",
+            "stage_times": getattr(result, 'stage_times', None),
         }
         
         logger.info(f"✅ RDF generation completed successfully")
         return response_result
         
+    except artifact_store.QuotaExceeded as e:
+        logger.warning(f"⚠️ RDF generation refused for user {current_user.id}: {str(e)}")
+        raise HTTPException(status_code=507, detail=str(e))
     except Exception as e:
         logger.error(f"❌ Error in RDF generation endpoint: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
 
 
+@router.post("/sparql/{generation_id}")
+async def query_rdf_graph(
+    generation_id: str,
+    request: SPARQLQueryRequest,
+    current_user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Run a SPARQL query against a generated graph, results are streamed.
+
+    Each group of triple patterns is one indexed SQL join in the store; OPTIONAL, UNION, FILTER and
+    joins between groups run in rdflib's engine row by row, so such queries over large groups are
+    not millisecond-class. A query that exceeds its time budget before the first results is a 504,
+    one that exceeds it while streaming (or reaches max_rows) ends with results marked truncated.
+    """
+    await get_generation_by_id(db, generation_id, current_user.id)
+
+    store_file = RDFService(db).get_store_path(generation_id, current_user.id)
+    if store_file is None:
+        raise HTTPException(status_code=404, detail="No queryable graph stored for this generation")
+
+    try:
+        media_type, body = await asyncio.get_running_loop().run_in_executor(
+            None,
+            sparql_service.run_query,
+            store_file,
+            request.query,
+            request.format,
+            request.timeout,
+            request.max_rows,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except sparql_service.triple_store.QueryTimeout:
+        raise HTTPException(status_code=504, detail="Query timed out")
+
+    return StreamingResponse(body, media_type=media_type)
+
+
+@router.get("/shapes/{generation_id}/preview")
+async def preview_shapes(
+    generation_id: str,
+    threshold: float = Query(0.001),
+    current_user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Shapes and constraints kept at a threshold, from the generation's precomputed statistics."""
+    await get_generation_by_id(db, generation_id, current_user.id)
+
+    found = await RDFService(db).get_shape_statistics(generation_id, current_user.id)
+    if found is None:
+        raise HTTPException(status_code=404, detail="No shape statistics available for this generation")
+
+    try:
+        return await asyncio.get_running_loop().run_in_executor(
+            None, shape_service.preview_shapes, found[1], threshold
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/shapes/{generation_id}/download")
+async def download_shapes(
+    generation_id: str,
+    graph_type: str = Query("shacl"),
+    threshold: float = Query(0.001),
+    current_user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Download SHACL or ShEx shapes at any threshold, built from the precomputed statistics."""
+    generation = await get_generation_by_id(db, generation_id, current_user.id)
+
+    found = await RDFService(db).get_shape_statistics(generation_id, current_user.id)
+    if found is None:
+        raise HTTPException(status_code=404, detail="No shape statistics available for this generation")
+    output_dir, statistics = found
+
+    file_path = output_dir / f"{generation.graph_name}_{graph_type}_{threshold:g}.ttl"
+    try:
+        file_path = await asyncio.get_running_loop().run_in_executor(
+            None, shape_service.export_shapes, statistics, graph_type, threshold, file_path
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return FileResponse(
+        path=str(file_path),
+        filename=file_path.name,
+        media_type='text/turtle' if graph_type == 'shacl' else 'application/octet-stream'
+    )
+
+
+@router.post("/prefetch-uml/{generation_id}")
+async def prefetch_uml_diagrams(
+    generation_id: str,
+    current_user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Start rendering the UML diagrams of a generation in the background."""
+    generation = await get_generation_by_id(db, generation_id, current_user.id)
+
+    rdf_service = RDFService(db)
+    uml_paths = []
+    for file in generation.generated_files or []:
+        if file.get('type') in shape_service.UML_FILE_TYPES:
+            file_info = await rdf_service.get_file_info(file.get('id'), current_user.id)
+            if file_info:
+                uml_paths.append(Path(file_info['path']))
+
+    scheduled = shape_service.prefetch_uml(uml_paths)
+    return {"message": f"Rendering {scheduled} UML diagram(s)", "scheduled": scheduled}
+
+
+@router.get("/storage")
+async def get_storage_usage(current_user=Depends(get_current_user)):
+    """Storage used by the current user's generations and by the whole artifact store."""
+    return await asyncio.get_running_loop().run_in_executor(None, artifact_store.usage_report, current_user.id)
+
+
+@router.delete("/generations/{generation_id}")
+async def delete_generation(
+    generation_id: str,
+    current_user=Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Delete a generation. Files shared with identical generations are kept until the last one is deleted."""
+    generation = await get_generation_by_id(db, generation_id, current_user.id)
+
+    file_ids = [file.get('id') for file in generation.generated_files or []]
+    await RDFService(db).delete_generation(generation_id, file_ids, current_user.id)
+    await db.delete(generation)
+    await db.commit()
+    return {"message": "Generation deleted", "generation_id": generation_id}
+
+
 @router.get("/download/{file_id}")
 async def download_rdf_file(
     file_id: str,
@@ -144,9 +297,8 @@ async def download_rdf_file(
         if not file_info:
             raise HTTPException(status_code=404, detail="File not found")
         
+        await ensure_file_on_disk(rdf_service, file_info)
         file_path = Path(file_info["path"])
-        if not file_path.exists():
-            raise HTTPException(status_code=404, detail="File not found on disk")
         
         # Determine media type based on file extension
         if file_path.suffix.lower() == '.png':
@@ -181,9 +333,8 @@ async def preview_rdf_file(
         if not file_info:
             raise HTTPException(status_code=404, detail="File not found")
         
+        await ensure_file_on_disk(rdf_service, file_info)
         file_path = Path(file_info["path"])
-        if not file_path.exists():
-            raise HTTPException(status_code=404, detail="File not found on disk")
         
         # Only serve image files for preview
         if file_path.suffix.lower() not in ['.png', '.jpg', '.jpeg', '.svg']:
@@ -212,34 +363,60 @@ async def preview_rdf_file(
 # Specific download endpoints by generation ID
 @router.get("/download-rdf/{generation_id}")
 async def download_rdf_graph(
-    generation_id: str, 
+    generation_id: str,
+    request: Request,
+    format: Optional[str] = Query(None, description="turtle, ntriples, nquads or sqlite, overrides Accept"),
+    encoding: Optional[str] = Query(None, description="gzip or zstd: download the compressed file itself"),
     current_user=Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Download the main RDF graph file"""
+    """Download the RDF graph, in the format and encoding negotiated from Accept and Accept-Encoding"""
     generation = await get_generation_by_id(db, generation_id, current_user.id)
-    
-    # Find the main RDF file by looking up the file ID in the RDF files table
-    rdf_file_info = None
-    for file in generation.generated_files:
-        if file.get('type') == 'RDF':
-            # Get the actual file info from the RDF service
-            rdf_service = RDFService(db)
-            rdf_file_info = await rdf_service.get_file_info(file.get('id'), current_user.id)
-            break
-    
-    if not rdf_file_info:
+    rdf_service = RDFService(db)
+
+    default_format = rdf_service.get_rdf_format(generation_id)
+    if default_format is None:
         raise HTTPException(status_code=404, detail="RDF graph file not found")
-    
-    file_path = rdf_file_info.get('path')
-    if not file_path or not os.path.exists(file_path):
-        raise HTTPException(status_code=404, detail="RDF file not found on disk")
-    
-    return FileResponse(
-        path=file_path,
-        filename=rdf_file_info.get('name', 'graph.ttl'),
-        media_type='text/turtle'
+    if format is not None and format not in rdf_formats.FORMATS:
+        raise HTTPException(
+            status_code=400, detail=f"Unknown format '{format}'. Available: {', '.join(rdf_formats.FORMATS)}"
+        )
+    if encoding is not None and encoding not in rdf_formats.ENCODINGS:
+        raise HTTPException(
+            status_code=400, detail=f"Unknown encoding '{encoding}'. Available: {', '.join(rdf_formats.ENCODINGS)}"
+        )
+
+    negotiated_format, negotiated_encoding = rdf_formats.negotiate(
+        None if format else request.headers.get("accept"),
+        None if encoding else request.headers.get("accept-encoding"),
+        format or default_format,
     )
+    if negotiated_format is None:
+        raise HTTPException(
+            status_code=406,
+            detail="Available: " + ", ".join(fmt.media_type for fmt in rdf_formats.FORMATS.values()),
+        )
+
+    try:
+        path = await rdf_service.get_rdf_variant(
+            generation_id, negotiated_format, encoding or negotiated_encoding, current_user.id
+        )
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    if path is None or not path.exists():
+        raise HTTPException(status_code=404, detail="RDF file not found on disk")
+
+    media_type = rdf_formats.FORMATS[negotiated_format].media_type
+    filename = f"{generation.graph_name}{rdf_formats.FORMATS[negotiated_format].extension}"
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if encoding:
+        # Asked for explicitly: the compressed file is the download
+        extension, media_type = rdf_formats.ENCODINGS[encoding]
+        filename += extension
+    elif negotiated_encoding:
+        headers["Content-Encoding"] = negotiated_encoding
+
+    return FileResponse(path=path, filename=filename, media_type=media_type, headers=headers)
 
 
 @router.get("/download-shacl/{generation_id}")
@@ -355,9 +532,8 @@ async def download_shacl_preview(
     if not preview_file_info:
         raise HTTPException(status_code=404, detail="SHACL preview diagram not found")
     
+    await ensure_file_on_disk(rdf_service, preview_file_info, "SHACL preview file not found on disk")
     file_path = preview_file_info.get('path')
-    if not file_path or not os.path.exists(file_path):
-        raise HTTPException(status_code=404, detail="SHACL preview file not found on disk")
     
     return FileResponse(
         path=file_path,
@@ -386,9 +562,8 @@ async def download_shex_preview(
     if not preview_file_info:
         raise HTTPException(status_code=404, detail="ShEx preview diagram not found")
     
+    await ensure_file_on_disk(rdf_service, preview_file_info, "ShEx preview file not found on disk")
     file_path = preview_file_info.get('path')
-    if not file_path or not os.path.exists(file_path):
-        raise HTTPException(status_code=404, detail="ShEx preview file not found on disk")
     
     return FileResponse(
         path=file_path,
@@ -411,17 +586,32 @@ async def download_all_files(
     
     rdf_service = RDFService(db)
     
-    # Create a temporary ZIP file
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.zip') as temp_zip:
-        with zipfile.ZipFile(temp_zip.name, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-            for file in generation.generated_files:
-                # Get actual file info from the RDF service
-                file_info = await rdf_service.get_file_info(file.get('id'), current_user.id)
-                if file_info and os.path.exists(file_info['path']):
-                    zip_file.write(file_info['path'], file_info['name'])
-        
-        return FileResponse(
-            path=temp_zip.name,
-            filename=f"{generation.graph_name}_generated_files.zip",
-            media_type='application/zip'
-        )
+    members = []
+    for file in generation.generated_files:
+        # Get actual file info from the RDF service
+        file_info = await rdf_service.get_file_info(file.get('id'), current_user.id)
+        if not file_info:
+            continue
+        try:
+            available = await rdf_service.ensure_file(file_info)
+        except Exception as e:
+            logger.warning(f"⚠️ Leaving {file_info['name']} out of the archive: {str(e)}")
+            continue
+        if available:
+            members.append((Path(file_info['path']), file_info['name']))
+    
+    if not members:
+        raise HTTPException(status_code=404, detail="No generated files found on disk")
+    
+    filename = f"{generation.graph_name}_generated_files.zip"
+    # Served from disk if these exact files were archived before, streamed (and kept) otherwise
+    archive = zip_stream.archive_path(members)
+    if archive is not None and archive.exists():
+        artifact_store.used(archive)
+        return FileResponse(path=archive, filename=filename, media_type='application/zip')
+    
+    return StreamingResponse(
+        zip_stream.stream_zip(members, archive),
+        media_type='application/zip',
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
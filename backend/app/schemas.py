@@ -179,6 +179,14 @@ class CytoscapeResponse(BaseModel):
     class Config:
         arbitrary_types_allowed = True
 
+class SubgraphRequest(BaseModel):
+    seeds: List[str]
+    depth: int = 1
+    node_types: Optional[List[str]] = None
+    node_sources: Optional[List[str]] = None
+    edge_types: Optional[List[str]] = None
+    layout: Optional[str] = None
+
 
 # RDF Generation Schemas
 class RDFGenerationRequest(BaseModel):
@@ -194,6 +202,7 @@ class RDFGenerationRequest(BaseModel):
     generate_uml_diagram: bool = True
     generate_shex: bool = True
     shex_threshold: float = 0.001
+    rdf_format: str = "turtle"  # main file: turtle or ntriples (faster to write)
 
 class GeneratedFile(BaseModel):
     id: str
@@ -205,6 +214,13 @@ class RDFGenerationResponse(BaseModel):
     generation_id: str
     generated_files: List[GeneratedFile]
     message: str
+    stage_times: Optional[Dict[str, float]] = None  # seconds per generation stage
+
+class SPARQLQueryRequest(BaseModel):
+    query: str
+    format: str = "json"  # SELECT results: json or csv
+    timeout: Optional[float] = None  # seconds, capped by SPARQL_TIMEOUT
+    max_rows: Optional[int] = None  # capped by SPARQL_MAX_ROWS
 
 # GraphDB Schemas
 class GraphDBConnectionRequest(BaseModel):
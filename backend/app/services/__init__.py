@@ -1,4 +1,15 @@
-from .identifier_service import IdentifierService
-from .datasource_service import DataSourceService
-from .user_service import UserService
-__all__ = ['UserService', 'IdentifierService', 'DataSourceService']
\ No newline at end of file
+import importlib
+
+# Resolved on first access, so importing one service module does not load all of them
+_EXPORTS = {
+    "UserService": ".user_service",
+    "IdentifierService": ".identifier_service",
+    "DataSourceService": ".datasource_service",
+}
+__all__ = ['UserService', 'IdentifierService', 'DataSourceService']
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
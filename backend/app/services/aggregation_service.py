@@ -0,0 +1,230 @@
+import asyncio
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import networkx as nx
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .compact_graph import CompactGraph
+from .graph_service import GraphService
+from .lazy_imports import lazy_import
+from .. import models
+
+cytoscape_graph = lazy_import("pyBiodatafuse.graph.cytoscape")
+
+GROUP_BY_OPTIONS = ["type", "source", "type_source", "community"]
+AGGREGATION_CACHE_SIZE = 16
+
+_aggregation_cache: "OrderedDict[Tuple[str, str], GraphAggregation]" = OrderedDict()
+_aggregation_lock = threading.Lock()
+
+
+class UnknownGroup(LookupError):
+    pass
+
+
+def _community_labels(graph: CompactGraph, seed: int = 42) -> List[str]:
+    undirected = nx.Graph()
+    undirected.add_nodes_from(range(graph.node_count))
+    undirected.add_edges_from(zip(graph.edge_src.tolist(), graph.edge_dst.tolist()))
+    undirected.remove_edges_from(nx.selfloop_edges(undirected))
+
+    communities = nx.community.louvain_communities(undirected, seed=seed)
+    labels = [""] * graph.node_count
+    # Largest community first, so community numbers are stable for a given graph
+    for number, community in enumerate(sorted(communities, key=len, reverse=True)):
+        for node in community:
+            labels[node] = f"Community {number + 1}"
+    return labels
+
+
+class GraphAggregation:
+    """
+    Level-of-detail view of a graph: nodes collapsed into super-nodes by a grouping key,
+    with parallel edges between groups summed into one weighted super-edge.
+    """
+
+    def __init__(self, graph: CompactGraph, group_by: str):
+        self.graph = graph
+        self.group_by = group_by
+
+        if group_by == "type":
+            keys = [graph.node_type_names[c] for c in graph.node_type]
+        elif group_by == "source":
+            keys = [graph.node_source_names[c] for c in graph.node_source]
+        elif group_by == "type_source":
+            keys = [
+                f"{graph.node_type_names[t]} ({graph.node_source_names[s]})"
+                for t, s in zip(graph.node_type, graph.node_source)
+            ]
+        elif group_by == "community":
+            keys = _community_labels(graph)
+        else:
+            raise ValueError(f"Unknown grouping '{group_by}'. Available: {', '.join(GROUP_BY_OPTIONS)}")
+
+        self.group_names, self.node_group = np.unique(np.array(keys, dtype=object), return_inverse=True)
+        self.group_names = [str(name) for name in self.group_names]
+        self.group_ids = [f"group:{group_by}:{name}" for name in self.group_names]
+        self.group_sizes = np.bincount(self.node_group, minlength=len(self.group_names))
+
+        # Members of each group as a CSR table
+        self.member_order = np.argsort(self.node_group, kind="stable")
+        self.member_indptr = np.zeros(len(self.group_names) + 1, dtype=np.int64)
+        np.cumsum(self.group_sizes, out=self.member_indptr[1:])
+
+        # Super-edges: edge counts per (source group, target group)
+        groups = len(self.group_names)
+        pair_codes = self.node_group[graph.edge_src] * groups + self.node_group[graph.edge_dst]
+        pairs, weights = np.unique(pair_codes, return_counts=True)
+        self.super_src, self.super_dst, self.super_weight = pairs // groups, pairs % groups, weights
+
+        node_types = np.bincount(
+            self.node_group * len(graph.node_type_names) + graph.node_type,
+            minlength=groups * len(graph.node_type_names),
+        ).reshape(groups, len(graph.node_type_names))
+        self.group_node_types = [
+            {graph.node_type_names[t]: int(count) for t, count in enumerate(row) if count}
+            for row in node_types
+        ]
+
+    def members(self, group: int) -> np.ndarray:
+        return self.member_order[self.member_indptr[group]:self.member_indptr[group + 1]]
+
+    def overview(self) -> Dict:
+        internal = {
+            int(s): int(w) for s, d, w in zip(self.super_src, self.super_dst, self.super_weight) if s == d
+        }
+        nodes = [
+            {
+                "data": {
+                    "id": self.group_ids[g],
+                    "label": self.group_names[g],
+                    "node_type": "group",
+                    "group_by": self.group_by,
+                    "size": int(self.group_sizes[g]),
+                    "internal_edges": internal.get(g, 0),
+                    "node_types": self.group_node_types[g],
+                }
+            }
+            for g in range(len(self.group_names))
+        ]
+        edges = [
+            {
+                "data": {
+                    "id": f"{self.group_ids[s]}->{self.group_ids[d]}",
+                    "source": self.group_ids[s],
+                    "target": self.group_ids[d],
+                    "weight": int(w),
+                }
+            }
+            for s, d, w in zip(self.super_src, self.super_dst, self.super_weight)
+            if s != d
+        ]
+        return {"nodes": nodes, "edges": edges}
+
+    def expand(self, group_id: str) -> Optional[Dict]:
+        """
+        Elements that replace one super-node: its member nodes, the edges among them and
+        one weighted edge from each member to every other group it is connected to.
+        """
+        if group_id not in self.group_ids:
+            return None
+        group = self.group_ids.index(group_id)
+        graph = self.graph
+        members = self.members(group)
+
+        in_group = self.node_group == group
+        incident = np.unique(graph.incident(members))
+        src, dst = graph.edge_src[incident], graph.edge_dst[incident]
+        internal = incident[in_group[src] & in_group[dst]]
+
+        raw_graph = cytoscape_graph.convert_graph_to_json(graph.to_networkx(members, internal))
+        elements = raw_graph.get("elements")
+
+        # Edges leaving the group, aggregated per (member, other group) in each direction
+        groups = len(self.group_names)
+        external = []
+        for outgoing in (True, False):
+            mask = (in_group[src] & ~in_group[dst]) if outgoing else (~in_group[src] & in_group[dst])
+            member = src[mask] if outgoing else dst[mask]
+            other = self.node_group[dst[mask] if outgoing else src[mask]]
+            pairs, weights = np.unique(member * groups + other, return_counts=True)
+            for pair, weight in zip(pairs, weights):
+                node_id = graph.node_ids[pair // groups]
+                other_id = self.group_ids[pair % groups]
+                source, target = (node_id, other_id) if outgoing else (other_id, node_id)
+                external.append({
+                    "data": {
+                        "id": f"{source}->{target}",
+                        "source": source,
+                        "target": target,
+                        "weight": int(weight),
+                        "aggregated": True,
+                    }
+                })
+
+        elements["edges"] = elements.get("edges", []) + external
+        return elements
+
+
+class AggregationService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    @staticmethod
+    def get_aggregation(annotation: models.Annotation, graph_dir: Path, group_by: str):
+        key = (GraphService.graph_version(annotation), group_by)
+        with _aggregation_lock:
+            if key in _aggregation_cache:
+                _aggregation_cache.move_to_end(key)
+                return _aggregation_cache[key], None
+
+        graph, error = GraphService.get_compact_graph(annotation, graph_dir)
+        if error:
+            return None, f"Graph error: {error}"
+
+        aggregation = GraphAggregation(graph, group_by)
+        with _aggregation_lock:
+            _aggregation_cache[key] = aggregation
+            while len(_aggregation_cache) > AGGREGATION_CACHE_SIZE:
+                _aggregation_cache.popitem(last=False)
+        return aggregation, None
+
+    def _overview(self, annotation, graph_dir, group_by):
+        aggregation, error = self.get_aggregation(annotation, graph_dir, group_by)
+        if error:
+            return None, error
+        return {
+            "group_by": group_by,
+            "node_count": aggregation.graph.node_count,
+            "edge_count": aggregation.graph.edge_count,
+            "elements": aggregation.overview(),
+        }, None
+
+    def _expand(self, annotation, graph_dir, group_by, group_id):
+        aggregation, error = self.get_aggregation(annotation, graph_dir, group_by)
+        if error:
+            return None, error
+        elements = aggregation.expand(group_id)
+        if elements is None:
+            raise UnknownGroup(f"Unknown group '{group_id}'")
+        return {"group_by": group_by, "group_id": group_id, "elements": elements}, None
+
+    async def get_overview(self, annotation: models.Annotation, graph_dir: Path, group_by: str = "type"):
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, self._overview, annotation, graph_dir, group_by)
+        except Exception as e:
+            return None, f"Error aggregating graph: {str(e)}"
+
+    async def expand_group(self, annotation: models.Annotation, graph_dir: Path, group_by: str, group_id: str):
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, self._expand, annotation, graph_dir, group_by, group_id)
+        except UnknownGroup:
+            raise
+        except Exception as e:
+            return None, f"Error expanding group: {str(e)}"
@@ -1,11 +1,29 @@
 from pathlib import Path
+import numpy as np
 import pandas as pd
+from .compact_graph import CompactGraph
 from .graph_service import GraphService
-from pyBiodatafuse.analyzer.summarize import BioGraph
+from .lazy_imports import lazy_import
 
 from .. import models
 from sqlalchemy.ext.asyncio import AsyncSession
-import matplotlib.pyplot as plt
+
+BioGraph = lazy_import("pyBiodatafuse.analyzer.summarize", "BioGraph")
+plt = lazy_import("matplotlib.pyplot")
+
+
+def _source_counts(types: np.ndarray, sources: np.ndarray, kind: str) -> pd.DataFrame:
+    """Count per (type, source), the table BioGraph.count_*_by_data_source returns, from the compact graph's arrays."""
+    pairs = pd.DataFrame({f"{kind}_type": types, f"{kind}_source": sources})
+    return pairs.groupby([f"{kind}_type", f"{kind}_source"]).size().reset_index(name="count")
+
+
+def _edge_sources(graph: CompactGraph) -> np.ndarray:
+    column = graph.edge_columns.get("datasource")
+    if column is None:
+        return np.full(graph.edge_count, "Unknown", dtype=object)
+    # Unset entries have code -1, which picks the trailing "Unknown"
+    return np.array(list(column.values) + ["Unknown"], dtype=object)[column.codes]
 
 class AnalysisService:
     def __init__(self, db: AsyncSession):
@@ -14,10 +32,11 @@ class AnalysisService:
     async def get_graph_summary(
             self, annotation: models.Annotation, graph_dir: Path):
         try: 
-            pygraph, error = GraphService.create_pygraph(annotation, graph_dir)
+            graph, error = GraphService.get_compact_graph(annotation, graph_dir)
             if error:
                 return None, f"Graph error: {error}"
-            
+
+            pygraph = graph.to_networkx()
             for node_id, data in pygraph.nodes(data=True):
                 if "labels" not in data and "label" in data:
                     data["labels"] = data["label"]
@@ -35,18 +54,15 @@ class AnalysisService:
 
     async def plot_node_counts(self, annotation: models.Annotation, graph_dir: Path):
         try:
-            pygraph, error = GraphService.create_pygraph(annotation, graph_dir)
+            graph, error = GraphService.get_compact_graph(annotation, graph_dir)
             if error:
                 return None, f"Graph error: {error}"
 
-            for node_id, data in pygraph.nodes(data=True):
-                if "labels" not in data and "label" in data:
-                    data["labels"] = data["label"]
-                elif "labels" not in data:
-                    data["labels"] = "Unknown"
-
-            graph_obj = BioGraph(graph=pygraph)
-            data = graph_obj.count_nodes_by_data_source(plot=False)
+            data = _source_counts(
+                np.asarray(graph.node_type_names, dtype=object)[graph.node_type],
+                np.asarray(graph.node_source_names, dtype=object)[graph.node_source],
+                "node",
+            )
 
             grouped = data.groupby(['node_type', 'node_source'])['count'].sum().unstack().fillna(0)
 
@@ -67,18 +83,13 @@ class AnalysisService:
 
     async def plot_edge_counts(self, annotation: models.Annotation, graph_dir: Path):
         try:
-            pygraph, error = GraphService.create_pygraph(annotation, graph_dir)
+            graph, error = GraphService.get_compact_graph(annotation, graph_dir)
             if error:
                 return None, f"Graph error: {error}"
 
-            for node_id, data in pygraph.nodes(data=True):
-                if "labels" not in data and "label" in data:
-                    data["labels"] = data["label"]
-                elif "labels" not in data:
-                    data["labels"] = "Unknown"
-                
-            graph_obj = BioGraph(graph=pygraph)
-            data = graph_obj.count_edge_by_data_source(plot=False)
+            data = _source_counts(
+                np.asarray(graph.edge_type_names, dtype=object)[graph.edge_type], _edge_sources(graph), "edge"
+            )
 
             grouped = data.groupby(['edge_type', 'edge_source'])['count'].sum().unstack().fillna(0)
 
@@ -0,0 +1,346 @@
+"""
+Disk usage of generated artifacts: quotas, retention and eviction.
+
+Artifacts are of two kinds. Generation outputs (graph, store, shapes) belong to RDFGeneration
+rows and live until their generation is deleted, by the user or by retention
+(ARTIFACT_RETENTION_DAYS). Regenerable artifacts (format variants, shape exports at other
+thresholds, deferred UML diagrams, graph directories under data/processed) are registered with
+`used` whenever they are produced or served and evicted least recently used first, when the
+store or a user is over quota: the next request for them produces them again.
+
+A new generation is refused with QuotaExceeded when its user (ARTIFACT_USER_QUOTA_BYTES) or the
+whole store (ARTIFACT_QUOTA_BYTES) is over quota once regenerable artifacts are evicted.
+`run_sweeper` applies retention, removes files nothing refers to any more, deletes database
+rows whose files are gone and records usage metrics, in one worker per ARTIFACT_SWEEP_INTERVAL.
+"""
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete
+from sqlalchemy.future import select
+
+from ..models import RDFFile, RDFGeneration
+from .lazy_imports import lazy_import
+from .shared_state import get_shared_state
+
+rdf_service = lazy_import(f"{__package__}.rdf_service")
+shape_service = lazy_import(f"{__package__}.shape_service")
+generation_cache = lazy_import(f"{__package__}.generation_cache")
+
+logger = logging.getLogger(__name__)
+
+GIB = 1024 ** 3
+ARTIFACT_QUOTA_BYTES = int(os.getenv("ARTIFACT_QUOTA_BYTES", str(50 * GIB)))
+ARTIFACT_USER_QUOTA_BYTES = int(os.getenv("ARTIFACT_USER_QUOTA_BYTES", str(5 * GIB)))
+# Generations older than this are deleted, 0 keeps them
+ARTIFACT_RETENTION_DAYS = float(os.getenv("ARTIFACT_RETENTION_DAYS", "30"))
+ARTIFACT_SWEEP_INTERVAL = float(os.getenv("ARTIFACT_SWEEP_INTERVAL", "3600"))
+
+PROCESSED_GRAPHS_DIR = Path("./data/processed")
+# Generations were written here before they moved to the shared state
+LEGACY_RDF_DIR = Path(tempfile.gettempdir()) / "biodatafuse_rdf"
+# Download-all ZIP archives left in the temp directory by earlier versions (NamedTemporaryFile
+# defaults, then a biodatafuse_ prefix), removed by the sweeper once older than TEMP_MAX_AGE
+LEAKED_ARCHIVE_PATTERNS = ("tmp*.zip", "biodatafuse_*.zip")
+TEMP_MAX_AGE = 3600
+# Files and rows of a generation still being written are younger than this
+ORPHAN_GRACE = 24 * 3600
+
+REGENERABLE_NAMESPACE = "regenerable_artifacts"
+USAGE_NAMESPACE = "artifact_usage"
+SWEEP_NAMESPACE = "artifact_sweeps"
+
+
+class QuotaExceeded(Exception):
+    pass
+
+
+def _size(path: Path) -> int:
+    try:
+        if not path.is_dir():
+            return path.stat().st_size
+        return sum(_size(Path(entry.path)) for entry in os.scandir(path))
+    except FileNotFoundError:
+        return 0
+
+
+def _age(path: Path, now: float) -> float:
+    try:
+        return now - path.stat().st_mtime
+    except FileNotFoundError:
+        return 0.0
+
+
+def _remove(path: Path) -> None:
+    if path.is_dir():
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        path.unlink(missing_ok=True)
+
+
+def temp_path(path: Path) -> Path:
+    """Unique hidden name next to `path` to write it under before renaming, one per writer."""
+    return path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+
+
+def used(path: Path) -> None:
+    """Register a regenerable artifact (file or directory) as just produced or served."""
+    get_shared_state().set(REGENERABLE_NAMESPACE, str(path.resolve()), time.time())
+
+
+def evict(bytes_to_free: int, within: Optional[Iterable[Path]] = None) -> int:
+    """Delete regenerable artifacts, least recently used first, under `within` if given. Returns the bytes freed."""
+    state = get_shared_state()
+    roots = [root.resolve() for root in within] if within is not None else None
+    entries = []
+    for key in state.keys(REGENERABLE_NAMESPACE):
+        last_used = state.get(REGENERABLE_NAMESPACE, key)
+        if last_used is not None:
+            entries.append((last_used, Path(key)))
+
+    freed = 0
+    for _, path in sorted(entries):
+        if freed >= bytes_to_free:
+            break
+        if roots is not None and not any(path.is_relative_to(root) for root in roots):
+            continue
+        size = _size(path)
+        _remove(path)
+        state.delete(REGENERABLE_NAMESPACE, str(path))
+        freed += size
+    if freed:
+        logger.info(f"🧹 Evicted {freed / 1024 ** 2:.1f} MiB of regenerable artifacts")
+    return freed
+
+
+def _generation_records() -> Dict[str, dict]:
+    state = get_shared_state()
+    records = {}
+    for generation_id in state.keys(rdf_service.GENERATIONS_NAMESPACE):
+        record = state.get(rdf_service.GENERATIONS_NAMESPACE, generation_id)
+        if record is not None:
+            records[generation_id] = record
+    return records
+
+
+def _user_dirs(user_id: int) -> List[Path]:
+    return list({
+        Path(record["rdf_path"]).parent
+        for record in _generation_records().values()
+        if record.get("user_id") == user_id
+    })
+
+
+def user_usage(user_id: int) -> Tuple[int, int]:
+    """Bytes used by a user's generations (shared outputs count for each user) and their number."""
+    records = [record for record in _generation_records().values() if record.get("user_id") == user_id]
+    directories = {Path(record["rdf_path"]).parent for record in records}
+    return sum(_size(directory) for directory in directories), len(records)
+
+
+def storage_usage() -> Dict[str, int]:
+    """Bytes used per storage area."""
+    state = get_shared_state()
+    regenerable = sum(_size(Path(key)) for key in state.keys(REGENERABLE_NAMESPACE))
+    return {
+        "generations": _size(state.artifact_dir("rdf")),
+        "processed_graphs": _size(PROCESSED_GRAPHS_DIR),
+        "legacy_generations": _size(LEGACY_RDF_DIR),
+        "regenerable": regenerable,
+    }
+
+
+def _total(usage: Dict[str, int]) -> int:
+    # Regenerable artifacts are inside the other areas
+    return sum(size for area, size in usage.items() if area != "regenerable")
+
+
+def check_quota(user_id: int) -> None:
+    """Make room for a new generation of a user, raise QuotaExceeded if there is none."""
+    user_bytes, _ = user_usage(user_id)
+    if user_bytes >= ARTIFACT_USER_QUOTA_BYTES:
+        user_bytes -= evict(user_bytes - ARTIFACT_USER_QUOTA_BYTES + 1, within=_user_dirs(user_id))
+        if user_bytes >= ARTIFACT_USER_QUOTA_BYTES:
+            raise QuotaExceeded(
+                f"Storage quota exceeded ({user_bytes / GIB:.2f} of {ARTIFACT_USER_QUOTA_BYTES / GIB:.2f} GiB), "
+                "delete some generations first"
+            )
+
+    # The usage recorded by the last sweep, the whole store is too large to measure per request
+    snapshot = get_shared_state().get(USAGE_NAMESPACE, "global")
+    total = _total(snapshot["usage"]) if snapshot else _total(storage_usage())
+    if total >= ARTIFACT_QUOTA_BYTES:
+        total -= evict(total - ARTIFACT_QUOTA_BYTES + 1)
+        if total >= ARTIFACT_QUOTA_BYTES:
+            raise QuotaExceeded("The artifact store is full, try again later")
+
+
+# Sweeping
+
+
+async def _delete_generation(db, generation: RDFGeneration) -> None:
+    file_ids = [file.get("id") for file in generation.generated_files or []]
+    await rdf_service.RDFService(db).delete_generation(generation.generation_id, file_ids, generation.user_id)
+    await db.delete(generation)
+
+
+async def _apply_retention(db) -> int:
+    if not ARTIFACT_RETENTION_DAYS:
+        return 0
+    cutoff = datetime.utcnow() - timedelta(days=ARTIFACT_RETENTION_DAYS)
+    result = await db.execute(select(RDFGeneration).where(RDFGeneration.created_at < cutoff))
+    expired = result.scalars().all()
+    for generation in expired:
+        await _delete_generation(db, generation)
+    await db.commit()
+    return len(expired)
+
+
+def _file_available(file: RDFFile) -> bool:
+    path = Path(file.path)
+    if path.exists():
+        return True
+    # Deferred UML diagrams are rendered on request
+    return file.type in shape_service.UML_FILE_TYPES and get_shared_state().get(
+        shape_service.DEFERRED_UML_NAMESPACE, str(path.resolve())
+    ) is not None
+
+
+async def _reconcile(db) -> Dict[str, int]:
+    """Make database rows and shared state match the files on disk."""
+    counts = {"generations": 0, "files": 0, "records": 0}
+    files = {file.id: file for file in (await db.execute(select(RDFFile))).scalars().all()}
+    generations = (await db.execute(select(RDFGeneration))).scalars().all()
+
+    referenced = set()
+    for generation in generations:
+        entries = generation.generated_files or []
+        referenced.update(entry.get("id") for entry in entries)
+        main = next((files.get(entry.get("id")) for entry in entries if entry.get("type") == "RDF"), None)
+        if main is None or not Path(main.path).exists():
+            # The graph itself is gone, nothing of the generation can be served
+            await _delete_generation(db, generation)
+            counts["generations"] += 1
+            continue
+        missing = [entry for entry in entries if entry.get("id") not in files or not _file_available(files[entry.get("id")])]
+        if missing:
+            missing_ids = [entry.get("id") for entry in missing]
+            await db.execute(delete(RDFFile).where(RDFFile.id.in_(missing_ids)))
+            generation.generated_files = [entry for entry in entries if entry.get("id") not in missing_ids]
+            counts["files"] += len(missing)
+
+    # File rows of no generation (a generation that failed after persisting some of its files)
+    grace = datetime.utcnow() - timedelta(seconds=ORPHAN_GRACE)
+    orphans = [
+        file_id for file_id, file in files.items()
+        if file_id not in referenced and file.created_at is not None and file.created_at < grace
+    ]
+    if orphans:
+        await db.execute(delete(RDFFile).where(RDFFile.id.in_(orphans)))
+        counts["files"] += len(orphans)
+    await db.commit()
+
+    # Shared state records of generations without a row
+    known = {generation.generation_id for generation in generations}
+    service = rdf_service.RDFService(db)
+    for generation_id, record in _generation_records().items():
+        created_at = record.get("created_at")
+        if generation_id not in known and created_at is not None and created_at < datetime.now() - timedelta(seconds=ORPHAN_GRACE):
+            await service.delete_generation(generation_id, [], record.get("user_id"))
+            counts["records"] += 1
+    return counts
+
+
+def _remove_unreferenced(referenced_paths: List[str]) -> int:
+    """Remove output directories, legacy directories and temporary files nothing refers to. Returns the bytes freed."""
+    state = get_shared_state()
+    now = time.time()
+    in_use = {Path(path).resolve().parent for path in referenced_paths}
+    in_use.update(Path(record["rdf_path"]).resolve().parent for record in _generation_records().values())
+    building = set(state.keys(generation_cache.BUILDS_NAMESPACE))
+
+    candidates = []
+    for root in (state.artifact_dir("rdf"), LEGACY_RDF_DIR):
+        if root.is_dir():
+            candidates += [
+                path for path in root.iterdir()
+                if path.resolve() not in in_use and path.name not in building
+                and _age(path, now) > ORPHAN_GRACE
+            ]
+    # Files only: LEGACY_RDF_DIR lives in the same directory and is swept per entry above
+    temp_dir = Path(tempfile.gettempdir())
+    candidates += [
+        path for pattern in LEAKED_ARCHIVE_PATTERNS for path in temp_dir.glob(pattern)
+        if path.is_file() and _age(path, now) > TEMP_MAX_AGE
+    ]
+
+    freed = 0
+    for path in candidates:
+        freed += _size(path)
+        _remove(path)
+    # Registrations of artifacts removed with their directory
+    for key in state.keys(REGENERABLE_NAMESPACE):
+        if not Path(key).exists():
+            state.delete(REGENERABLE_NAMESPACE, key)
+    return freed
+
+
+async def sweep(db) -> Dict:
+    """One sweep: retention, reconciliation, unreferenced files, the global quota and usage metrics."""
+    started = time.perf_counter()
+    report = {"expired_generations": await _apply_retention(db)}
+    report.update({f"removed_{name}": count for name, count in (await _reconcile(db)).items()})
+
+    paths = (await db.execute(select(RDFFile.path))).scalars().all()
+    loop = asyncio.get_running_loop()
+    report["unreferenced_bytes"] = await loop.run_in_executor(None, _remove_unreferenced, paths)
+
+    usage = await loop.run_in_executor(None, storage_usage)
+    if _total(usage) > ARTIFACT_QUOTA_BYTES:
+        report["evicted_bytes"] = await loop.run_in_executor(None, evict, _total(usage) - ARTIFACT_QUOTA_BYTES)
+        usage = await loop.run_in_executor(None, storage_usage)
+        if _total(usage) > ARTIFACT_QUOTA_BYTES:
+            logger.warning(f"⚠️ Artifact store over quota after eviction: {_total(usage) / GIB:.2f} GiB")
+
+    report["duration"] = round(time.perf_counter() - started, 3)
+    get_shared_state().set(USAGE_NAMESPACE, "global", {"usage": usage, "swept_at": datetime.now(), "report": report})
+    logger.info(f"🧹 Artifact sweep: {report}, usage {_total(usage) / GIB:.2f} GiB")
+    return report
+
+
+async def run_sweeper(session_factory) -> None:
+    """Sweep periodically. Every worker runs this, one of them sweeps per interval."""
+    while True:
+        try:
+            if get_shared_state().add(SWEEP_NAMESPACE, "sweep", os.getpid(), ttl=ARTIFACT_SWEEP_INTERVAL * 0.9):
+                async with session_factory() as db:
+                    await sweep(db)
+        except Exception as e:
+            logger.error(f"❌ Artifact sweep failed: {e}")
+        await asyncio.sleep(ARTIFACT_SWEEP_INTERVAL)
+
+
+def usage_report(user_id: int) -> Dict:
+    """Storage metrics for a user and for the whole store (as of the last sweep)."""
+    user_bytes, generations = user_usage(user_id)
+    snapshot = get_shared_state().get(USAGE_NAMESPACE, "global")
+    usage = snapshot["usage"] if snapshot else storage_usage()
+    return {
+        "user": {"bytes": user_bytes, "quota_bytes": ARTIFACT_USER_QUOTA_BYTES, "generations": generations},
+        "store": {
+            "bytes": _total(usage),
+            "quota_bytes": ARTIFACT_QUOTA_BYTES,
+            "areas": usage,
+            "swept_at": snapshot["swept_at"] if snapshot else None,
+            "last_sweep": snapshot["report"] if snapshot else None,
+        },
+        "retention_days": ARTIFACT_RETENTION_DAYS or None,
+    }
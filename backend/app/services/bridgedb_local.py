@@ -0,0 +1,258 @@
+"""
+Offline BridgeDb identifier mapping.
+
+A BridgeDb mapping database export (the `link` table as a TSV with the columns
+idLeft, codeLeft, idRight, codeRight) is loaded once into SQLite with covering indexes,
+then xref batches are answered in-process with the same output as `id_mapper.bridgedb_xref`.
+
+    python -m app.services.bridgedb_local build Hs_Derby_Ensembl.tsv bridgedb_human.sqlite
+    python -m app.services.bridgedb_local record Human En identifiers.txt recorded_response.tsv
+    python -m app.services.bridgedb_local parity bridgedb_human.sqlite recorded_response.tsv
+"""
+import argparse
+import csv
+import datetime
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+import requests
+
+from .lazy_imports import lazy_import
+
+id_mapper = lazy_import("pyBiodatafuse.id_mapper")
+Cons = lazy_import("pyBiodatafuse.constants")
+
+# "remote" uses the BridgeDb web service, "local" the database at BRIDGEDB_LOCAL_DB.
+# The path may contain {species}, e.g. /data/bridgedb/{species}.sqlite
+BRIDGEDB_BACKEND = os.getenv("BRIDGEDB_BACKEND", "remote")
+BRIDGEDB_LOCAL_DB = os.getenv("BRIDGEDB_LOCAL_DB", "./data/bridgedb/{species}.sqlite")
+
+LINK_COLUMNS = ["idLeft", "codeLeft", "idRight", "codeRight"]
+LOAD_BATCH_ROWS = 500_000
+
+_mappers: Dict[str, "LocalBridgeDbMapper"] = {}
+_mappers_lock = threading.Lock()
+
+
+def build_database(link_file: Path, db_path: Path) -> int:
+    """Load a TSV export of the BridgeDb `link` table into an indexed SQLite database. Returns the row count."""
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(db_path)
+    try:
+        connection.executescript(
+            """
+            PRAGMA journal_mode = OFF;
+            PRAGMA synchronous = OFF;
+            DROP TABLE IF EXISTS link;
+            CREATE TABLE link (idLeft TEXT, codeLeft TEXT, idRight TEXT, codeRight TEXT);
+            """
+        )
+        rows = 0
+        for chunk in pd.read_csv(link_file, sep="\t", dtype=str, usecols=LINK_COLUMNS, chunksize=LOAD_BATCH_ROWS):
+            chunk = chunk.dropna()
+            connection.executemany("INSERT INTO link VALUES (?, ?, ?, ?)", chunk[LINK_COLUMNS].itertuples(index=False))
+            rows += len(chunk)
+
+        # Both lookups (xref -> main id, main id -> xrefs) are answered from the indexes alone
+        connection.executescript(
+            """
+            CREATE INDEX link_right ON link (idRight, codeRight, idLeft, codeLeft);
+            CREATE INDEX link_left ON link (idLeft, codeLeft, idRight, codeRight);
+            ANALYZE;
+            """
+        )
+        connection.commit()
+        return rows
+    finally:
+        connection.close()
+
+
+class LocalBridgeDbMapper:
+    """Answers BridgeDb xref batches from a local SQLite mapping database."""
+
+    def __init__(self, db_path: Path):
+        if not db_path.exists():
+            raise FileNotFoundError(f"BridgeDb mapping database not found: {db_path}")
+        self.db_path = db_path
+        # Opened read-only and memory-mapped; one connection per thread
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False)
+            connection.execute("PRAGMA mmap_size = 4294967296")
+            connection.execute("PRAGMA temp_store = MEMORY")
+            self._local.connection = connection
+        return connection
+
+    def xrefs(self, identifiers: List[str], system_code: str) -> List[Tuple[str, str, str]]:
+        """(identifier, target id, target system code) for every xref of the identifiers."""
+        connection = self._connection()
+        connection.execute("CREATE TEMP TABLE IF NOT EXISTS query (id TEXT PRIMARY KEY, code TEXT)")
+        connection.execute("DELETE FROM temp.query")
+        connection.executemany(
+            "INSERT OR IGNORE INTO temp.query VALUES (?, ?)", ((i, system_code) for i in identifiers)
+        )
+        rows = connection.execute(
+            """
+            WITH main AS (
+                SELECT q.id AS query, l.idLeft AS id, l.codeLeft AS code
+                FROM temp.query q JOIN link l ON l.idRight = q.id AND l.codeRight = q.code
+                UNION
+                SELECT q.id, l.idLeft, l.codeLeft
+                FROM temp.query q JOIN link l ON l.idLeft = q.id AND l.codeLeft = q.code
+            )
+            SELECT m.query, l.idRight, l.codeRight
+            FROM main m JOIN link l ON l.idLeft = m.id AND l.codeLeft = m.code
+            UNION
+            SELECT query, id, code FROM main
+            """
+        ).fetchall()
+        connection.execute("DELETE FROM temp.query")
+        return rows
+
+
+def get_local_mapper(input_species: str) -> LocalBridgeDbMapper:
+    db_path = Path(BRIDGEDB_LOCAL_DB.format(species=input_species))
+    key = str(db_path)
+    with _mappers_lock:
+        if key not in _mappers:
+            _mappers[key] = LocalBridgeDbMapper(db_path)
+        return _mappers[key]
+
+
+def local_bridgedb_xref(
+    identifiers: pd.DataFrame,
+    input_species: Optional[str] = None,
+    output_datasource: Optional[list] = None,
+    input_datasource: str = "HGNC",
+) -> Tuple[pd.DataFrame, dict]:
+    """Drop-in replacement for `id_mapper.bridgedb_xref` that maps against the local database."""
+    if input_species is None:
+        input_species = "Human"
+    if len(identifiers) < 1:
+        raise ValueError("Please provide at least one identifier datasource, e.g. HGNC")
+
+    data_sources = id_mapper.read_datasource_file()
+    selected = data_sources[data_sources[Cons.SOURCE_COL] == input_datasource]
+    input_source, input_type = selected["systemCode"].iloc[0], selected["type"].iloc[0]
+    # Same as the web service path: every datasource of the input type
+    output_datasource = data_sources[data_sources["type"] == input_type][Cons.SOURCE_COL].tolist()
+
+    mapper = get_local_mapper(input_species)
+    start_time = datetime.datetime.now()
+    rows = mapper.xrefs(identifiers[Cons.IDENTIFIER_COL].astype(str).tolist(), input_source)
+    end_time = datetime.datetime.now()
+
+    bridgedb = pd.DataFrame(rows, columns=[Cons.IDENTIFIER_COL, Cons.TARGET_COL, "code"])
+    # The data source name, as the web service path returns it (not the system code sent in the query)
+    bridgedb.insert(1, Cons.IDENTIFIER_SOURCE_COL, input_datasource)
+    bridgedb[Cons.TARGET_SOURCE_COL] = bridgedb.pop("code").map(
+        data_sources.set_index("systemCode")[Cons.SOURCE_COL]
+    )
+    bridgedb = bridgedb.dropna(subset=[Cons.TARGET_SOURCE_COL])
+    bridgedb_subset = bridgedb[bridgedb[Cons.TARGET_SOURCE_COL].isin(output_datasource)].drop_duplicates()
+
+    identifiers = identifiers.copy()
+    identifiers.columns = [
+        "{}{}".format(c, "" if c in "identifier" else "_dea") for c in identifiers.columns
+    ]
+    bridgedb_subset = bridgedb_subset.merge(identifiers, on=Cons.IDENTIFIER_COL)
+
+    bridgedb_metadata = {
+        "datasource": Cons.BRIDGEDB,
+        "metadata": {
+            "source_version": {"backend": "local", "database": mapper.db_path.name},
+            "data_version": [],
+        },
+        "query": {
+            "size": len(identifiers),
+            "input_type": input_datasource,
+            "time": str(end_time - start_time),
+            "date": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "url": mapper.db_path.as_uri() if mapper.db_path.is_absolute() else str(mapper.db_path),
+        },
+    }
+    return bridgedb_subset, bridgedb_metadata
+
+
+def bridgedb_xref(*args, **kwargs) -> Tuple[pd.DataFrame, dict]:
+    """Map with the backend chosen for this deployment (BRIDGEDB_BACKEND)."""
+    if BRIDGEDB_BACKEND == "local":
+        return local_bridgedb_xref(*args, **kwargs)
+    return id_mapper.bridgedb_xref(*args, **kwargs)
+
+
+def record_response(input_species: str, system_code: str, identifiers: List[str], recorded_response: Path) -> None:
+    """Save the web service's `xrefsBatch` response for some identifiers, for parity_check."""
+    post_con = "".join(f"{identifier}\t{system_code}\n" for identifier in identifiers)
+    response = requests.post(url=f"{Cons.BRIDGEDB_ENDPOINT}/{input_species}/xrefsBatch", data=post_con.encode())
+    response.raise_for_status()
+    recorded_response.write_bytes(response.content)
+
+
+def parity_check(mapper: LocalBridgeDbMapper, recorded_response: Path) -> Dict[str, int]:
+    """
+    Compare local xrefs with a recorded `xrefsBatch` web-service response
+    (lines of identifier, data source name or system code and comma-separated code:id targets).
+    """
+    data_sources = id_mapper.read_datasource_file()
+    codes = dict(zip(data_sources[Cons.SOURCE_COL], data_sources["systemCode"]))
+    expected: Dict[Tuple[str, str], set] = {}
+    with open(recorded_response, newline="") as response:
+        for parts in csv.reader(response, delimiter="\t"):
+            if len(parts) < 3:
+                continue
+            targets = expected.setdefault((parts[0], codes.get(parts[1], parts[1])), set())
+            for target in parts[2].split(","):
+                code, _, target_id = target.partition(":")
+                if target_id:
+                    targets.add((target_id, code))
+
+    report = {"identifiers": len(expected), "matching": 0, "missing_xrefs": 0, "extra_xrefs": 0}
+    by_code: Dict[str, List[str]] = {}
+    for identifier, code in expected:
+        by_code.setdefault(code, []).append(identifier)
+    for code, identifiers in by_code.items():
+        local: Dict[str, set] = {identifier: set() for identifier in identifiers}
+        for identifier, target_id, target_code in mapper.xrefs(identifiers, code):
+            local[identifier].add((target_id, target_code))
+        for identifier in identifiers:
+            wanted = expected[(identifier, code)]
+            report["missing_xrefs"] += len(wanted - local[identifier])
+            report["extra_xrefs"] += len(local[identifier] - wanted)
+            report["matching"] += int(wanted == local[identifier])
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local BridgeDb mapping database tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="load a TSV export of the link table into SQLite")
+    build.add_argument("link_file", type=Path)
+    build.add_argument("db_path", type=Path)
+    record = commands.add_parser("record", help="save the web service's xrefsBatch response for some identifiers")
+    record.add_argument("species")
+    record.add_argument("system_code")
+    record.add_argument("identifiers_file", type=Path, help="one identifier per line")
+    record.add_argument("recorded_response", type=Path)
+    parity = commands.add_parser("parity", help="compare against a recorded xrefsBatch response")
+    parity.add_argument("db_path", type=Path)
+    parity.add_argument("recorded_response", type=Path)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        print(f"Loaded {build_database(args.link_file, args.db_path):,} links into {args.db_path}")
+    elif args.command == "record":
+        identifiers = [line.strip() for line in args.identifiers_file.read_text().splitlines() if line.strip()]
+        record_response(args.species, args.system_code, identifiers, args.recorded_response)
+        print(f"Recorded xrefs of {len(identifiers)} identifiers into {args.recorded_response}")
+    else:
+        report = parity_check(LocalBridgeDbMapper(args.db_path), args.recorded_response)
+        print(report)
+        raise SystemExit(0 if report["matching"] == report["identifiers"] else 1)
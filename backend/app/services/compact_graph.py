@@ -0,0 +1,255 @@
+import copy
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import networkx as nx
+import pandas as pd
+from scipy import sparse
+
+from .lazy_imports import lazy_import
+
+generator = lazy_import("pyBiodatafuse.graph.generator")
+
+
+def _codes(values: Iterable[str]) -> Tuple[np.ndarray, List[str]]:
+    """Encode strings as small integer codes plus the code -> value table."""
+    table: Dict[str, int] = {}
+    codes = np.fromiter((table.setdefault(value, len(table)) for value in values), dtype=np.int32)
+    return codes, list(table)
+
+
+class AttributeColumn:
+    """One attribute over all nodes (or edges): int32 codes into a table of distinct values, -1 where unset."""
+
+    __slots__ = ("codes", "values")
+
+    def __init__(self, codes: np.ndarray, values: List[Any]):
+        self.codes = codes
+        self.values = values
+
+    def get(self, i: int, default=None):
+        code = self.codes[i]
+        return default if code < 0 else self.values[code]
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes
+
+
+def _columns(records: Iterable[Dict[str, Any]], size: int) -> Dict[str, AttributeColumn]:
+    codes: Dict[str, np.ndarray] = {}
+    tables: Dict[str, List[Any]] = {}
+    lookups: Dict[str, Dict[Any, int]] = {}
+
+    for i, data in enumerate(records):
+        for key, value in data.items():
+            column = codes.get(key)
+            if column is None:
+                column = codes[key] = np.full(size, -1, dtype=np.int32)
+                tables[key], lookups[key] = [], {}
+            table, lookup = tables[key], lookups[key]
+            try:
+                # Keyed by type as well, so True / 1 / 1.0 stay distinct values
+                code = lookup.setdefault((value.__class__, value), len(table))
+                if code == len(table):
+                    table.append(value)
+            except TypeError:
+                # Unhashable values (lists, dicts) are copied once per element
+                code = len(table)
+                table.append(copy.deepcopy(value))
+            column[i] = code
+
+    return {key: AttributeColumn(codes[key], tables[key]) for key in codes}
+
+
+def _materialize(value):
+    # Hashable values are immutable and can be shared, containers are copied per graph
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return copy.deepcopy(value)
+
+
+class CompactGraph:
+    """
+    Array-backed directed multigraph.
+
+    Node ids are kept once in a string table and referenced by position; edges are int32
+    arrays sorted by source (CSR, `out_indptr`), with node/edge types and sources as small
+    int codes and every other attribute as an `AttributeColumn`. Incident edges in both
+    directions are indexed as a second CSR table for neighborhood queries.
+    """
+
+    def __init__(
+        self,
+        node_ids: List[str],
+        edge_src: np.ndarray,
+        edge_dst: np.ndarray,
+        node_columns: Dict[str, AttributeColumn],
+        edge_columns: Dict[str, AttributeColumn],
+        edge_keys: AttributeColumn,
+    ):
+        self.node_ids = node_ids
+        self.position = {node: i for i, node in enumerate(node_ids)}
+        n = len(node_ids)
+
+        # Keep edges sorted by source node, the order is stable so parallel edges keep their key order
+        order = np.argsort(edge_src, kind="stable")
+        self.edge_src = edge_src[order].astype(np.int32)
+        self.edge_dst = edge_dst[order].astype(np.int32)
+        self.edge_columns = {key: AttributeColumn(c.codes[order], c.values) for key, c in edge_columns.items()}
+        self.edge_keys = AttributeColumn(edge_keys.codes[order], edge_keys.values)
+        self.node_columns = node_columns
+
+        self.out_indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.edge_src, minlength=n), out=self.out_indptr[1:])
+
+        self.node_type, self.node_type_names = _codes(
+            str(self.node_attribute(i, "labels", "label", default="Unknown")) for i in range(n)
+        )
+        self.node_source, self.node_source_names = _codes(
+            str(self.node_attribute(i, "datasource", default="Unknown")) for i in range(n)
+        )
+        self.edge_type, self.edge_type_names = _codes(
+            str(self.edge_attribute(e, "labels", "label", default="Unknown")) for e in range(self.edge_count)
+        )
+
+        # Incident edges in both directions, grouped by node
+        endpoints = np.concatenate([self.edge_src, self.edge_dst])
+        edge_ids = np.tile(np.arange(self.edge_count, dtype=np.int32), 2)
+        incident_order = np.argsort(endpoints, kind="stable")
+        self.incident_edges = edge_ids[incident_order]
+        self.incident_indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(endpoints, minlength=n), out=self.incident_indptr[1:])
+
+        self._by_name: Optional[Dict[str, List[int]]] = None
+
+    @classmethod
+    def from_networkx(cls, pygraph: nx.MultiDiGraph) -> "CompactGraph":
+        node_ids = list(pygraph.nodes())
+        position = {node: i for i, node in enumerate(node_ids)}
+        edge_count = pygraph.number_of_edges()
+
+        node_columns = _columns((data for _, data in pygraph.nodes(data=True)), len(node_ids))
+        edge_columns = _columns((data for _, _, data in pygraph.edges(data=True)), edge_count)
+        edge_keys = _columns(({"key": k} for _, _, k in pygraph.edges(keys=True)), edge_count).get(
+            "key", AttributeColumn(np.zeros(0, dtype=np.int32), [])
+        )
+
+        edge_src = np.fromiter((position[u] for u, _ in pygraph.edges()), dtype=np.int32, count=edge_count)
+        edge_dst = np.fromiter((position[v] for _, v in pygraph.edges()), dtype=np.int32, count=edge_count)
+        return cls(node_ids, edge_src, edge_dst, node_columns, edge_columns, edge_keys)
+
+    @classmethod
+    def from_dataframe(cls, combined_df: pd.DataFrame, disease_compound: Optional[pd.DataFrame] = None) -> "CompactGraph":
+        """
+        Graph of a combined annotation table. pyBiodatafuse merges nodes and deduplicates edges
+        on a mutable NetworkX graph while it builds, so that graph exists here only as scratch
+        space: it is converted and dropped before this returns.
+        """
+        return cls.from_networkx(generator.build_networkx_graph(combined_df, disease_compound))
+
+    @property
+    def node_count(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.edge_src)
+
+    def node_attribute(self, i: int, *names: str, default=None):
+        """First attribute of `names` that is set on node `i`."""
+        for name in names:
+            column = self.node_columns.get(name)
+            if column is not None and column.codes[i] >= 0:
+                return column.values[column.codes[i]]
+        return default
+
+    def edge_attribute(self, e: int, *names: str, default=None):
+        for name in names:
+            column = self.edge_columns.get(name)
+            if column is not None and column.codes[e] >= 0:
+                return column.values[column.codes[e]]
+        return default
+
+    def node_attributes(self, i: int) -> Dict[str, Any]:
+        return {
+            key: _materialize(column.values[column.codes[i]])
+            for key, column in self.node_columns.items()
+            if column.codes[i] >= 0
+        }
+
+    def edge_attributes(self, e: int) -> Dict[str, Any]:
+        return {
+            key: _materialize(column.values[column.codes[e]])
+            for key, column in self.edge_columns.items()
+            if column.codes[e] >= 0
+        }
+
+    def out_edges(self, i: int) -> np.ndarray:
+        return np.arange(self.out_indptr[i], self.out_indptr[i + 1])
+
+    def incident(self, nodes: np.ndarray) -> np.ndarray:
+        """Ids of the edges touching any of `nodes` (an edge between two of them is listed twice)."""
+        nodes = np.asarray(nodes, dtype=np.int64)
+        starts, ends = self.incident_indptr[nodes], self.incident_indptr[nodes + 1]
+        lengths = ends - starts
+        total = int(lengths.sum())
+        if total == 0:
+            return np.zeros(0, dtype=np.int32)
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+        return self.incident_edges[offsets]
+
+    @property
+    def by_name(self) -> Dict[str, List[int]]:
+        """Lowercased node name -> node positions, built on first use."""
+        if self._by_name is None:
+            by_name: Dict[str, List[int]] = {}
+            column = self.node_columns.get("name")
+            if column is not None:
+                for i, code in enumerate(column.codes):
+                    if code >= 0 and column.values[code]:
+                        by_name.setdefault(str(column.values[code]).lower(), []).append(i)
+            self._by_name = by_name
+        return self._by_name
+
+    def adjacency(self) -> sparse.csr_matrix:
+        """Directed adjacency matrix, parallel edges are summed into the entry weight."""
+        n = self.node_count
+        # Built from COO: a CSR matrix over edge_dst/out_indptr would share them, and summing
+        # duplicates sorts its indices in place, scrambling the graph's own edge arrays
+        adjacency = sparse.coo_matrix(
+            (np.ones(self.edge_count), (self.edge_src, self.edge_dst)), shape=(n, n)
+        )
+        return adjacency.tocsr()
+
+    def to_networkx(self, nodes: Optional[np.ndarray] = None, edges: Optional[np.ndarray] = None) -> nx.MultiDiGraph:
+        """
+        Detached NetworkX copy of the whole graph or of the selected nodes/edges, for library
+        calls that need one. Safe to hand to converters that mutate attributes.
+        """
+        nodes = range(self.node_count) if nodes is None else nodes
+        edges = range(self.edge_count) if edges is None else edges
+
+        pygraph = nx.MultiDiGraph()
+        pygraph.add_nodes_from((self.node_ids[i], self.node_attributes(i)) for i in nodes)
+        pygraph.add_edges_from(
+            (
+                self.node_ids[self.edge_src[e]],
+                self.node_ids[self.edge_dst[e]],
+                self.edge_keys.get(e),
+                self.edge_attributes(e),
+            )
+            for e in edges
+        )
+        return pygraph
+
+    def nbytes(self) -> int:
+        """Approximate memory held by the arrays (attribute value tables are shared and not included)."""
+        arrays = [
+            self.edge_src, self.edge_dst, self.out_indptr, self.incident_edges, self.incident_indptr,
+            self.node_type, self.node_source, self.edge_type, self.edge_keys.codes,
+        ]
+        columns = list(self.node_columns.values()) + list(self.edge_columns.values())
+        return sum(a.nbytes for a in arrays) + sum(c.nbytes for c in columns)
@@ -1,12 +1,14 @@
 from pathlib import Path
-from pyBiodatafuse.graph import cytoscape as cytoscape_graph
-from py4cytoscape import cytoscape_ping
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from .graph_service import GraphService
+from .lazy_imports import lazy_import
 from .. import models
 import json
 
+cytoscape_graph = lazy_import("pyBiodatafuse.graph.cytoscape")
+cytoscape_ping = lazy_import("py4cytoscape", "cytoscape_ping")
+
 class CytoscapeService:
     def __init__(self, db: AsyncSession):
         self.db = db
@@ -24,11 +26,11 @@ class CytoscapeService:
         self.db.add(cytoscape)
         await self.db.commit()
 
-        pygraph, error = GraphService.create_pygraph(annotations, graph_dir)
+        graph, error = GraphService.get_compact_graph(annotations, graph_dir)
         if error:
                 return None, f"Graph error: {error}"
 
-        cytoscape_graph_json = cytoscape_graph.convert_graph_to_json(pygraph)
+        cytoscape_graph_json = cytoscape_graph.convert_graph_to_json(graph.to_networkx())
         cytoscape.cytoscape_graph = cytoscape_graph_json
         cytoscape.status = "completed"
 
@@ -45,25 +47,25 @@ class CytoscapeService:
                     "message": "Cytoscape is not running or REST API is unreachable. Please ensure Cytoscape desktop is open."
                 }
 
-            pygraph, error = GraphService.create_pygraph(annotations, graph_dir)
+            graph, error = GraphService.get_compact_graph(annotations, graph_dir)
             if error:
                 return {"success": False, "message": error}
 
-            cytoscape_graph.load_graph(pygraph, network_name=graph_name)
+            cytoscape_graph.load_graph(graph.to_networkx(), network_name=graph_name)
             return {"success": True, "message": f"Graph loaded into Cytoscape as '{graph_name}'."}
         except Exception as e:
             return {"success": False, "message": f"Error loading graph into Cytoscape: {str(e)}"}
         
     async def get_cytoscape_json(self, annotations: models.Annotation, graph_dir: Path):
         try:
-            pygraph, error = GraphService.create_pygraph(annotations, graph_dir)
+            graph, error = GraphService.get_compact_graph(annotations, graph_dir)
             if error:
                 return None, error
 
-            if not pygraph.nodes() and not pygraph.edges():
+            if graph.node_count == 0 and graph.edge_count == 0:
                 return None, "The generated graph is empty (no nodes or edges)."
 
-            raw_graph = cytoscape_graph.convert_graph_to_json(pygraph)
+            raw_graph = cytoscape_graph.convert_graph_to_json(graph.to_networkx())
             elements_only = raw_graph.get("elements")
             cytoscape_json_data = {"elements": elements_only}
 
@@ -6,33 +6,30 @@ import warnings
 
 import aiohttp
 import pandas as pd
-from pyBiodatafuse.annotators import (
-    bgee,
-    disgenet,
-    minerva,
-    molmedb,
-    opentargets,
-    pubchem,
-    stringdb,
-    wikipathways,
-    kegg,
-    aopwiki,
-    intact,
-    mitocarta
-)
-from pyBiodatafuse.utils import (
-    combine_sources,
-    create_harmonized_input_file,
-    create_or_append_to_metadata,
-)
-import pyBiodatafuse.constants as constants
-from pyBiodatafuse.graph import generator
-
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from . import reference_data
+from .lazy_imports import lazy_import
+from .merge_engine import merge_sources
 from .. import models
 
+bgee = lazy_import("pyBiodatafuse.annotators.bgee")
+disgenet = lazy_import("pyBiodatafuse.annotators.disgenet")
+minerva = lazy_import("pyBiodatafuse.annotators.minerva")
+molmedb = lazy_import("pyBiodatafuse.annotators.molmedb")
+opentargets = lazy_import("pyBiodatafuse.annotators.opentargets")
+pubchem = lazy_import("pyBiodatafuse.annotators.pubchem")
+stringdb = lazy_import("pyBiodatafuse.annotators.stringdb")
+wikipathways = lazy_import("pyBiodatafuse.annotators.wikipathways")
+kegg = lazy_import("pyBiodatafuse.annotators.kegg")
+aopwiki = lazy_import("pyBiodatafuse.annotators.aopwiki")
+intact = lazy_import("pyBiodatafuse.annotators.intact")
+create_harmonized_input_file = lazy_import("pyBiodatafuse.utils", "create_harmonized_input_file")
+create_or_append_to_metadata = lazy_import("pyBiodatafuse.utils", "create_or_append_to_metadata")
+constants = lazy_import("pyBiodatafuse.constants")
+generator = lazy_import("pyBiodatafuse.graph.generator")
+
 
 class DataSourceService:
     def __init__(self, db: AsyncSession):
@@ -360,12 +357,10 @@ class DataSourceService:
                             dataframes.append(intact_compound_df)
                             metadata.append(intact_compound_metadata)
                         elif source_name == "mitocarta":
-                            mitocarta_df, mitocarta_metadata = mitocarta.get_gene_mito_pathways(
+                            # Converted once from the MitoCarta workbook, then served from the indexed table
+                            mitocarta_df, mitocarta_metadata = reference_data.get_gene_mito_pathways(
                                 bridgedb_df=bridgedb_df,
-                                mitocarta_file="Human.MitoCarta3.0.xls",
-                                filename="human_mitocarta3.0.xls",
                                 species="hsapiens",
-                                sheet_name="A Human MitoCarta3.0"
                             )
                             dataframes.append(mitocarta_df)
                             metadata.append(mitocarta_metadata)
@@ -382,7 +377,7 @@ class DataSourceService:
             filtered_warnings = [warning for warning in warning_messages if warning.startswith("There is no annotation for your input list")]
 
             # Combine all dataframes
-            combined_df = combine_sources(bridgedb_df, dataframes)
+            combined_df = merge_sources(bridgedb_df, dataframes)
             # List of potenitail metadata
             combined_metadata = create_or_append_to_metadata(bridgedb_metadata, metadata)
 
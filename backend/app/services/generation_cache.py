@@ -0,0 +1,110 @@
+"""
+Content-addressed RDF generation outputs.
+
+The files of a generation (graph, store, shapes and everything derived from them later) live in
+a directory named after a hash of the annotation content and of every parameter that changes
+them. A request whose hash was generated before reuses that directory: it only gets new file
+records pointing at the existing files.
+
+Outputs are reference counted in the shared state, one key per generation using them, so
+references can be added and dropped atomically from any worker. The directory is removed when
+its last generation is deleted.
+"""
+import hashlib
+import json
+import logging
+import shutil
+import uuid
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .shared_state import get_shared_state
+
+logger = logging.getLogger(__name__)
+
+OUTPUTS_NAMESPACE = "rdf_outputs"
+REFERENCES_NAMESPACE = "rdf_output_refs"
+BUILDS_NAMESPACE = "rdf_output_builds"
+# A build not finished after this long (a crashed worker) no longer blocks others
+BUILD_CLAIM_TTL = 3600
+
+
+def _generator_version() -> str:
+    try:
+        return version("pyBiodatafuse")
+    except PackageNotFoundError:
+        return "unknown"
+
+
+def output_key(combined_df: Any, combined_metadata: Any, parameters: Dict[str, Any]) -> str:
+    """Hash of everything that determines a generation's files."""
+    digest = hashlib.sha256()
+    for part in (combined_df, combined_metadata, parameters, _generator_version()):
+        digest.update(json.dumps(part, sort_keys=True, default=str).encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def output_dir(key: str) -> Path:
+    return get_shared_state().artifact_dir("rdf", key)
+
+
+def claim_build(key: str, generation_id: str) -> bool:
+    """Whether this generation builds the output, False if another one is building it right now."""
+    return get_shared_state().add(BUILDS_NAMESPACE, key, generation_id, ttl=BUILD_CLAIM_TTL)
+
+
+def publish(key: str, generation_id: str, files: List[Dict[str, str]], record: Dict[str, Any]) -> None:
+    """Make a finished build reusable. `files` are name/path/type dicts, `record` the generation's paths."""
+    state = get_shared_state()
+    state.set(REFERENCES_NAMESPACE, f"{key}/{generation_id}", True)
+    state.set(OUTPUTS_NAMESPACE, key, {"files": files, "record": record})
+    state.delete(BUILDS_NAMESPACE, key)
+
+
+def abandon_build(key: str) -> None:
+    get_shared_state().delete(BUILDS_NAMESPACE, key)
+
+
+def acquire(key: str, generation_id: str) -> Optional[Dict[str, Any]]:
+    """Reference a published output for a generation. None (and no reference) if there is none."""
+    state = get_shared_state()
+    reference = f"{key}/{generation_id}"
+    # Referenced before it is read, so a concurrent release either sees this reference or removed the entry first
+    state.set(REFERENCES_NAMESPACE, reference, True)
+    output = state.get(OUTPUTS_NAMESPACE, key)
+    if output is None or not Path(output["record"]["rdf_path"]).exists():
+        state.delete(REFERENCES_NAMESPACE, reference)
+        return None
+    return output
+
+
+def references(key: str) -> int:
+    return sum(1 for reference in get_shared_state().keys(REFERENCES_NAMESPACE) if reference.startswith(f"{key}/"))
+
+
+def release(key: str, generation_id: str) -> None:
+    """Drop a generation's reference, removing the output once nothing references it."""
+    state = get_shared_state()
+    state.delete(REFERENCES_NAMESPACE, f"{key}/{generation_id}")
+    if references(key):
+        return
+    output = state.get(OUTPUTS_NAMESPACE, key)
+    state.delete(OUTPUTS_NAMESPACE, key)
+    if references(key):
+        # Acquired meanwhile: it read the entry before we removed it
+        if output is not None:
+            state.set(OUTPUTS_NAMESPACE, key, output)
+        return
+    if not claim_build(key, "release"):
+        return  # being rebuilt, the build reuses the directory
+    try:
+        directory = output_dir(key)
+        # Moved aside first, a build of the same key starts from an empty directory
+        trash = directory.with_name(f".{key}.{uuid.uuid4().hex}.deleted")
+        directory.rename(trash)
+    finally:
+        abandon_build(key)
+    shutil.rmtree(trash, ignore_errors=True)
+    logger.info(f"🗑️ Removed unreferenced RDF output {key[:12]}")
@@ -1,37 +1,63 @@
+from collections import OrderedDict
 from pathlib import Path
+import threading
 import pandas as pd
-import networkx as nx
-from typing import Optional, Tuple, Dict, Any
+from typing import Optional, Tuple
 
-from pyBiodatafuse.graph import saver
+from .compact_graph import CompactGraph
 from ..models import Annotation
 
+# Graphs built from an annotation never change, so they are cached per annotation version
+# in compact form (a few bytes per element instead of a dict per node and edge)
+GRAPH_CACHE_SIZE = 8
+_graph_cache: "OrderedDict[str, CompactGraph]" = OrderedDict()
+_graph_cache_lock = threading.Lock()
+
 
 class GraphService:
     @staticmethod
-    def create_pygraph(
-        annotations: Annotation,
-        graph_dir: Path
-    ) -> Tuple[Optional[nx.MultiDiGraph], Optional[str]]:
+    def graph_version(annotations: Annotation) -> str:
+        """Version key of the graph built from an annotation (a new annotation row is a new version)."""
+        return f"{annotations.identifier_set_id}-{annotations.id}"
+
+    @staticmethod
+    def _get_or_build(annotations: Annotation) -> Tuple[Optional[CompactGraph], Optional[str]]:
+        version = GraphService.graph_version(annotations)
+        with _graph_cache_lock:
+            compact = _graph_cache.get(version)
+            if compact is not None:
+                _graph_cache.move_to_end(version)
+                return compact, None
+
         try:
             combined_df = pd.DataFrame(annotations.combined_df).T
-            combined_metadata = annotations.combined_metadata
             opentargets_df = (
                 pd.DataFrame(annotations.opentargets_df).T
                 if annotations.opentargets_df else None
             )
+            compact = CompactGraph.from_dataframe(combined_df, opentargets_df)
+        except Exception as e:
+            return None, str(e)
 
-            pygraph = saver.save_graph(
-                combined_df=combined_df,
-                combined_metadata=combined_metadata,
-                graph_name=f"graph_{annotations.identifier_set_id}",
-                disease_compound=opentargets_df,
-                graph_dir=graph_dir,
-            )
+        if compact.edge_count == 0:
+            return None, "Graph generation succeeded, but it contains no edges."
 
-            if pygraph.number_of_edges() == 0:
-                return None, "Graph generation succeeded, but it contains no edges."
+        with _graph_cache_lock:
+            _graph_cache[version] = compact
+            while len(_graph_cache) > GRAPH_CACHE_SIZE:
+                _graph_cache.popitem(last=False)
+        return compact, None
 
-            return pygraph, None
-        except Exception as e:
-            return None, str(e)
+    @staticmethod
+    def get_compact_graph(
+        annotations: Annotation,
+        graph_dir: Path
+    ) -> Tuple[Optional[CompactGraph], Optional[str]]:
+        """
+        Graph of an annotation, built only once per annotation version. Callers that hand it
+        to a NetworkX-based library convert it with to_networkx() at that call.
+
+        The graph is no longer exported to `graph_dir` (pickle, GraphML and edge list were
+        written on every build and never read back); the directory still holds its layouts.
+        """
+        return GraphService._get_or_build(annotations)
@@ -1,13 +1,21 @@
+import asyncio
 from io import BytesIO, StringIO
-from typing import List, Optional, Tuple
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 
 import pandas as pd
-from pyBiodatafuse import id_mapper
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from . import bridgedb_local
+from .lazy_imports import lazy_import
 from .. import models
 
+load_workbook = lazy_import("openpyxl", "load_workbook")
+
+# Rows parsed per chunk when streaming identifiers out of an uploaded file
+IDENTIFIER_CHUNK_ROWS = 100_000
+
 
 class IdentifierService:
     def __init__(self, db: AsyncSession):
@@ -22,13 +30,20 @@ class IdentifierService:
         input_species: str = "Human",
         column_name: Optional[str] = None,
         file_type: Optional[str] = None,  # <- ADD THIS
+        file_path: Optional[Path] = None,
     ) -> models.IdentifierSet:
 
-        identifiers, warnings = self._process_identifiers(
-            text_input,
-            file_content,
-            column_name=column_name,
-            file_type=file_type  # <- pass here too
+        # Parsing a spooled upload can take a while, keep it off the event loop
+        loop = asyncio.get_running_loop()
+        identifiers, warnings = await loop.run_in_executor(
+            None,
+            lambda: self._process_identifiers(
+                text_input,
+                file_content,
+                column_name=column_name,
+                file_type=file_type,  # <- pass here too
+                file_path=file_path,
+            ),
         )
 
         identifier_set = models.IdentifierSet(
@@ -48,7 +63,8 @@ class IdentifierService:
             try:
                 ids_df = pd.DataFrame({"identifier": identifiers})
 
-                bridgedb_df, bridgedb_metadata = id_mapper.bridgedb_xref(
+                # Local database or BridgeDb web service, depending on BRIDGEDB_BACKEND
+                bridgedb_df, bridgedb_metadata = bridgedb_local.bridgedb_xref(
                     identifiers=ids_df,
                     input_species=input_species,
                     input_datasource=identifier_type,
@@ -89,12 +105,59 @@ class IdentifierService:
 
         return identifier_set
 
+    @staticmethod
+    def _is_excel(file_type: Optional[str], file_path: Optional[Path] = None) -> bool:
+        if file_type and ("spreadsheetml" in file_type or "excel" in file_type):
+            return True
+        return file_path is not None and file_path.suffix.lower() in (".xlsx", ".xlsm", ".xls")
+
+    @staticmethod
+    def _read_identifier_column(file_path: Path, column: str, excel: bool) -> Tuple[List[str], Optional[str]]:
+        """
+        Stream one column out of a spooled upload, deduplicating as it goes (in file order).
+        Only that column is parsed and at most one chunk of rows is held in memory.
+        """
+        # Dict keys as an ordered set: deduplicated, first occurrence order kept
+        identifiers: Dict[str, None] = {}
+
+        if excel and file_path.suffix.lower() != ".xls":
+            workbook = load_workbook(file_path, read_only=True, data_only=True)
+            try:
+                rows = workbook.worksheets[0].iter_rows(values_only=True)
+                header = next(rows, ())
+                if column not in header:
+                    return [], f"File must contain column '{column}'"
+                index = header.index(column)
+                for row in rows:
+                    if index < len(row) and row[index] is not None:
+                        identifiers[str(row[index])] = None
+            finally:
+                workbook.close()
+            return list(identifiers), None
+
+        if excel:
+            # Legacy .xls has no streaming reader, but only the one column is parsed
+            header = pd.read_excel(file_path, nrows=0).columns
+            if column not in header:
+                return [], f"File must contain column '{column}'"
+            chunks = [pd.read_excel(file_path, usecols=[column], dtype=str)]
+        else:
+            header = pd.read_csv(file_path, nrows=0).columns
+            if column not in header:
+                return [], f"File must contain column '{column}'"
+            chunks = pd.read_csv(file_path, usecols=[column], dtype=str, chunksize=IDENTIFIER_CHUNK_ROWS)
+
+        for chunk in chunks:
+            identifiers.update(dict.fromkeys(chunk[column].dropna()))
+        return list(identifiers), None
+
     def _process_identifiers(
         self,
         text_input: Optional[str] = None,
         file_content: Optional[bytes] = None,
         column_name: Optional[str] = None,
-        file_type: Optional[str] = None
+        file_type: Optional[str] = None,
+        file_path: Optional[Path] = None,
     ) -> Tuple[List[str], Optional[str]]:
         identifiers = []
         warnings = None
@@ -103,14 +166,24 @@ class IdentifierService:
             text_identifiers = [id.strip() for id in text_input.split() if id.strip()]
             identifiers.extend(text_identifiers)
 
-        if file_content:
+        target_col = column_name or "identifier"
+        if file_path:
+            try:
+                file_identifiers, warnings = self._read_identifier_column(
+                    file_path, target_col, self._is_excel(file_type, file_path)
+                )
+                if not warnings:
+                    identifiers = file_identifiers
+            except Exception as e:
+                warnings = f"Error processing file: {str(e)}"
+
+        elif file_content:
             try:
-                if file_type and ("spreadsheetml" in file_type or "excel" in file_type):
+                if self._is_excel(file_type):
                     df = pd.read_excel(BytesIO(file_content))
                 else:
                     df = pd.read_csv(StringIO(file_content.decode("utf-8")))
 
-                target_col = column_name or "identifier"
                 if target_col in df.columns:
                     identifiers = df[target_col].dropna().astype(str).unique().tolist()
                 else:
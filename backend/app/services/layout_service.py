@@ -0,0 +1,206 @@
+import asyncio
+import threading
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.linalg import eigsh
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .graph_service import GraphService
+from .network_analysis_service import NetworkAnalysisService, undirected_simple
+from .workers import get_process_pool
+from .. import models
+
+LAYOUT_NAMES = ["force", "spectral"]
+
+# Above this many nodes the force layout estimates repulsion from a sample of nodes
+FORCE_EXACT_MAX_NODES = 1500
+FORCE_REPULSION_SAMPLE = 300
+FORCE_ITERATIONS = 60
+FORCE_CHUNK_SIZE = 1000
+
+# Positions are spread over roughly LAYOUT_SPACING pixels per node on each axis
+LAYOUT_SPACING = 60.0
+LAYOUT_CACHE_SIZE = 16
+
+_layout_cache: "OrderedDict[Tuple[str, str], Tuple[List[str], np.ndarray]]" = OrderedDict()
+_layout_lock = threading.Lock()
+
+
+def spectral_layout(simple: sparse.csr_matrix, seed: int = 42) -> np.ndarray:
+    """Coordinates from the two leading non-trivial eigenvectors of the normalized adjacency."""
+    n = simple.shape[0]
+    rng = np.random.default_rng(seed)
+    if n <= 3:
+        return rng.random((n, 2))
+
+    degree = np.asarray(simple.sum(axis=1)).ravel()
+    inverse_sqrt = np.zeros(n)
+    inverse_sqrt[degree > 0] = 1.0 / np.sqrt(degree[degree > 0])
+    normalized = sparse.diags(inverse_sqrt) @ simple @ sparse.diags(inverse_sqrt)
+    # I + D^-1/2 A D^-1/2 is positive semi-definite, its largest eigenvectors are the smallest of the Laplacian
+    shifted = (normalized + sparse.identity(n)).tocsr()
+
+    try:
+        _, vectors = eigsh(shifted, k=3, which="LA", v0=rng.random(n), maxiter=n * 20, tol=1e-4)
+        coordinates = vectors[:, :2] * inverse_sqrt[:, None]
+    except Exception:
+        coordinates = rng.random((n, 2))
+
+    # Isolated nodes and degenerate directions get a small random spread instead of collapsing
+    coordinates += rng.normal(scale=1e-3, size=coordinates.shape) * (np.ptp(coordinates, axis=0) + 1e-9)
+    return coordinates
+
+
+def force_layout(simple: sparse.csr_matrix, initial: np.ndarray, iterations: int = FORCE_ITERATIONS, seed: int = 42) -> np.ndarray:
+    """Vectorized Fruchterman-Reingold on a unit square, started from `initial`."""
+    n = simple.shape[0]
+    if n <= 1:
+        return initial
+    rng = np.random.default_rng(seed)
+
+    span = np.ptp(initial, axis=0)
+    positions = (initial - initial.min(axis=0)) / np.where(span > 0, span, 1.0)
+    k = np.sqrt(1.0 / n)
+    temperature = 0.1
+    cooling = temperature / (iterations + 1)
+
+    coo = simple.tocoo()
+    rows, cols = coo.row, coo.col
+
+    for _ in range(iterations):
+        displacement = np.zeros_like(positions)
+
+        # Repulsion k^2 / d between all pairs, or against a sample scaled up to all nodes
+        if n <= FORCE_EXACT_MAX_NODES:
+            others, scale = positions, 1.0
+        else:
+            sample = rng.choice(n, size=FORCE_REPULSION_SAMPLE, replace=False)
+            others, scale = positions[sample], n / FORCE_REPULSION_SAMPLE
+        for start in range(0, n, FORCE_CHUNK_SIZE):
+            block = positions[start:start + FORCE_CHUNK_SIZE]
+            delta = block[:, None, :] - others[None, :, :]
+            distance_sq = np.maximum((delta ** 2).sum(axis=2), 1e-6)
+            displacement[start:start + FORCE_CHUNK_SIZE] += scale * (delta * (k * k / distance_sq)[:, :, None]).sum(axis=1)
+
+        # Attraction d^2 / k along edges (each undirected edge appears in both directions)
+        delta = positions[rows] - positions[cols]
+        distance = np.sqrt(np.maximum((delta ** 2).sum(axis=1), 1e-9))
+        pull = delta * (distance / k)[:, None]
+        displacement[:, 0] -= np.bincount(rows, weights=pull[:, 0], minlength=n)
+        displacement[:, 1] -= np.bincount(rows, weights=pull[:, 1], minlength=n)
+
+        length = np.sqrt(np.maximum((displacement ** 2).sum(axis=1), 1e-9))
+        positions += displacement * (np.minimum(length, temperature) / length)[:, None]
+        temperature -= cooling
+
+    return positions
+
+
+def compute_layout(adjacency: sparse.csr_matrix, layout: str, seed: int = 42) -> np.ndarray:
+    """Node coordinates in pixels for a directed adjacency matrix. Runs in a worker process."""
+    n = adjacency.shape[0]
+    simple = undirected_simple(adjacency)
+    positions = spectral_layout(simple, seed=seed)
+    if layout == "force":
+        positions = force_layout(simple, positions, seed=seed)
+
+    span = np.ptp(positions, axis=0)
+    positions = (positions - positions.min(axis=0)) / np.where(span > 0, span, 1.0)
+    return positions * LAYOUT_SPACING * np.sqrt(max(n, 1))
+
+
+class LayoutService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    @staticmethod
+    def _layout_file(graph_dir: Path, version: str, layout: str) -> Path:
+        return graph_dir / "layouts" / f"{version}_{layout}.npz"
+
+    @staticmethod
+    def _load(graph_dir: Path, version: str, layout: str):
+        key = (version, layout)
+        with _layout_lock:
+            if key in _layout_cache:
+                _layout_cache.move_to_end(key)
+                return _layout_cache[key]
+
+        layout_file = LayoutService._layout_file(graph_dir, version, layout)
+        if not layout_file.exists():
+            return None
+        with np.load(layout_file, allow_pickle=False) as stored:
+            node_ids, positions = stored["node_ids"].tolist(), stored["positions"]
+        LayoutService._remember(key, node_ids, positions)
+        return node_ids, positions
+
+    @staticmethod
+    def _store(graph_dir: Path, version: str, layout: str, node_ids: List[str], positions: np.ndarray) -> None:
+        layout_file = LayoutService._layout_file(graph_dir, version, layout)
+        layout_file.parent.mkdir(parents=True, exist_ok=True)
+        # Written under a unique name and renamed, so concurrent workers never load a partial file
+        tmp = layout_file.with_name(f".{layout_file.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            with open(tmp, "wb") as f:
+                np.savez_compressed(f, node_ids=np.array(node_ids, dtype=str), positions=positions)
+            tmp.replace(layout_file)
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    @staticmethod
+    def _remember(key, node_ids, positions):
+        with _layout_lock:
+            _layout_cache[key] = (node_ids, positions)
+            while len(_layout_cache) > LAYOUT_CACHE_SIZE:
+                _layout_cache.popitem(last=False)
+
+    async def get_layout(self, annotation: models.Annotation, graph_dir: Path, layout: str = "force"):
+        """Node ids and coordinates of a layout, computed once per graph version and layout name."""
+        try:
+            version = GraphService.graph_version(annotation)
+            loop = asyncio.get_running_loop()
+
+            stored = await loop.run_in_executor(None, self._load, graph_dir, version, layout)
+            if stored is not None:
+                return stored, None
+
+            adjacency_data, error = await loop.run_in_executor(
+                None, NetworkAnalysisService.get_adjacency, annotation, graph_dir
+            )
+            if error:
+                return None, f"Graph error: {error}"
+            node_ids, adjacency = adjacency_data
+
+            positions = await loop.run_in_executor(get_process_pool(), compute_layout, adjacency, layout)
+
+            await loop.run_in_executor(None, self._store, graph_dir, version, layout, node_ids, positions)
+            self._remember((version, layout), node_ids, positions)
+            return (node_ids, positions), None
+
+        except Exception as e:
+            return None, f"Error computing layout: {str(e)}"
+
+    async def get_positions(
+            self, annotation: models.Annotation, graph_dir: Path, layout: str = "force"
+    ) -> Tuple[Optional[Dict[str, Dict[str, float]]], Optional[str]]:
+        stored, error = await self.get_layout(annotation, graph_dir, layout)
+        if error:
+            return None, error
+        node_ids, positions = stored
+        return {
+            node_id: {"x": round(float(x), 2), "y": round(float(y), 2)}
+            for node_id, (x, y) in zip(node_ids, positions)
+        }, None
+
+    @staticmethod
+    def apply_positions(elements: Dict, positions: Dict[str, Dict[str, float]]) -> Dict:
+        """Attach precomputed positions to Cytoscape node elements for a preset layout."""
+        for node in elements.get("nodes", []):
+            position = positions.get(node.get("data", {}).get("id"))
+            if position is not None:
+                node["position"] = position
+        return elements
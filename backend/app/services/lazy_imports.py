@@ -0,0 +1,105 @@
+"""
+Deferred imports of the heavy libraries (pyBiodatafuse annotators and graph exporters, rdflib,
+matplotlib, py4cytoscape/igraph, the neo4j driver).
+
+Services bind these names with `lazy_import` at module level, the module is only imported the
+first time an attribute is used. Importing `app.main` therefore stays cheap for workers that
+only serve auth or downloads, and `prewarm` loads everything in the background once the server
+accepts requests, so the first annotation request does not pay for it either.
+"""
+import importlib
+import logging
+import os
+import threading
+import time
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Set to 0 to skip loading the heavy modules in the background after startup (e.g. for tests)
+PREWARM_IMPORTS = os.getenv("PREWARM_IMPORTS", "1") != "0"
+
+HEAVY_MODULES = [
+    "pandas",
+    "pyBiodatafuse.constants",
+    "pyBiodatafuse.utils",
+    "pyBiodatafuse.id_mapper",
+    "pyBiodatafuse.annotators.aopwiki",
+    "pyBiodatafuse.annotators.bgee",
+    "pyBiodatafuse.annotators.disgenet",
+    "pyBiodatafuse.annotators.intact",
+    "pyBiodatafuse.annotators.kegg",
+    "pyBiodatafuse.annotators.minerva",
+    "pyBiodatafuse.annotators.mitocarta",
+    "pyBiodatafuse.annotators.molmedb",
+    "pyBiodatafuse.annotators.opentargets",
+    "pyBiodatafuse.annotators.pubchem",
+    "pyBiodatafuse.annotators.stringdb",
+    "pyBiodatafuse.annotators.wikipathways",
+    "pyBiodatafuse.graph.generator",
+    "pyBiodatafuse.graph.saver",
+    "pyBiodatafuse.graph.cytoscape",
+    "pyBiodatafuse.graph.neo4j",
+    "pyBiodatafuse.graph.rdf",
+    "pyBiodatafuse.graph.rdf.graphdb",
+    "pyBiodatafuse.graph.rdf.utils",
+    "pyBiodatafuse.analyzer.summarize",
+    "matplotlib.pyplot",
+    "py4cytoscape",
+    "openpyxl",
+]
+
+_import_lock = threading.RLock()
+
+
+def _after_import() -> None:
+    # Annotator modules loaded just now still call the uncached version lookups
+    from . import metadata_cache
+
+    metadata_cache.install()
+
+
+class LazyImport:
+    """Stand-in for a module (or an attribute of one) that imports it on first use."""
+
+    def __init__(self, module: str, attribute: Optional[str] = None):
+        self._module = module
+        self._attribute = attribute
+        self._target = None
+
+    def _load(self) -> Any:
+        if self._target is None:
+            with _import_lock:
+                if self._target is None:
+                    target = importlib.import_module(self._module)
+                    _after_import()
+                    self._target = getattr(target, self._attribute) if self._attribute else target
+        return self._target
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._load(), name)
+
+    def __call__(self, *args, **kwargs):
+        return self._load()(*args, **kwargs)
+
+    def __repr__(self) -> str:
+        name = f"{self._module}.{self._attribute}" if self._attribute else self._module
+        return f"<lazy {name} ({'loaded' if self._target is not None else 'not loaded'})>"
+
+
+def lazy_import(module: str, attribute: Optional[str] = None) -> LazyImport:
+    """`lazy_import("a.b")` stands for `import a.b`, `lazy_import("a.b", "C")` for `from a.b import C`."""
+    return LazyImport(module, attribute)
+
+
+def prewarm(modules: Optional[list] = None) -> None:
+    """Import the heavy modules ahead of the first request that needs them. Failures are logged, not raised."""
+    start = time.perf_counter()
+    for module in modules if modules is not None else HEAVY_MODULES:
+        try:
+            with _import_lock:
+                importlib.import_module(module)
+        except Exception as e:
+            logger.warning(f"Pre-warming {module} failed: {e}")
+    _after_import()
+    logger.info(f"Heavy modules loaded in {time.perf_counter() - start:.1f}s")
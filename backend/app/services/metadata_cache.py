@@ -0,0 +1,143 @@
+"""
+TTL cache for upstream version endpoints and bundled resource tables.
+
+Every BridgeDb mapping and most annotators ask their source for its version and re-read
+pyBiodatafuse's datasources.csv. These change rarely, so `install()` wraps those functions:
+values are served from memory for METADATA_CACHE_TTL seconds, then served stale while a
+background thread refreshes them, and only reloaded in the request after METADATA_CACHE_MAX_STALE.
+"""
+import copy
+import functools
+import importlib
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+METADATA_CACHE_TTL = float(os.getenv("METADATA_CACHE_TTL", "900"))
+METADATA_CACHE_MAX_STALE = float(os.getenv("METADATA_CACHE_MAX_STALE", "86400"))
+
+# (module, function) pairs whose results are cached
+CACHED_FUNCTIONS = [
+    ("pyBiodatafuse.id_mapper", "read_datasource_file"),
+    ("pyBiodatafuse.id_mapper", "get_version_webservice_bridgedb"),
+    ("pyBiodatafuse.id_mapper", "get_version_datasource_bridgedb"),
+    ("pyBiodatafuse.annotators.bgee", "get_version_bgee"),
+    ("pyBiodatafuse.annotators.compoundwiki", "get_version_compoundwiki"),
+    ("pyBiodatafuse.annotators.disgenet", "get_version_disgenet"),
+    ("pyBiodatafuse.annotators.minerva", "get_version_minerva"),
+    ("pyBiodatafuse.annotators.opentargets", "get_version_opentargets"),
+    ("pyBiodatafuse.annotators.stringdb", "get_version_stringdb"),
+    ("pyBiodatafuse.annotators.wikidata", "get_version_wikidata"),
+    ("pyBiodatafuse.annotators.wikipathways", "get_version_wikipathways"),
+]
+
+
+class MetadataCache:
+    def __init__(self, ttl: float = METADATA_CACHE_TTL, max_stale: float = METADATA_CACHE_MAX_STALE):
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self._entries: Dict[Hashable, Tuple[Any, float]] = {}
+        self._key_locks: Dict[Hashable, threading.Lock] = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def _store(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+
+    def _refresh(self, key: Hashable, loader: Callable[[], Any]) -> None:
+        try:
+            self._store(key, loader())
+        except Exception as e:
+            # Keep serving the previous value, the next request past the TTL retries
+            logger.warning(f"Refreshing cached metadata {key} failed: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        if entry is not None:
+            value, loaded_at = entry
+            age = time.monotonic() - loaded_at
+            if age < self.ttl:
+                return value
+            if age < self.max_stale:
+                with self._lock:
+                    start = key not in self._refreshing
+                    self._refreshing.add(key)
+                if start:
+                    threading.Thread(target=self._refresh, args=(key, loader), daemon=True).start()
+                return value
+
+        # Missing or too old: load now, once per key even with concurrent requests
+        with key_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[1] < self.ttl:
+                return entry[0]
+            value = loader()
+            self._store(key, value)
+            return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+metadata_cache = MetadataCache()
+
+
+def _detached(value: Any) -> Any:
+    # Callers get their own copy, so a caller mutating a result cannot change the cache
+    # A DataFrame can only exist once pandas is loaded, so this does not import it
+    pandas = sys.modules.get("pandas")
+    if pandas is not None and isinstance(value, pandas.DataFrame):
+        return value.copy()
+    return copy.deepcopy(value)
+
+
+def cached(function: Callable) -> Callable:
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        key = (function.__module__, function.__name__, args, tuple(sorted(kwargs.items())))
+        return _detached(metadata_cache.get(key, lambda: function(*args, **kwargs)))
+
+    wrapper.__wrapped_by_metadata_cache__ = True
+    return wrapper
+
+
+def install(import_modules: bool = False) -> None:
+    """
+    Replace the functions in CACHED_FUNCTIONS, including names other modules imported directly.
+    Only modules already loaded are patched unless `import_modules` is set, the lazy importer
+    calls this again whenever it loads one.
+    """
+    for module_name, name in CACHED_FUNCTIONS:
+        module = sys.modules.get(module_name)
+        if module is None and import_modules:
+            try:
+                module = importlib.import_module(module_name)
+            except Exception as e:
+                logger.warning(f"Metadata cache: cannot import {module_name}: {e}")
+                continue
+        if module is None:
+            continue
+        original = getattr(module, name, None)
+        if original is None or getattr(original, "__wrapped_by_metadata_cache__", False):
+            continue
+
+        wrapper = cached(original)
+        for loaded in list(sys.modules.values()):
+            if getattr(loaded, "__name__", "").startswith(("pyBiodatafuse", "app.")) and \
+                    getattr(loaded, name, None) is original:
+                setattr(loaded, name, wrapper)
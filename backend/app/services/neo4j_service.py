@@ -1,11 +1,13 @@
 from pathlib import Path
-from pyBiodatafuse.graph import neo4j
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from .graph_service import GraphService
+from .lazy_imports import lazy_import
 
 from .. import models
 
+neo4j = lazy_import("pyBiodatafuse.graph.neo4j")
+
 
 class Neo4jService:
     def __init__(self, db: AsyncSession):
@@ -13,12 +15,12 @@ class Neo4jService:
 
     async def load_graph_into_neo4j(self, annotations: models.Annotation, graph_dir: Path):
         try:
-            pygraph, error = GraphService.create_pygraph(annotations, graph_dir)
+            graph, error = GraphService.get_compact_graph(annotations, graph_dir)
             if error:
                 return {"success": False, "message": error}
 
             neo4j.load_graph(
-                pygraph,
+                graph.to_networkx(),
                 uri="bolt://localhost:7687",
                 username="test",
                 password="password"
@@ -0,0 +1,216 @@
+import asyncio
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse import csgraph
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .graph_service import GraphService
+from .workers import get_process_pool
+from .. import models
+
+AVAILABLE_METRICS = [
+    "degree",
+    "in_degree",
+    "out_degree",
+    "betweenness",
+    "pagerank",
+    "component",
+    "clustering",
+]
+
+# Above this many nodes betweenness is estimated from a sample of source nodes
+BETWEENNESS_EXACT_MAX_NODES = 2000
+BETWEENNESS_SAMPLE_SIZE = 256
+BETWEENNESS_BATCH_SIZE = 64
+
+METRICS_CACHE_SIZE = 32
+
+# (graph version, metric) -> metric array, and graph version -> (node ids, adjacency)
+_metrics_cache: "OrderedDict[Tuple[str, str], np.ndarray]" = OrderedDict()
+_adjacency_cache: "OrderedDict[str, Tuple[List[str], sparse.csr_matrix]]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def undirected_simple(adjacency: sparse.csr_matrix) -> sparse.csr_matrix:
+    """Symmetric 0/1 matrix without self loops, as used by clustering and betweenness."""
+    sym = (adjacency + adjacency.T).tocsr()
+    sym = (sym - sparse.diags(sym.diagonal())).tocsr()
+    sym.eliminate_zeros()
+    sym.data[:] = 1.0
+    return sym
+
+
+def _pagerank(adjacency: sparse.csr_matrix, alpha: float = 0.85, max_iter: int = 100, tol: float = 1.0e-6) -> np.ndarray:
+    n = adjacency.shape[0]
+    if n == 0:
+        return np.zeros(0)
+
+    out_weight = np.asarray(adjacency.sum(axis=1)).ravel()
+    dangling = out_weight == 0
+    inverse = np.zeros(n)
+    inverse[~dangling] = 1.0 / out_weight[~dangling]
+    transition_t = (sparse.diags(inverse) @ adjacency).T.tocsr()
+
+    x = np.full(n, 1.0 / n)
+    for _ in range(max_iter):
+        previous = x
+        x = alpha * (transition_t @ previous + previous[dangling].sum() / n) + (1.0 - alpha) / n
+        if np.abs(x - previous).sum() < n * tol:
+            break
+    return x / x.sum()
+
+
+def _clustering(simple: sparse.csr_matrix) -> np.ndarray:
+    degree = np.asarray(simple.sum(axis=1)).ravel()
+    # Row sums of (S @ S) * S are twice the number of triangles through each node
+    triangles_x2 = np.asarray((simple @ simple).multiply(simple).sum(axis=1)).ravel()
+    possible = degree * (degree - 1)
+    clustering = np.zeros_like(degree)
+    np.divide(triangles_x2, possible, out=clustering, where=possible > 0)
+    return clustering
+
+
+def _betweenness(simple: sparse.csr_matrix, sources: np.ndarray) -> np.ndarray:
+    """Brandes betweenness accumulated from `sources`, as level-synchronous sparse products over source batches."""
+    n = simple.shape[0]
+    centrality = np.zeros(n)
+
+    for start in range(0, len(sources), BETWEENNESS_BATCH_SIZE):
+        batch = sources[start:start + BETWEENNESS_BATCH_SIZE]
+        columns = np.arange(len(batch))
+
+        sigma = np.zeros((n, len(batch)))
+        sigma[batch, columns] = 1.0
+        depth = np.full((n, len(batch)), -1, dtype=np.int32)
+        depth[batch, columns] = 0
+
+        # Forward pass: shortest path counts level by level
+        frontier = sigma.copy()
+        level = 0
+        while True:
+            discovered = simple @ frontier
+            discovered[depth != -1] = 0.0
+            reached = discovered > 0
+            if not reached.any():
+                break
+            level += 1
+            depth[reached] = level
+            sigma += discovered
+            frontier = discovered
+
+        # Backward pass: dependency accumulation from the deepest level up
+        delta = np.zeros_like(sigma)
+        for current in range(level, 0, -1):
+            on_level = depth == current
+            coefficient = np.zeros_like(sigma)
+            np.divide(1.0 + delta, sigma, out=coefficient, where=on_level)
+            contribution = simple @ coefficient
+            parents = depth == current - 1
+            delta[parents] += sigma[parents] * contribution[parents]
+
+        delta[batch, columns] = 0.0
+        centrality += delta.sum(axis=1)
+
+    return centrality
+
+
+def compute_metrics(adjacency: sparse.csr_matrix, metrics: List[str], seed: int = 42) -> Dict[str, np.ndarray]:
+    """Compute the requested metrics on a directed adjacency matrix. Runs in a worker process."""
+    n = adjacency.shape[0]
+    results = {}
+    simple = None
+
+    for metric in metrics:
+        if metric in ("degree", "in_degree", "out_degree"):
+            out_degree = np.asarray(adjacency.sum(axis=1)).ravel()
+            in_degree = np.asarray(adjacency.sum(axis=0)).ravel()
+            results["out_degree"] = out_degree
+            results["in_degree"] = in_degree
+            results["degree"] = out_degree + in_degree
+        elif metric == "pagerank":
+            results["pagerank"] = _pagerank(adjacency)
+        elif metric == "component":
+            _, labels = csgraph.connected_components(adjacency, directed=True, connection="weak")
+            results["component"] = labels
+        elif metric == "clustering":
+            simple = simple if simple is not None else undirected_simple(adjacency)
+            results["clustering"] = _clustering(simple)
+        elif metric == "betweenness":
+            simple = simple if simple is not None else undirected_simple(adjacency)
+            if n > BETWEENNESS_EXACT_MAX_NODES:
+                sources = np.random.default_rng(seed).choice(n, size=BETWEENNESS_SAMPLE_SIZE, replace=False)
+            else:
+                sources = np.arange(n)
+            centrality = _betweenness(simple, sources)
+            # Same normalization as networkx.betweenness_centrality(normalized=True, k=len(sources))
+            if n > 2:
+                centrality *= 1.0 / ((n - 1) * (n - 2))
+            centrality *= n / max(len(sources), 1)
+            results["betweenness"] = centrality
+
+    return {metric: results[metric] for metric in metrics}
+
+
+class NetworkAnalysisService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    @staticmethod
+    def get_adjacency(annotation: models.Annotation, graph_dir: Path):
+        version = GraphService.graph_version(annotation)
+        with _cache_lock:
+            if version in _adjacency_cache:
+                _adjacency_cache.move_to_end(version)
+                return _adjacency_cache[version], None
+
+        graph, error = GraphService.get_compact_graph(annotation, graph_dir)
+        if error:
+            return None, error
+
+        node_ids, adjacency = graph.node_ids, graph.adjacency()
+        with _cache_lock:
+            _adjacency_cache[version] = (node_ids, adjacency)
+            while len(_adjacency_cache) > METRICS_CACHE_SIZE:
+                _adjacency_cache.popitem(last=False)
+        return (node_ids, adjacency), None
+
+    async def get_metrics(
+            self, annotation: models.Annotation, graph_dir: Path, metrics: List[str], include_ids: bool = True):
+        try:
+            loop = asyncio.get_running_loop()
+            adjacency_data, error = await loop.run_in_executor(None, self.get_adjacency, annotation, graph_dir)
+            if error:
+                return None, f"Graph error: {error}"
+            node_ids, adjacency = adjacency_data
+
+            version = GraphService.graph_version(annotation)
+            with _cache_lock:
+                results = {m: _metrics_cache[(version, m)] for m in metrics if (version, m) in _metrics_cache}
+            missing = [m for m in metrics if m not in results]
+
+            if missing:
+                computed = await loop.run_in_executor(get_process_pool(), compute_metrics, adjacency, missing)
+                with _cache_lock:
+                    for metric, values in computed.items():
+                        _metrics_cache[(version, metric)] = values
+                    while len(_metrics_cache) > METRICS_CACHE_SIZE * len(AVAILABLE_METRICS):
+                        _metrics_cache.popitem(last=False)
+                results.update(computed)
+
+            response = {
+                "version": version,
+                "node_count": adjacency.shape[0],
+                "edge_count": int(adjacency.sum()),
+                "metrics": {metric: results[metric].tolist() for metric in metrics},
+            }
+            if include_ids:
+                response["node_ids"] = node_ids
+            return response, None
+
+        except Exception as e:
+            return None, f"Error computing network metrics: {str(e)}"
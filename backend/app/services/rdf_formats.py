@@ -0,0 +1,216 @@
+"""
+Serializations of generated graphs and their compressed variants.
+
+A generation writes its main RDF file as Turtle (subjects sorted and grouped: readable, but the
+slowest to write) or N-Triples (written line by line as the triples are iterated). Downloads
+negotiate the format (Accept) and encoding (Accept-Encoding). A variant other than the main file
+is derived from the stored graph on its first request and kept next to it, so later requests
+are served from the precompressed file directly.
+
+The `sqlite` format is the generation's indexed store itself (see triple_store): dictionary
+encoded, binary triples, the most compact form and one that can be queried without loading it.
+"""
+import asyncio
+import gzip
+import importlib.util
+import logging
+import re
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from . import artifact_store
+from .lazy_imports import lazy_import
+from .workers import get_process_pool, run_in_background, run_once
+
+rdflib = lazy_import("rdflib")
+nt_row = lazy_import("rdflib.plugins.serializers.nt", "_nt_row")
+triple_store = lazy_import(f"{__package__}.triple_store")
+
+logger = logging.getLogger(__name__)
+
+
+class RDFFormat(NamedTuple):
+    media_type: str
+    extension: str
+
+
+FORMATS: Dict[str, RDFFormat] = {
+    "turtle": RDFFormat("text/turtle", ".ttl"),
+    "ntriples": RDFFormat("application/n-triples", ".nt"),
+    "nquads": RDFFormat("application/n-quads", ".nq"),
+    "sqlite": RDFFormat("application/vnd.sqlite3", ".sqlite"),
+}
+# Formats the main file of a generation can be written in
+GENERATION_FORMATS = ("turtle", "ntriples")
+
+# Encoding -> (file extension, media type of the compressed file). zstd needs the zstandard package
+ENCODINGS: Dict[str, Tuple[str, str]] = {"gzip": (".gz", "application/gzip")}
+if importlib.util.find_spec("zstandard") is not None:
+    ENCODINGS["zstd"] = (".zst", "application/zstd")
+# Preferred when a client accepts several encodings equally
+ENCODING_PREFERENCE = ["zstd", "gzip"]
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 10
+WRITE_BUFFER = 1 << 20
+
+
+def format_of(path: Path) -> Optional[str]:
+    return next((name for name, fmt in FORMATS.items() if fmt.extension == path.suffix), None)
+
+
+def write_graph(graph, path: Path, format: str, graph_iri: Optional[str] = None) -> None:
+    """Serialize a graph. N-Quads put every triple in the graph named `graph_iri`."""
+    if format not in ("turtle", "ntriples", "nquads"):
+        raise ValueError(f"Cannot write '{format}'. Available: {', '.join(f for f in FORMATS if f != 'sqlite')}")
+    tmp = artifact_store.temp_path(path)
+    try:
+        if format == "turtle":
+            graph.serialize(str(tmp), format="turtle")
+        else:
+            suffix = f" <{graph_iri}> .\n" if format == "nquads" else None
+            with open(tmp, "w", encoding="utf-8", buffering=WRITE_BUFFER) as f:
+                for triple in graph:
+                    row = nt_row(triple)
+                    # rows end with " .\n"
+                    f.write(row if suffix is None else row[:-3] + suffix)
+        tmp.replace(path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def compress(source: Path, encoding: str) -> Path:
+    target = source.with_name(source.name + ENCODINGS[encoding][0])
+    tmp = artifact_store.temp_path(target)
+    try:
+        with open(source, "rb") as src:
+            if encoding == "zstd":
+                import zstandard
+
+                with open(tmp, "wb") as dst:
+                    zstandard.ZstdCompressor(level=ZSTD_LEVEL).copy_stream(src, dst)
+            else:
+                # mtime=0 keeps the output identical across runs
+                with gzip.GzipFile(tmp, "wb", compresslevel=GZIP_LEVEL, mtime=0) as dst:
+                    shutil.copyfileobj(src, dst, WRITE_BUFFER)
+        tmp.replace(target)
+    finally:
+        tmp.unlink(missing_ok=True)
+    return target
+
+
+def variant_path(rdf_path: Path, store_path: Optional[Path], format: str, encoding: Optional[str] = None) -> Path:
+    """Where a format/encoding variant of a generation's graph is (or will be) kept."""
+    base = store_path if format == "sqlite" else rdf_path.with_suffix(FORMATS[format].extension)
+    return base.with_name(base.name + ENCODINGS[encoding][0]) if encoding else base
+
+
+def build_variant(
+    rdf_path: str, store_path: Optional[str], format: str, encoding: Optional[str], graph_iri: str
+) -> str:
+    """Write a variant of a generation's graph, and the uncompressed file it derives from. Returns its path."""
+    rdf_file = Path(rdf_path)
+    store_file = Path(store_path) if store_path else None
+    base = variant_path(rdf_file, store_file, format)
+    if not base.exists():
+        if format == "sqlite":
+            raise FileNotFoundError("This generation has no stored graph")
+        if store_file is not None and store_file.is_file():
+            graph = triple_store.open_graph(store_file)
+        else:
+            graph = rdflib.Graph()
+            graph.parse(str(rdf_file), format=rdflib.util.guess_format(str(rdf_file)))
+        write_graph(graph, base, format, graph_iri)
+    target = variant_path(rdf_file, store_file, format, encoding)
+    if encoding and not target.exists():
+        compress(base, encoding)
+    return str(target)
+
+
+async def ensure_variant(
+    rdf_path: Path, store_path: Optional[Path], format: str, encoding: Optional[str], graph_iri: str
+) -> Path:
+    """Path of a variant, built in the process pool the first time it is asked for."""
+    if format == "sqlite" and (store_path is None or not store_path.is_file()):
+        raise FileNotFoundError("This generation has no stored graph")
+    target = variant_path(rdf_path, store_path, format, encoding)
+    if target.exists():
+        _used(target, rdf_path, store_path)
+        return target
+
+    async def build():
+        start = time.perf_counter()
+        path = await asyncio.get_running_loop().run_in_executor(
+            get_process_pool(), build_variant,
+            str(rdf_path), str(store_path) if store_path else None, format, encoding, graph_iri,
+        )
+        logger.info(f"📦 Built {Path(path).name} in {time.perf_counter() - start:.1f}s")
+        _used(Path(path), rdf_path, store_path)
+        if encoding:
+            # The uncompressed file it was made from
+            _used(variant_path(rdf_path, store_path, format), rdf_path, store_path)
+        return Path(path)
+
+    return await run_once(f"variant:{target}", build)
+
+
+def _used(variant: Path, rdf_path: Path, store_path: Optional[Path]) -> None:
+    # Anything but the main file and the store can be built again, so it may be evicted
+    if variant not in (rdf_path, store_path):
+        artifact_store.used(variant)
+
+
+def precompress(rdf_path: Path, store_path: Optional[Path], graph_iri: str) -> None:
+    """Compress the main file in the background, so the first compressed download is served directly."""
+    format = format_of(rdf_path)
+    for encoding in ENCODINGS:
+        run_in_background(
+            ensure_variant(rdf_path, store_path, format, encoding, graph_iri),
+            f"Compressing {rdf_path.name} ({encoding})",
+        )
+
+
+def _weighted(header: str) -> Dict[str, float]:
+    """{"value": q} from an Accept-style header."""
+    weights = {}
+    for part in header.split(","):
+        value, *params = [item.strip() for item in part.split(";")]
+        if not value:
+            continue
+        q = 1.0
+        for param in params:
+            match = re.fullmatch(r"q=([0-9.]+)", param)
+            if match:
+                q = float(match.group(1))
+        weights[value.lower()] = q
+    return weights
+
+
+def negotiate(accept: Optional[str], accept_encoding: Optional[str], default_format: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    The format and encoding to answer with. The format is None when nothing acceptable is offered,
+    the encoding None for an uncompressed answer.
+    """
+    format = default_format
+    if accept:
+        weights = _weighted(accept)
+        by_type = {fmt.media_type: name for name, fmt in FORMATS.items()}
+        candidates = [(q, name) for media_type, q in weights.items() if q > 0 and (name := by_type.get(media_type))]
+        if candidates:
+            # The highest q wins, the generation's own format on ties
+            format = max(candidates, key=lambda item: (item[0], item[1] == default_format))[1]
+        elif not any(q > 0 and media_type in ("*/*", "text/*", "application/*") for media_type, q in weights.items()):
+            return None, None
+
+    encoding = None
+    if accept_encoding and format != "sqlite":
+        weights = _weighted(accept_encoding)
+        offered = [
+            (weights.get(name, weights.get("*", 0)), -ENCODING_PREFERENCE.index(name), name)
+            for name in ENCODINGS
+        ]
+        q, _, best = max(offered)
+        if q > 0 and q >= weights.get("identity", 0):
+            encoding = best
+    return format, encoding
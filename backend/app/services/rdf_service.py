@@ -1,33 +1,59 @@
+import asyncio
 import os
-import tempfile
+import shutil
 import uuid
 import json
 import logging
+import threading
+import time
+from collections import OrderedDict
 from pathlib import Path
 from typing import Dict, List, Optional
 from datetime import datetime
 
 import pandas as pd
+from sqlalchemy import delete
 from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from pyBiodatafuse.graph.rdf import BDFGraph
-from pyBiodatafuse.graph.rdf.graphdb import GraphDBManager
-from pyBiodatafuse.graph.rdf.utils import get_shacl_prefixes
-
 from ..models import RDFFile
 from .. import models
 from ..schemas import RDFGenerationResponse, GeneratedFile
+from .lazy_imports import lazy_import
+from .shared_state import get_shared_state
+from . import generation_cache, rdf_formats, rdf_partitions, shape_service
+
+BDFGraph = lazy_import("pyBiodatafuse.graph.rdf", "BDFGraph")
+GraphDBManager = lazy_import("pyBiodatafuse.graph.rdf.graphdb", "GraphDBManager")
+triple_store = lazy_import(f"{__package__}.triple_store")
 
 # Add logger
 logger = logging.getLogger(__name__)
 
+# Namespace of the generation records in the shared state
+GENERATIONS_NAMESPACE = "rdf_generations"
+# Graphs re-read from their Turtle file, kept per worker
+BDF_CACHE_SIZE = 4
+_bdf_cache: "OrderedDict[str, BDFGraph]" = OrderedDict()
+_bdf_cache_lock = threading.Lock()
+
+
+def _cache_bdf(generation_id: str, bdf) -> None:
+    with _bdf_cache_lock:
+        _bdf_cache[generation_id] = bdf
+        while len(_bdf_cache) > BDF_CACHE_SIZE:
+            _bdf_cache.popitem(last=False)
+
+
+def _graph_iri(version_iri: str, base_uri: str) -> str:
+    # Name of the graph in N-Quads exports
+    return version_iri or base_uri
+
+
 class RDFService:
     def __init__(self, db: AsyncSession):
         self.db = db
-        self.temp_dir = Path(tempfile.gettempdir()) / "biodatafuse_rdf"
-        self.temp_dir.mkdir(exist_ok=True)
-        self.generated_files = {}  # In-memory for legacy, but not used for persistence
+        self.state = get_shared_state()
 
     async def persist_file(self, file_id, user_id, name, path, type_):
         # Check if already exists
@@ -76,9 +102,18 @@ class RDFService:
         shex_threshold: float = 0.001,
         user_id: int = None,
         custom_namespaces: List[Dict[str, str]] = None,
+        generation_id: Optional[str] = None,
+        rdf_format: str = "turtle",
     ) -> RDFGenerationResponse:
         """Generate RDF graph from annotation data."""
+        started = time.perf_counter()
+        stage_times: Dict[str, float] = {}
+        output_key = None
         try:
+            if rdf_format not in rdf_formats.GENERATION_FORMATS:
+                raise ValueError(
+                    f"Unknown RDF format '{rdf_format}'. Available: {', '.join(rdf_formats.GENERATION_FORMATS)}"
+                )
             logger.info(f"🚀 Starting RDF generation for identifier_set_id: {identifier_set_id}")
             
             # Get identifier set and annotations
@@ -105,6 +140,41 @@ class RDFService:
                 logger.error(f"❌ No annotation data found for identifier set {identifier_set_id}")
                 raise ValueError("No annotation data found for this identifier set")
             
+            generation_id = generation_id or str(uuid.uuid4())
+            namespaces_dict = None
+            if custom_namespaces:
+                namespaces_dict = {ns['prefix']: ns['uri'] for ns in custom_namespaces}
+                logger.info(f"🔧 Adding custom namespaces: {namespaces_dict}")
+
+            # Identical annotations and parameters give identical files: generated once, then shared
+            key = generation_cache.output_key(annotation.combined_df, annotation.combined_metadata, {
+                "base_uri": base_uri,
+                "version_iri": version_iri,
+                "author": author_name,
+                "orcid": orcid,
+                "graph_name": graph_name,
+                "generate_shacl": generate_shacl,
+                "shacl_threshold": shacl_threshold,
+                "generate_uml_diagram": generate_uml_diagram,
+                "generate_shex": generate_shex,
+                "shex_threshold": shex_threshold,
+                "namespaces": namespaces_dict,
+                "rdf_format": rdf_format,
+            })
+            generation = {
+                "user_id": user_id,
+                "base_uri": base_uri,
+                "version_iri": version_iri,
+                "orcid": orcid,
+                "author": author_name,
+            }
+            output = generation_cache.acquire(key, generation_id)
+            if output is not None:
+                return await self._reuse_output(key, output, generation_id, generation, started)
+            # Of concurrent identical requests one builds the shared output, the others a copy of their own
+            if generation_cache.claim_build(key, generation_id):
+                output_key = key
+
             logger.info(f"📊 Found annotation data, converting to DataFrame...")
             
             # Convert data to DataFrame
@@ -123,227 +193,251 @@ class RDFService:
             
             logger.info(f"📈 Generating RDF from annotation data...")
             
-            # Generate RDF
-            bdf.generate_rdf(combined_df, combined_metadata)
+            # Generate RDF, rows of different identifiers in parallel partitions for larger tables
+            stage_start = time.perf_counter()
+            partitions, merge_time = await rdf_partitions.generate_rdf(
+                bdf, combined_df, combined_metadata, rdf_partitions.partition_count(len(combined_df))
+            )
+            stage_times["rdf"] = time.perf_counter() - stage_start
+            if partitions > 1:
+                stage_times["rdf_merge"] = merge_time
             
-            # Create unique directory for this generation
-            generation_id = str(uuid.uuid4())
-            output_dir = self.temp_dir / generation_id
-            output_dir.mkdir(exist_ok=True)
+            # Output directory in the shared store, so any worker can serve the files
+            if output_key is not None:
+                output_dir = generation_cache.output_dir(output_key)
+            else:
+                output_dir = self.state.artifact_dir("rdf", generation_id)
 
             logger.info(f"📁 Created output directory: {output_dir}")
 
             generated_files = []
 
             # Serialize RDF graph
-            rdf_file_path = output_dir / f"{graph_name}.ttl"
+            rdf_file_path = output_dir / f"{graph_name}{rdf_formats.FORMATS[rdf_format].extension}"
             logger.info(f"💾 Serializing RDF graph to: {rdf_file_path}")
             
-            bdf.serialize(str(rdf_file_path), format="ttl")
+            stage_start = time.perf_counter()
+            await asyncio.get_running_loop().run_in_executor(
+                None, rdf_formats.write_graph, bdf, rdf_file_path, rdf_format
+            )
+            stage_times["serialize"] = time.perf_counter() - stage_start
             file_id = str(uuid.uuid4())
-            self.generated_files[file_id] = {
-                "name": f"{graph_name}.ttl",
-                "path": str(rdf_file_path),
-                "type": "RDF",
-                "user_id": user_id,
-                "created_at": datetime.now()
-            }
             # Persist to DB
-            await self.persist_file(file_id, user_id, f"{graph_name}.ttl", str(rdf_file_path), "RDF")
+            await self.persist_file(file_id, user_id, rdf_file_path.name, str(rdf_file_path), "RDF")
             generated_files.append(GeneratedFile(
                 id=file_id,
-                name=f"{graph_name}.ttl",
+                name=rdf_file_path.name,
                 type="RDF",
                 size=rdf_file_path.stat().st_size
             ))
 
             logger.info(f"✅ RDF graph serialized successfully")
 
-            # Generate SHACL if requested
-            if generate_shacl:
-                try:
-                    logger.info(f"🔍 Generating SHACL shapes with threshold: {shacl_threshold}")
-                    
-                    shacl_file_path = output_dir / f"{graph_name}_shacl.ttl"
-                    uml_file_path = None
-                    if generate_uml_diagram:
-                        uml_file_path = output_dir / f"{graph_name}_shacl.png"
-                    
-                    bdf.shacl(
-                        path=str(shacl_file_path),
-                        threshold=shacl_threshold,
-                        uml_figure_path=str(uml_file_path) if uml_file_path else None,
-                    )
-                    
-                    # Add SHACL file
-                    shacl_file_id = str(uuid.uuid4())
-                    self.generated_files[shacl_file_id] = {
-                        "name": f"{graph_name}_shacl.ttl",
-                        "path": str(shacl_file_path),
-                        "type": "SHACL",
-                        "user_id": user_id,
-                        "created_at": datetime.now()
-                    }
-                    await self.persist_file(shacl_file_id, user_id, f"{graph_name}_shacl.ttl", str(shacl_file_path), "SHACL")
-                    generated_files.append(GeneratedFile(
-                        id=shacl_file_id,
-                        name=f"{graph_name}_shacl.ttl",
-                        type="SHACL",
-                        size=shacl_file_path.stat().st_size
-                    ))
-                    
-                    logger.info(f"✅ SHACL shapes generated successfully")
-                    
-                    # Generate SHACL prefixes
-                    logger.info(f"📋 Generating SHACL prefixes...")
-                    prefixes_file_path = output_dir / f"{graph_name}_shacl_prefixes.ttl"
-                    
-                    # Convert custom namespaces to the format expected by BDFGraph
-                    namespaces_dict = None
-                    if custom_namespaces:
-                        namespaces_dict = {ns['prefix']: ns['uri'] for ns in custom_namespaces}
-                        logger.info(f"🔧 Adding custom namespaces: {namespaces_dict}")
-                    
-                    
-                    # Call get_shacl_prefixes
-                    get_shacl_prefixes(
-                        namespaces=namespaces_dict,
-                        path=str(prefixes_file_path),
-                        new_uris=bdf.new_uris
-                    )
-                    
-                    # Add SHACL prefixes file if it was created
-                    if prefixes_file_path.exists():
-                        prefixes_file_id = str(uuid.uuid4())
-                        self.generated_files[prefixes_file_id] = {
-                            "name": f"{graph_name}_shacl_prefixes.ttl",
-                            "path": str(prefixes_file_path),
-                            "type": "SHACL_Prefixes",
-                            "user_id": user_id,
-                            "created_at": datetime.now()
-                        }
-                        await self.persist_file(prefixes_file_id, user_id, f"{graph_name}_shacl_prefixes.ttl", str(prefixes_file_path), "SHACL_Prefixes")
-                        
-                        generated_files.append(GeneratedFile(
-                            id=prefixes_file_id,
-                            name=f"{graph_name}_shacl_prefixes.ttl",
-                            type="SHACL_Prefixes",
-                            size=prefixes_file_path.stat().st_size
-                        ))
-                        
-                        logger.info(f"✅ SHACL prefixes generated successfully")
-                    
-                    # Add UML diagram if generated
-                    if uml_file_path and uml_file_path.exists():
-                        uml_file_id = str(uuid.uuid4())
-                        self.generated_files[uml_file_id] = {
-                            "name": f"{graph_name}_shacl.png",
-                            "path": str(uml_file_path),
-                            "type": "UML",
-                            "user_id": user_id,
-                            "created_at": datetime.now()
-                        }
-                        await self.persist_file(uml_file_id, user_id, f"{graph_name}_shacl.png", str(uml_file_path), "UML")
-                        generated_files.append(GeneratedFile(
-                            id=uml_file_id,
-                            name=f"{graph_name}_shacl.png",
-                            type="UML",
-                            size=uml_file_path.stat().st_size
-                        ))
-                        
-                        logger.info(f"✅ UML diagram generated successfully")
-                        
-                except Exception as e:
-                    logger.warning(f"⚠️ SHACL generation failed: {e}")
-                    # Continue without SHACL
-
-            # Generate ShEx shapes if requested
-            if generate_shex:
-                try:
-                    logger.info(f"📐 Generating ShEx shapes with threshold: {shex_threshold}")
-                    
-                    shex_file_id = str(uuid.uuid4())
-                    shex_filename = f"{graph_name}_shex.ttl"
-                    shex_path = output_dir / shex_filename
-                    
-                    # Generate ShEx with UML diagram
-                    uml_shex_path = None
-                    if generate_uml_diagram:
-                        uml_shex_path = output_dir / f"{graph_name}_shex_diagram.png"
-                    
-                    bdf.shex(
-                        path=str(shex_path),
-                        threshold=shex_threshold,
-                        uml_figure_path=str(uml_shex_path) if uml_shex_path else None
-                    )
-                    
-                    # Store ShEx file
-                    shex_size = shex_path.stat().st_size
-                    await self.persist_file(shex_file_id, user_id, shex_filename, str(shex_path), "ShEx")
-                    
-                    generated_files.append(GeneratedFile(
-                        id=shex_file_id,
-                        name=shex_filename,
-                        type="ShEx",
-                        size=shex_size
-                    ))
-                    
-                    logger.info(f"✅ ShEx shapes generated successfully")
-                    
-                    # Store ShEx UML diagram if generated
-                    if uml_shex_path and uml_shex_path.exists():
-                        shex_uml_id = str(uuid.uuid4())
-                        shex_uml_filename = f"{graph_name}_shex_diagram.png"
-                        shex_uml_size = uml_shex_path.stat().st_size
-                        await self.persist_file(shex_uml_id, user_id, shex_uml_filename, str(uml_shex_path), "ShEx_UML")
-                        
-                        generated_files.append(GeneratedFile(
-                            id=shex_uml_id,
-                            name=shex_uml_filename,
-                            type="ShEx_UML",
-                            size=shex_uml_size
-                        ))
-                        
-                        logger.info(f"✅ ShEx UML diagram generated successfully")
-                        
-                except Exception as e:
-                    logger.warning(f"⚠️ Failed to generate ShEx: {str(e)}")
-                    # Continue without ShEx
-
-            # Store BDF graph object for GraphDB operations (in-memory only)
-            self.generated_files[f"{generation_id}_bdf"] = {
-                "bdf_graph": bdf,
-                "user_id": user_id,
-                "created_at": datetime.now()
-            }
+            # Keep the graph in an indexed on-disk store, later requests open it instead of regenerating it
+            store_file = triple_store.store_path(output_dir)
+            stage_start = time.perf_counter()
+            try:
+                triple_count = await asyncio.get_running_loop().run_in_executor(
+                    None, triple_store.save_graph, bdf, store_file
+                )
+                stage_times["store"] = time.perf_counter() - stage_start
+                logger.info(f"🗄️ Stored {triple_count} triples in {store_file}")
+            except Exception as e:
+                logger.warning(f"⚠️ Could not store the graph, it will be re-read from its RDF file when needed: {e}")
 
+            # SHACL, ShEx and their UML diagrams, built concurrently from statistics computed once
+            logger.info(f"🔍 Generating shapes (SHACL: {generate_shacl}, threshold {shacl_threshold}; "
+                        f"ShEx: {generate_shex}, threshold {shex_threshold})")
+            shape_files, shape_times = await shape_service.generate_shapes(
+                bdf,
+                store_file,
+                output_dir,
+                graph_name,
+                generate_shacl=generate_shacl,
+                shacl_threshold=shacl_threshold,
+                generate_shex=generate_shex,
+                shex_threshold=shex_threshold,
+                generate_uml_diagram=generate_uml_diagram,
+                namespaces=namespaces_dict,
+            )
+            stage_times.update(shape_times)
+            files = [{"name": rdf_file_path.name, "path": str(rdf_file_path), "type": "RDF"}]
+            for file_type in ("SHACL", "SHACL_Prefixes", "UML", "ShEx", "ShEx_UML"):
+                path = shape_files.get(file_type)
+                if path is None:
+                    continue
+                files.append({"name": path.name, "path": str(path), "type": file_type})
+                file_id = str(uuid.uuid4())
+                await self.persist_file(file_id, user_id, path.name, str(path), file_type)
+                generated_files.append(GeneratedFile(
+                    id=file_id,
+                    name=path.name,
+                    type=file_type,
+                    # UML diagrams are rendered on first request, their size is not known yet
+                    size=path.stat().st_size if path.exists() else 0
+                ))
+                logger.info(f"✅ {file_type} file {'generated' if path.exists() else 'deferred'}: {path.name}")
+
+            # Record the generation for the other workers, the graph itself is opened from its store
+            paths = {"rdf_path": str(rdf_file_path), "store_path": str(store_file)}
+            self.state.set(GENERATIONS_NAMESPACE, generation_id, {
+                **generation,
+                **paths,
+                "output_key": output_key,
+                "created_at": datetime.now(),
+            })
+            if output_key is not None:
+                generation_cache.publish(output_key, generation_id, files, paths)
+            _cache_bdf(generation_id, bdf)
+            # Compressed copies of the main file for downloads, written while the response goes out
+            rdf_formats.precompress(rdf_file_path, store_file, _graph_iri(version_iri, base_uri))
+
+            stage_times["total"] = time.perf_counter() - started
             logger.info(f"🎉 RDF generation completed successfully. Generated {len(generated_files)} files")
+            logger.info("⏱️ Stage times: " + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in stage_times.items()))
 
             return RDFGenerationResponse(
                 generation_id=generation_id,
                 generated_files=generated_files,
-                message="RDF graph generated successfully"
+                message="RDF graph generated successfully",
+                stage_times={name: round(seconds, 3) for name, seconds in stage_times.items()},
             )
             
         except Exception as e:
+            if output_key is not None:
+                generation_cache.abandon_build(output_key)
             logger.error(f"❌ Error generating RDF graph: {str(e)}")
             raise
 
-    async def get_bdf_graph(self, generation_id: str, user_id: int = None) -> Optional[BDFGraph]:
-        """Get BDF graph object by generation ID."""
-        try:
-            # Try to get from memory first
-            key = f"{generation_id}_bdf"
-            if key in self.generated_files:
-                file_data = self.generated_files[key]
-                if user_id is None or file_data.get("user_id") == user_id:
-                    return file_data.get("bdf_graph")
-            
-            # If not in memory, we would need to reconstruct it from stored data
-            # For now, return None - this indicates the graph needs to be regenerated
-            logger.warning(f"BDF graph with generation_id '{generation_id}' not found in memory")
+    async def _reuse_output(
+        self, output_key: str, output: Dict, generation_id: str, generation: Dict, started: float
+    ) -> RDFGenerationResponse:
+        """Record a generation whose files an identical earlier generation already produced."""
+        logger.info(f"♻️ Reusing the files of an identical generation ({output_key[:12]})")
+        generated_files = []
+        for file in output["files"]:
+            path = Path(file["path"])
+            file_id = str(uuid.uuid4())
+            await self.persist_file(file_id, generation["user_id"], file["name"], file["path"], file["type"])
+            generated_files.append(GeneratedFile(
+                id=file_id,
+                name=file["name"],
+                type=file["type"],
+                size=path.stat().st_size if path.exists() else 0
+            ))
+        self.state.set(GENERATIONS_NAMESPACE, generation_id, {
+            **generation,
+            **output["record"],
+            "output_key": output_key,
+            "created_at": datetime.now(),
+        })
+        return RDFGenerationResponse(
+            generation_id=generation_id,
+            generated_files=generated_files,
+            message="RDF graph generated successfully (files reused from an identical generation)",
+            stage_times={"total": round(time.perf_counter() - started, 3)},
+        )
+
+    async def delete_generation(self, generation_id: str, file_ids: List[str], user_id: int = None) -> None:
+        """Forget a generation and its file records. Its files are removed once no generation uses them."""
+        record = self.state.get(GENERATIONS_NAMESPACE, generation_id)
+        await self.db.execute(
+            delete(RDFFile).where(RDFFile.id.in_(file_ids), RDFFile.user_id == user_id)
+        )
+        await self.db.commit()
+        with _bdf_cache_lock:
+            _bdf_cache.pop(generation_id, None)
+        if record is None or (user_id is not None and record.get("user_id") != user_id):
+            return
+        self.state.delete(GENERATIONS_NAMESPACE, generation_id)
+        if record.get("output_key"):
+            generation_cache.release(record["output_key"], generation_id)
+        else:
+            # Not shared: a directory of its own
+            shutil.rmtree(Path(record["rdf_path"]).parent, ignore_errors=True)
+
+    async def ensure_file(self, file_info: Dict) -> bool:
+        """Whether the file is on disk, producing it first if it is a deferred artifact (UML diagrams)."""
+        path = Path(file_info["path"])
+        if path.exists():
+            return True
+        if file_info.get("type") in shape_service.UML_FILE_TYPES:
+            return await shape_service.ensure_uml(path)
+        return False
+
+    async def get_shape_statistics(self, generation_id: str, user_id: int = None):
+        """The generation's artifact directory and shape statistics, None if it has neither statistics nor a stored graph."""
+        record = self.state.get(GENERATIONS_NAMESPACE, generation_id)
+        if record is None or (user_id is not None and record.get("user_id") != user_id):
             return None
-            
+        output_dir = Path(record["rdf_path"]).parent
+        statistics = await shape_service.get_statistics(
+            output_dir, Path(record.get("store_path") or ""), record["base_uri"]
+        )
+        return (output_dir, statistics) if statistics is not None else None
+
+    async def get_rdf_variant(
+        self, generation_id: str, format: str, encoding: Optional[str] = None, user_id: int = None
+    ) -> Optional[Path]:
+        """
+        The generation's graph in a format (see rdf_formats.FORMATS), optionally compressed. Variants other
+        than the main file are built on first request. None if the generation is unknown.
+        """
+        record = self.state.get(GENERATIONS_NAMESPACE, generation_id)
+        if record is None or (user_id is not None and record.get("user_id") != user_id):
+            return None
+        store_file = Path(record["store_path"]) if record.get("store_path") else None
+        return await rdf_formats.ensure_variant(
+            Path(record["rdf_path"]), store_file, format, encoding,
+            _graph_iri(record["version_iri"], record["base_uri"]),
+        )
+
+    def get_rdf_format(self, generation_id: str) -> Optional[str]:
+        """Format of the generation's main RDF file."""
+        record = self.state.get(GENERATIONS_NAMESPACE, generation_id)
+        return rdf_formats.format_of(Path(record["rdf_path"])) if record else None
+
+    def get_store_path(self, generation_id: str, user_id: int = None) -> Optional[Path]:
+        """Path of the generation's indexed triple store, None if it has none."""
+        record = self.state.get(GENERATIONS_NAMESPACE, generation_id)
+        if record is None or (user_id is not None and record.get("user_id") != user_id):
+            return None
+        store_file = Path(record.get("store_path") or "")
+        return store_file if store_file.is_file() else None
+
+    async def get_bdf_graph(self, generation_id: str, user_id: int = None) -> Optional["BDFGraph"]:
+        """Get BDF graph object by generation ID, from any worker."""
+        try:
+            record = self.state.get(GENERATIONS_NAMESPACE, generation_id)
+            if record is None or (user_id is not None and record.get("user_id") != user_id):
+                logger.warning(f"BDF graph with generation_id '{generation_id}' not found")
+                return None
+
+            with _bdf_cache_lock:
+                if generation_id in _bdf_cache:
+                    _bdf_cache.move_to_end(generation_id)
+                    return _bdf_cache[generation_id]
+
+            metadata = {
+                "base_uri": record["base_uri"],
+                "version_iri": record["version_iri"],
+                "orcid": record["orcid"],
+                "author": record["author"],
+            }
+
+            def load():
+                store_file = Path(record.get("store_path") or "")
+                if store_file.is_file():
+                    # Opening the store reads nothing, triples are fetched as they are used
+                    return triple_store.open_bdf_graph(store_file, **metadata)
+                bdf = BDFGraph(**metadata)
+                bdf.parse(record["rdf_path"], format=rdf_formats.format_of(Path(record["rdf_path"])))
+                return bdf
+
+            bdf = await asyncio.get_running_loop().run_in_executor(None, load)
+            _cache_bdf(generation_id, bdf)
+            return bdf
+
         except Exception as e:
             logger.error(f"Error retrieving BDF graph: {str(e)}")
             return None
@@ -0,0 +1,231 @@
+"""
+File-based reference datasets (e.g. MitoCarta) converted once into a columnar, indexed store.
+
+Each dataset is written to REFERENCE_DATA_DIR/<name>/ as one .npy file per column (strings as a
+UTF-8 buffer plus offsets) and a sorted key index. Tables are opened with mmap, so every worker
+process shares the same read-only pages, and lookups are a binary search on the index.
+"""
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .lazy_imports import lazy_import
+
+mitocarta = lazy_import("pyBiodatafuse.annotators.mitocarta")
+collapse_data_sources = lazy_import("pyBiodatafuse.utils", "collapse_data_sources")
+get_identifier_of_interest = lazy_import("pyBiodatafuse.utils", "get_identifier_of_interest")
+Cons = lazy_import("pyBiodatafuse.constants")
+
+logger = logging.getLogger(__name__)
+
+REFERENCE_DATA_DIR = Path(os.getenv("REFERENCE_DATA_DIR", "./data/reference"))
+# Comma separated datasets converted in the background when the API starts
+REFERENCE_DATA_PREWARM = os.getenv("REFERENCE_DATA_PREWARM", "mitocarta_human")
+
+FORMAT_VERSION = 1
+# Cons.TARGET_COL, spelled out so that defining the sources does not import pyBiodatafuse
+TARGET_COL = "target"
+
+
+@dataclass(frozen=True)
+class ReferenceSource:
+    build: Callable[[Path], Tuple[pd.DataFrame, dict]]
+    key_column: str
+
+
+def _build_mitocarta(mitocarta_file: str, sheet_name: str, species: str):
+    def build(download_dir: Path):
+        mitocarta_df, metadata = mitocarta.download_mitocarta_dataset(
+            mitocarta_file=mitocarta_file,
+            filename=str(download_dir / mitocarta_file),
+            sheet_name=sheet_name,
+        )
+        return mitocarta.process_mitocarta(mitocarta_df=mitocarta_df, species=species), metadata
+    return build
+
+
+REFERENCE_SOURCES: Dict[str, ReferenceSource] = {
+    "mitocarta_human": ReferenceSource(
+        _build_mitocarta("Human.MitoCarta3.0.xls", "A Human MitoCarta3.0", "hsapiens"), TARGET_COL
+    ),
+    "mitocarta_mouse": ReferenceSource(
+        _build_mitocarta("Mouse.MitoCarta3.0.xls", "A Mouse MitoCarta3.0", "mmusculus"), TARGET_COL
+    ),
+}
+
+_tables: Dict[str, "ReferenceTable"] = {}
+# One lock per dataset: converting one table must not block lookups in the others
+_table_locks: Dict[str, threading.Lock] = {}
+_tables_lock = threading.Lock()
+
+
+def write_table(df: pd.DataFrame, key_column: str, metadata: dict, table_dir: Path) -> None:
+    """Write a DataFrame as a columnar table with a sorted index on `key_column`."""
+    table_dir.mkdir(parents=True, exist_ok=True)
+    columns = []
+    for position, column in enumerate(df.columns):
+        values = df[column]
+        if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            kind = "number"
+            np.save(table_dir / f"{position}.npy", values.to_numpy())
+        else:
+            kind = "string"
+            null = values.isna().to_numpy()
+            encoded = [b"" if missing else str(value).encode("utf-8") for value, missing in zip(values, null)]
+            offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+            np.cumsum([len(value) for value in encoded], out=offsets[1:])
+            np.save(table_dir / f"{position}.data.npy", np.frombuffer(b"".join(encoded), dtype=np.uint8))
+            np.save(table_dir / f"{position}.offsets.npy", offsets)
+            np.save(table_dir / f"{position}.null.npy", null)
+        columns.append({"name": str(column), "kind": kind})
+
+    keys = df[key_column].astype(str).to_numpy().astype(bytes)
+    order = np.argsort(keys, kind="stable")
+    np.save(table_dir / "index.keys.npy", keys[order])
+    np.save(table_dir / "index.rows.npy", order.astype(np.int64))
+
+    with open(table_dir / "schema.json", "w") as schema:
+        json.dump({
+            "format": FORMAT_VERSION,
+            "rows": len(df),
+            "key_column": key_column,
+            "columns": columns,
+            "metadata": metadata,
+        }, schema, indent=2, default=str)
+
+
+class ReferenceTable:
+    """Read-only, memory-mapped columnar table with a sorted key index."""
+
+    def __init__(self, table_dir: Path):
+        with open(table_dir / "schema.json") as schema:
+            self.schema = json.load(schema)
+        self.metadata = self.schema["metadata"]
+        self.key_column = self.schema["key_column"]
+        self.rows = self.schema["rows"]
+
+        self.index_keys = np.load(table_dir / "index.keys.npy", mmap_mode="r")
+        self.index_rows = np.load(table_dir / "index.rows.npy", mmap_mode="r")
+        self.columns = {}
+        for position, column in enumerate(self.schema["columns"]):
+            if column["kind"] == "number":
+                self.columns[column["name"]] = (np.load(table_dir / f"{position}.npy", mmap_mode="r"),)
+            else:
+                self.columns[column["name"]] = (
+                    np.load(table_dir / f"{position}.data.npy", mmap_mode="r"),
+                    np.load(table_dir / f"{position}.offsets.npy", mmap_mode="r"),
+                    np.load(table_dir / f"{position}.null.npy", mmap_mode="r"),
+                )
+
+    def _rows_for(self, keys: Iterable[str]) -> np.ndarray:
+        wanted = np.unique(np.array([str(key) for key in keys], dtype=bytes))
+        if len(wanted) == 0 or len(self.index_keys) == 0:
+            return np.zeros(0, dtype=np.int64)
+        # Equal keys are adjacent in the index, so each key matches a [left, right) range
+        left = np.searchsorted(self.index_keys, wanted, side="left")
+        right = np.searchsorted(self.index_keys, wanted, side="right")
+        ranges = [np.asarray(self.index_rows[l:r]) for l, r in zip(left, right) if r > l]
+        if not ranges:
+            return np.zeros(0, dtype=np.int64)
+        # Original row order, as if the source file had been filtered
+        return np.sort(np.concatenate(ranges))
+
+    def _column(self, name: str, rows: np.ndarray):
+        stored = self.columns[name]
+        if len(stored) == 1:
+            return np.asarray(stored[0][rows])
+        data, offsets, null = stored
+        return [
+            np.nan if null[row] else bytes(data[offsets[row]:offsets[row + 1]]).decode("utf-8")
+            for row in rows
+        ]
+
+    def lookup(self, keys: Iterable[str]) -> pd.DataFrame:
+        """Rows whose key column matches any of `keys` (an index join, the table is never scanned)."""
+        rows = self._rows_for(keys)
+        return pd.DataFrame({name: self._column(name, rows) for name in self.columns}, index=rows)
+
+
+def _convert(name: str, table_dir: Path) -> None:
+    source = REFERENCE_SOURCES[name]
+    REFERENCE_DATA_DIR.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(prefix=f".{name}_", dir=REFERENCE_DATA_DIR))
+    try:
+        df, metadata = source.build(REFERENCE_DATA_DIR)
+        write_table(df, source.key_column, metadata, staging)
+        try:
+            # Another worker may have finished the same conversion first, its table is as good as ours
+            staging.rename(table_dir)
+        except OSError:
+            pass
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def get_reference_table(name: str) -> ReferenceTable:
+    """Open a reference dataset, converting it on first use."""
+    if name not in REFERENCE_SOURCES:
+        raise ValueError(f"Unknown reference dataset '{name}'. Available: {', '.join(REFERENCE_SOURCES)}")
+
+    with _tables_lock:
+        table = _tables.get(name)
+        if table is not None:
+            return table
+        table_lock = _table_locks.setdefault(name, threading.Lock())
+
+    with table_lock:
+        table = _tables.get(name)
+        if table is not None:
+            return table
+
+        table_dir = REFERENCE_DATA_DIR / name
+        if not (table_dir / "schema.json").exists():
+            logger.info(f"Converting reference dataset {name}")
+            _convert(name, table_dir)
+        table = ReferenceTable(table_dir)
+        with _tables_lock:
+            _tables[name] = table
+        return table
+
+
+def prewarm(names: Optional[List[str]] = None) -> None:
+    """Convert and open reference datasets ahead of the first request. Failures are logged, not raised."""
+    names = names if names is not None else [n.strip() for n in REFERENCE_DATA_PREWARM.split(",") if n.strip()]
+    for name in names:
+        try:
+            get_reference_table(name)
+        except Exception as e:
+            logger.warning(f"Could not prepare reference dataset {name}: {e}")
+
+
+def get_gene_mito_pathways(bridgedb_df: pd.DataFrame, species: str = "hsapiens") -> Tuple[pd.DataFrame, dict]:
+    """Same output as `mitocarta.get_gene_mito_pathways`, answered from the preloaded MitoCarta table."""
+    table = get_reference_table("mitocarta_human" if species == "hsapiens" else "mitocarta_mouse")
+
+    data_df = get_identifier_of_interest(bridgedb_df, Cons.MITOCARTA_GENE_INPUT_ID)
+    subset_df = table.lookup(data_df[Cons.TARGET_COL].dropna().unique())
+    if subset_df.empty:
+        # collapse_data_sources short-cuts an empty target table (the column set to None), while the
+        # full table upstream passes gives every gene [{column: nan, ...}]: a row matching no gene
+        # keeps it on that merge path
+        subset_df = pd.DataFrame({column: [np.nan] for column in subset_df.columns}).astype(object)
+        subset_df[Cons.TARGET_COL] = ""
+
+    merged_df = collapse_data_sources(
+        data_df=data_df,
+        source_namespace=Cons.MITOCARTA_GENE_INPUT_ID,
+        target_df=subset_df,
+        common_cols=[Cons.TARGET_COL],
+        target_specific_cols=Cons.MITOCART_OUTPUT,
+        col_name=Cons.MITOCART_PATHWAY_COL,
+    )
+    return merged_df, dict(table.metadata)
@@ -0,0 +1,370 @@
+"""
+SHACL and ShEx shapes of a generated graph, built as a small stage graph:
+
+    statistics ─┬─ shacl
+                └─ shex
+    prefixes
+
+Both extractors (shexer) start from the class/property occurrence statistics of the graph, the
+only stage that scans it. `statistics` computes them once, in a worker process reading the
+stored graph, and the SHACL and ShEx builders then run in parallel worker processes from that
+result. The SHACL prefixes need no statistics and are written meanwhile.
+
+The statistics are saved with the generation's artifacts. Shapes at another threshold are
+rebuilt from them in milliseconds (`preview_shapes`, `export_shapes`), without generating the
+graph again. UML diagrams are deferred: generation records how each diagram is drawn,
+`ensure_uml` renders one (through the PlantUML server) the first time it is requested or
+prefetched, and the PNG is kept for later requests.
+"""
+import asyncio
+import logging
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, NamedTuple, Optional, Tuple, Union
+
+from . import artifact_store
+from .lazy_imports import lazy_import
+from .shared_state import get_shared_state
+from .workers import get_process_pool, run_in_background, run_once
+
+rdflib = lazy_import("rdflib")
+Shaper = lazy_import("shexer.shaper", "Shaper")
+shexer_consts = lazy_import("shexer.consts")
+shape_consts = lazy_import("shexer.model.shape")
+bdf_constants = lazy_import("pyBiodatafuse.constants")
+get_shacl_prefixes = lazy_import("pyBiodatafuse.graph.rdf.utils", "get_shacl_prefixes")
+triple_store = lazy_import(f"{__package__}.triple_store")
+
+logger = logging.getLogger(__name__)
+
+STATISTICS_FILENAME = "shape_statistics.pickle"
+# Deferred UML diagrams, by PNG path: the statistics, shape kind and threshold to draw them from
+DEFERRED_UML_NAMESPACE = "deferred_uml"
+UML_FILE_TYPES = {"UML": "shacl", "ShEx_UML": "shex"}
+SHAPE_FORMATS = ("shacl", "shex")
+# Loaded statistics kept per worker, for repeated threshold previews
+STATISTICS_CACHE_SIZE = 8
+
+_statistics_cache: "OrderedDict[str, ShapeStatistics]" = OrderedDict()
+_statistics_lock = threading.Lock()
+
+
+class ShapeStatistics(NamedTuple):
+    profile: dict
+    class_counts: dict
+    class_min_iris: dict
+    # The given namespaces plus the graph's own prefixes, used to write the shapes
+    namespaces: Dict[str, str]
+
+
+def shape_namespaces(base_uri: str) -> Dict[str, str]:
+    # What BDFGraph.shacl/shex use: the default shape namespaces plus the graph's own
+    return {**bdf_constants.NAMESPACE_SHAPES, base_uri: "graph"}
+
+
+def _shaper(graph, namespaces: Dict[str, str]):
+    return Shaper(all_classes_mode=True, rdflib_graph=graph, namespaces_dict=dict(namespaces))
+
+
+def compute_statistics(source: Union[str, "rdflib.Graph"], namespaces: Dict[str, str]) -> ShapeStatistics:
+    """Class/property occurrence statistics of a graph, or of the stored graph at path `source`."""
+    graph = triple_store.open_graph(Path(source)) if isinstance(source, str) else source
+    shaper = _shaper(graph, namespaces)
+    # Shaper only runs these two steps as part of shex_graph, which then builds one kind of shapes
+    shaper._launch_instance_tracker()
+    shaper._launch_class_profiler()
+    # Prefixes found in the graph were added to the shaper's namespaces, the shapes namespace is added again by each builder
+    namespaces = {uri: prefix for uri, prefix in shaper._namespaces_dict.items() if uri != shaper._shapes_namespace}
+    return ShapeStatistics(shaper._profile, shaper._class_counts, shaper._class_min_iris, namespaces)
+
+
+def _shaper_from_statistics(statistics: ShapeStatistics):
+    shaper = _shaper(rdflib.Graph(), statistics.namespaces)
+    shaper._target_classes_dict = {}
+    shaper._profile, shaper._class_counts, shaper._class_min_iris = statistics[:3]
+    return shaper
+
+
+def build_shapes(statistics: ShapeStatistics, graph_type: str, threshold: float, path: str) -> None:
+    """Write SHACL or ShEx shapes built from shared statistics."""
+    shaper = _shaper_from_statistics(statistics)
+    output_format = shexer_consts.SHACL_TURTLE if graph_type == "shacl" else shexer_consts.SHEXC
+    shapes = shaper.shex_graph(string_output=True, acceptance_threshold=threshold, output_format=output_format)
+    Path(path).write_text(shapes or "", encoding="utf-8")
+
+
+def render_uml(statistics_path: str, graph_type: str, threshold: float, uml_path: str) -> None:
+    """Draw the UML diagram of the SHACL or ShEx shapes built from saved statistics."""
+    shaper = _shaper_from_statistics(_load_statistics(Path(statistics_path)))
+    tmp = artifact_store.temp_path(Path(uml_path))
+    try:
+        # The diagram is the same for both output formats, only the shapes matter
+        shaper.shex_graph(acceptance_threshold=threshold, to_uml_path=str(tmp))
+        tmp.replace(uml_path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def _shapes(statistics: ShapeStatistics, threshold: float) -> list:
+    shaper = _shaper_from_statistics(statistics)
+    shaper._launch_class_shexer(acceptance_threshold=threshold)
+    return shaper._shape_list
+
+
+def _save_statistics(statistics: ShapeStatistics, path: Path) -> None:
+    tmp = artifact_store.temp_path(path)
+    try:
+        with open(tmp, "wb") as f:
+            pickle.dump(statistics, f, protocol=pickle.HIGHEST_PROTOCOL)
+        tmp.replace(path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+def _load_statistics(path: Path) -> ShapeStatistics:
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+def _cache_statistics(path: Path, statistics: ShapeStatistics) -> None:
+    with _statistics_lock:
+        _statistics_cache[str(path)] = statistics
+        _statistics_cache.move_to_end(str(path))
+        while len(_statistics_cache) > STATISTICS_CACHE_SIZE:
+            _statistics_cache.popitem(last=False)
+
+
+async def get_statistics(output_dir: Path, store_file: Optional[Path], base_uri: str) -> Optional[ShapeStatistics]:
+    """
+    Shape statistics of a generation. Generations saved without them (no shapes requested) get them
+    computed from their stored graph once. None when neither is available.
+    """
+    path = output_dir / STATISTICS_FILENAME
+    with _statistics_lock:
+        if str(path) in _statistics_cache:
+            _statistics_cache.move_to_end(str(path))
+            return _statistics_cache[str(path)]
+
+    loop = asyncio.get_running_loop()
+    if path.is_file():
+        statistics = await loop.run_in_executor(None, _load_statistics, path)
+    elif store_file is not None and store_file.is_file():
+        statistics = await loop.run_in_executor(
+            get_process_pool(), compute_statistics, str(store_file), shape_namespaces(base_uri)
+        )
+        await loop.run_in_executor(None, _save_statistics, statistics, path)
+    else:
+        return None
+    _cache_statistics(path, statistics)
+    return statistics
+
+
+def _check_threshold(threshold: float) -> None:
+    if not 0 <= threshold <= 1:
+        raise ValueError("The threshold must be between 0 and 1")
+
+
+def _shape_name(shape) -> str:
+    return shape.name.lstrip(shape_consts.STARTING_CHAR_FOR_SHAPE_NAME).strip("<>")
+
+
+def preview_shapes(statistics: ShapeStatistics, threshold: float) -> Dict:
+    """
+    Which shapes and constraints are kept at `threshold`. Every constraint found in the graph is
+    listed with its support (share of the class instances having it) and whether it is kept.
+    """
+    _check_threshold(threshold)
+    kept = {
+        shape.name: {(st.st_property, st.st_type, st.is_inverse) for st in shape.statements}
+        for shape in _shapes(statistics, threshold)
+    }
+    shapes = []
+    for shape in _shapes(statistics, 0):
+        survivors = kept.get(shape.name, set())
+        shapes.append({
+            "name": _shape_name(shape),
+            "class": shape.class_uri,
+            "instances": shape.n_instances,
+            "kept": shape.name in kept,
+            "constraints": [
+                {
+                    "property": st.st_property,
+                    "type": st.st_type,
+                    "cardinality": str(st.cardinality),
+                    # shexer reports optional constraints ("?", "*") with probability 1
+                    "support": round(st.n_occurences / shape.n_instances if shape.n_instances else st.probability, 6),
+                    "occurrences": st.n_occurences,
+                    "inverse": st.is_inverse,
+                    "kept": (st.st_property, st.st_type, st.is_inverse) in survivors,
+                }
+                for st in shape.statements
+            ],
+        })
+    return {
+        "threshold": threshold,
+        "shapes": shapes,
+        "kept_shapes": len(kept),
+        "total_shapes": len(shapes),
+        "kept_constraints": sum(len(survivors) for survivors in kept.values()),
+        "total_constraints": sum(len(shape["constraints"]) for shape in shapes),
+    }
+
+
+def export_shapes(statistics: ShapeStatistics, graph_type: str, threshold: float, path: Path) -> Path:
+    """Write SHACL or ShEx shapes at `threshold`, kept at `path` for later requests."""
+    if graph_type not in SHAPE_FORMATS:
+        raise ValueError(f"Unknown shape format '{graph_type}'. Available: {', '.join(SHAPE_FORMATS)}")
+    _check_threshold(threshold)
+    if not path.exists():
+        # Unique per writer: two workers exporting the same threshold both rename a complete file
+        tmp = artifact_store.temp_path(path)
+        try:
+            build_shapes(statistics, graph_type, threshold, str(tmp))
+            tmp.replace(path)
+        finally:
+            tmp.unlink(missing_ok=True)
+    artifact_store.used(path)
+    return path
+
+
+async def ensure_uml(uml_path: Path) -> bool:
+    """
+    Make sure a UML diagram exists, rendering it if it was deferred. Returns False when the file is
+    missing and cannot be produced, raises when rendering fails.
+    """
+    key = str(uml_path.resolve())
+    record = get_shared_state().get(DEFERRED_UML_NAMESPACE, key)
+    if record is not None:
+        # Can be rendered again
+        artifact_store.used(uml_path)
+    if uml_path.exists():
+        return True
+    if record is None:
+        return False
+
+    async def render():
+        start = time.perf_counter()
+        await asyncio.get_running_loop().run_in_executor(
+            get_process_pool(), render_uml, record["statistics"], record["graph_type"], record["threshold"], key
+        )
+        logger.info(f"🖼️ Rendered {uml_path.name} in {time.perf_counter() - start:.1f}s")
+
+    await run_once(f"uml:{key}", render)
+    return True
+
+
+def prefetch_uml(uml_paths) -> int:
+    """Render deferred UML diagrams in the background. Returns how many were scheduled."""
+    scheduled = 0
+    for uml_path in uml_paths:
+        if not uml_path.exists():
+            run_in_background(ensure_uml(uml_path), f"Prefetching {uml_path.name}")
+            scheduled += 1
+    return scheduled
+
+
+def shape_file_names(graph_name: str) -> Dict[str, str]:
+    """Name of each shape artifact, by the file type it is recorded with."""
+    return {
+        "SHACL": f"{graph_name}_shacl.ttl",
+        "SHACL_Prefixes": f"{graph_name}_shacl_prefixes.ttl",
+        "UML": f"{graph_name}_shacl.png",
+        "ShEx": f"{graph_name}_shex.ttl",
+        "ShEx_UML": f"{graph_name}_shex_diagram.png",
+    }
+
+
+async def generate_shapes(
+    bdf,
+    store_file: Optional[Path],
+    output_dir: Path,
+    graph_name: str,
+    generate_shacl: bool = True,
+    shacl_threshold: float = 0.001,
+    generate_shex: bool = True,
+    shex_threshold: float = 0.001,
+    generate_uml_diagram: bool = True,
+    namespaces: Optional[Dict[str, str]] = None,
+) -> Tuple[Dict[str, Path], Dict[str, float]]:
+    """
+    Run the shape stages for a generated graph. A failed stage is logged and its files are left out.
+
+    Returns the files, by file type (see `shape_file_names`), and the duration of each stage. With
+    `generate_uml_diagram` the UML diagrams of the built shapes are included but only recorded as
+    deferred, see `ensure_uml`. `namespaces` are extra prefixes for the SHACL prefixes file.
+    """
+    loop = asyncio.get_running_loop()
+    times: Dict[str, float] = {}
+    names = shape_file_names(graph_name)
+    paths = {file_type: (output_dir / name).resolve() for file_type, name in names.items()}
+    namespaces_dict = shape_namespaces(bdf.base_uri)
+
+    async def stage(name, executor, function, *args):
+        start = time.perf_counter()
+        try:
+            return await loop.run_in_executor(executor, function, *args)
+        finally:
+            times[name] = time.perf_counter() - start
+
+    prefixes = None
+    if generate_shacl:
+        prefixes = asyncio.ensure_future(stage(
+            "prefixes", None, lambda: get_shacl_prefixes(
+                namespaces=namespaces, path=str(paths["SHACL_Prefixes"]), new_uris=bdf.new_uris, print_string_output=False
+            )
+        ))
+
+    builders = {}
+    statistics_path = None
+    if generate_shacl or generate_shex:
+        try:
+            if store_file is not None and store_file.is_file():
+                statistics = await stage("statistics", get_process_pool(), compute_statistics, str(store_file), namespaces_dict)
+            else:
+                # Without a stored graph a worker process cannot read it, profile the in-memory one here
+                statistics = await stage("statistics", None, compute_statistics, bdf, namespaces_dict)
+            logger.info(f"📊 Class/property statistics computed in {times['statistics']:.1f}s")
+            # Kept for UML diagrams and for shapes at other thresholds
+            statistics_path = output_dir / STATISTICS_FILENAME
+            await loop.run_in_executor(None, _save_statistics, statistics, statistics_path)
+            _cache_statistics(statistics_path, statistics)
+
+            for graph_type, enabled, threshold, file_type in (
+                ("shacl", generate_shacl, shacl_threshold, "SHACL"),
+                ("shex", generate_shex, shex_threshold, "ShEx"),
+            ):
+                if enabled:
+                    builders[graph_type] = (threshold, asyncio.ensure_future(stage(
+                        graph_type, get_process_pool(), build_shapes,
+                        statistics, graph_type, threshold, str(paths[file_type]),
+                    )))
+        except Exception as e:
+            logger.warning(f"⚠️ Computing shape statistics failed, no SHACL or ShEx shapes: {e}")
+
+    if prefixes is not None:
+        try:
+            await prefixes
+        except Exception as e:
+            logger.warning(f"⚠️ SHACL prefixes generation failed: {e}")
+
+    deferred = {}
+    for graph_type, (threshold, builder) in builders.items():
+        try:
+            await builder
+        except Exception as e:
+            logger.warning(f"⚠️ {graph_type} shapes generation failed: {e}")
+            continue
+        if generate_uml_diagram:
+            uml_type = next(file_type for file_type, kind in UML_FILE_TYPES.items() if kind == graph_type)
+            get_shared_state().set(DEFERRED_UML_NAMESPACE, str(paths[uml_type]), {
+                "statistics": str(statistics_path),
+                "graph_type": graph_type,
+                "threshold": threshold,
+            })
+            deferred[uml_type] = paths[uml_type]
+
+    files = {file_type: path for file_type, path in paths.items() if path.exists() or file_type in deferred}
+    return files, times
@@ -0,0 +1,154 @@
+"""
+State shared by every API worker: generated artifacts, job records and cached values.
+
+Anything a later request may need (a generated RDF file, the record of a generation, a value
+computed once for everyone) goes through `get_shared_state()` instead of living in a worker's
+memory, so N workers, on one host or several, can serve any request.
+
+SHARED_STATE_BACKEND selects the implementation. "local" keeps values in a SQLite database and
+artifacts in a directory under SHARED_STATE_DIR; running several hosts requires that directory
+on a shared volume. Other stores (Redis plus object storage, ...) implement `SharedState` and
+are added with `register_backend`.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+SHARED_STATE_BACKEND = os.getenv("SHARED_STATE_BACKEND", "local")
+SHARED_STATE_DIR = Path(os.getenv("SHARED_STATE_DIR", "./data/shared"))
+
+
+class SharedState(ABC):
+    """Interface of a cross-worker store. Values are any picklable object, `ttl` is in seconds."""
+
+    @abstractmethod
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        ...
+
+    @abstractmethod
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ...
+
+    @abstractmethod
+    def add(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        """Set the value only if the key is absent (or expired). Returns whether it was set, e.g. to claim a job."""
+
+    @abstractmethod
+    def delete(self, namespace: str, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def keys(self, namespace: str) -> List[str]:
+        ...
+
+    @abstractmethod
+    def artifact_dir(self, *parts: str) -> Path:
+        """A directory, created if needed, whose files every worker can read."""
+
+    def sweep(self) -> None:
+        """Drop expired values. Optional for stores that expire keys themselves."""
+
+
+class LocalSharedState(SharedState):
+    """SQLite (WAL mode, safe across processes) for values, the filesystem for artifacts."""
+
+    def __init__(self, root: Path = SHARED_STATE_DIR):
+        self.root = root
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.root / "state.sqlite"
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS state ("
+                "namespace TEXT NOT NULL, key TEXT NOT NULL, value BLOB NOT NULL, expires_at REAL, "
+                "PRIMARY KEY (namespace, key))"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread, sqlite3 connections cannot be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _expiry(ttl: Optional[float]) -> Optional[float]:
+        return time.time() + ttl if ttl is not None else None
+
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        row = self._connect().execute(
+            "SELECT value FROM state WHERE namespace = ? AND key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (namespace, key, time.time()),
+        ).fetchone()
+        return pickle.loads(row[0]) if row else default
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self._connect().execute(
+            "INSERT OR REPLACE INTO state (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+            (namespace, key, pickle.dumps(value), self._expiry(ttl)),
+        )
+
+    def add(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "DELETE FROM state WHERE namespace = ? AND key = ? AND expires_at <= ?",
+                (namespace, key, time.time()),
+            )
+            added = conn.execute(
+                "INSERT OR IGNORE INTO state (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (namespace, key, pickle.dumps(value), self._expiry(ttl)),
+            ).rowcount == 1
+            conn.execute("COMMIT")
+            return added
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def delete(self, namespace: str, key: str) -> None:
+        self._connect().execute("DELETE FROM state WHERE namespace = ? AND key = ?", (namespace, key))
+
+    def keys(self, namespace: str) -> List[str]:
+        rows = self._connect().execute(
+            "SELECT key FROM state WHERE namespace = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (namespace, time.time()),
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def artifact_dir(self, *parts: str) -> Path:
+        directory = self.root.joinpath("artifacts", *parts)
+        directory.mkdir(parents=True, exist_ok=True)
+        return directory
+
+    def sweep(self) -> None:
+        self._connect().execute("DELETE FROM state WHERE expires_at <= ?", (time.time(),))
+
+
+_backends: Dict[str, Callable[[], SharedState]] = {"local": LocalSharedState}
+_state: Optional[SharedState] = None
+_state_lock = threading.Lock()
+
+
+def register_backend(name: str, factory: Callable[[], SharedState]) -> None:
+    _backends[name] = factory
+
+
+def get_shared_state() -> SharedState:
+    global _state
+    with _state_lock:
+        if _state is None:
+            if SHARED_STATE_BACKEND not in _backends:
+                raise ValueError(
+                    f"Unknown SHARED_STATE_BACKEND '{SHARED_STATE_BACKEND}'. Available: {', '.join(_backends)}"
+                )
+            _state = _backends[SHARED_STATE_BACKEND]()
+        return _state
@@ -0,0 +1,265 @@
+"""
+Embedded SPARQL over the stored graph of an RDF generation (see triple_store).
+
+Queries run in-process against the indexed SQLite store, no triplestore has to be set up. Each
+basic graph pattern (the triple patterns of a group) is evaluated by the store as one SQL join
+over its SPO/POS/OSP indexes; everything above it (OPTIONAL, UNION, MINUS, FILTER, joins between
+groups, aggregates) is rdflib's SPARQL engine, which joins row by row in Python. Queries made of
+a few selective patterns answer in milliseconds, queries combining large groups take seconds and
+are bounded by the time budget rather than answered quickly.
+
+Parsed queries are cached, results are streamed in batches and each query has a time budget: the
+store aborts reads once it is spent. Only read queries are accepted, SERVICE calls to other
+endpoints are refused.
+"""
+import csv
+import io
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from itertools import chain, islice
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+from .lazy_imports import lazy_import
+
+rdflib = lazy_import("rdflib")
+algebra = lazy_import("rdflib.plugins.sparql.algebra")
+prepareQuery = lazy_import("rdflib.plugins.sparql", "prepareQuery")
+evalQuery = lazy_import("rdflib.plugins.sparql.evaluate", "evalQuery")
+sparql = lazy_import("rdflib.plugins.sparql")
+FrozenBindings = lazy_import("rdflib.plugins.sparql.sparql", "FrozenBindings")
+nt_row = lazy_import("rdflib.plugins.serializers.nt", "_nt_row")
+triple_store = lazy_import(f"{__package__}.triple_store")
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds, a request may ask for less
+SPARQL_TIMEOUT = float(os.getenv("SPARQL_TIMEOUT", "30"))
+SPARQL_MAX_ROWS = int(os.getenv("SPARQL_MAX_ROWS", "100000"))
+QUERY_CACHE_SIZE = 128
+GRAPH_CACHE_SIZE = 4
+STREAM_BATCH_ROWS = 1000
+
+RESULT_FORMATS = ("json", "csv")
+MEDIA_TYPES = {
+    "json": "application/sparql-results+json",
+    "csv": "text/csv",
+    "nt": "application/n-triples",
+}
+
+_queries: "OrderedDict[tuple, object]" = OrderedDict()
+_graphs: "OrderedDict[str, object]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _cached(cache: OrderedDict, key, size: int, build):
+    with _cache_lock:
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+    value = build()
+    with _cache_lock:
+        cache[key] = value
+        while len(cache) > size:
+            cache.popitem(last=False)
+    return value
+
+
+def _open_graph(store_file: Path):
+    return _cached(_graphs, str(store_file), GRAPH_CACHE_SIZE, lambda: triple_store.open_graph(store_file))
+
+
+def _find_service(node):
+    if getattr(node, "name", None) == "ServiceGraphPattern":
+        raise algebra.StopTraversal(True)
+
+
+def _prepare(query: str, graph):
+    # The graph's prefixes can be used without declaring them
+    namespaces = tuple(sorted((prefix, str(uri)) for prefix, uri in graph.namespaces()))
+
+    def build():
+        try:
+            prepared = prepareQuery(query, initNs=dict(namespaces))
+        except Exception as e:
+            raise ValueError(f"Invalid SPARQL query: {e}")
+        if prepared.algebra.datasetClause:
+            raise ValueError("FROM and FROM NAMED are not supported, queries run against the generated graph")
+        if algebra.traverse(prepared.algebra, visitPre=_find_service, complete=False):
+            raise ValueError("SERVICE is not supported, only the generated graph can be queried")
+        return prepared
+
+    return _cached(_queries, (query, namespaces), QUERY_CACHE_SIZE, build)
+
+
+def _evaluate_bgp(ctx, part):
+    """rdflib custom evaluation: basic graph patterns over a SQLite store become one SQL join."""
+    store = getattr(ctx.graph, "store", None)
+    if (
+        part.name != "BGP"
+        or not part.triples
+        or len(part.triples) > triple_store.MAX_JOIN_PATTERNS
+        or not isinstance(store, triple_store.SQLiteTripleStore)
+    ):
+        raise NotImplementedError()
+
+    # Names already bound by the enclosing pattern are constants, blank nodes in a query are
+    # variables too (as in rdflib's own evaluation) under a name no SPARQL variable can have
+    names = {}
+    patterns = []
+    for triple in part.triples:
+        pattern = []
+        for term in triple:
+            if isinstance(term, (rdflib.Variable, rdflib.BNode)) and ctx[term] is None:
+                name = term if isinstance(term, rdflib.Variable) else rdflib.Variable(f"_:{term}")
+                names[name] = term
+                term = name
+            else:
+                term = ctx[term]
+            pattern.append(term)
+        patterns.append(tuple(pattern))
+
+    variables, rows = store.join(patterns)
+    keys = [names[variable] for variable in variables]
+    return (FrozenBindings(ctx, chain(ctx.bindings.items(), zip(keys, row))) for row in rows)
+
+
+def _json_term(term) -> dict:
+    if isinstance(term, rdflib.URIRef):
+        return {"type": "uri", "value": str(term)}
+    if isinstance(term, rdflib.BNode):
+        return {"type": "bnode", "value": str(term)}
+    value = {"type": "literal", "value": str(term)}
+    if term.language:
+        value["xml:lang"] = term.language
+    elif term.datatype:
+        value["datatype"] = str(term.datatype)
+    return value
+
+
+class _Budget:
+    """Query time budget, only spent while the query is evaluated (not while a client reads results)."""
+
+    def __init__(self, seconds: float):
+        self.remaining = seconds
+
+    def run(self, function):
+        start = time.monotonic()
+        try:
+            with triple_store.deadline(start + self.remaining):
+                return function()
+        finally:
+            self.remaining -= time.monotonic() - start
+
+
+def _stream(rows: Iterator, first: list, budget: _Budget, max_rows: int, encode_row) -> Iterator[Tuple[str, bool]]:
+    """Yields (encoded batch, truncated) pairs, pulling rows from the query within the time budget."""
+    sent = 0
+    batch = first
+    while batch:
+        if sent + len(batch) > max_rows:
+            yield "".join(encode_row(row, sent + i) for i, row in enumerate(batch[:max_rows - sent])), True
+            return
+        yield "".join(encode_row(row, sent + i) for i, row in enumerate(batch)), False
+        sent += len(batch)
+        try:
+            batch = budget.run(lambda: list(islice(rows, STREAM_BATCH_ROWS)))
+        except triple_store.QueryTimeout:
+            logger.warning(f"⏱️ SPARQL query timed out after {sent} rows, results truncated")
+            yield "", True
+            return
+
+
+def _select_json(variables, rows, first, budget, max_rows) -> Iterator[bytes]:
+    names = [str(variable) for variable in variables]
+    yield json.dumps({"head": {"vars": names}})[:-1].encode() + b', "results": {"bindings": ['
+
+    def encode(row, index):
+        binding = {str(variable): _json_term(term) for variable, term in row.items() if variable in variables}
+        return ("," if index else "") + json.dumps(binding)
+
+    truncated = False
+    for chunk, truncated in _stream(rows, first, budget, max_rows, encode):
+        yield chunk.encode()
+    yield b"]}" + (b', "truncated": true' if truncated else b"") + b"}"
+
+
+def _select_csv(variables, rows, first, budget, max_rows) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\r\n")
+
+    def line(values):
+        writer.writerow(values)
+        value = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return value
+
+    yield line([str(variable) for variable in variables]).encode()
+
+    def encode(row, index):
+        return line(["" if row.get(variable) is None else str(row.get(variable)) for variable in variables])
+
+    for chunk, truncated in _stream(rows, first, budget, max_rows, encode):
+        if truncated:
+            logger.warning(f"✂️ SPARQL CSV results truncated at {max_rows} rows")
+        yield chunk.encode()
+
+
+def _ntriples(graph, budget, max_rows) -> Iterator[bytes]:
+    def encode(triple, index):
+        # Escapes literals the N-Triples way (n3() writes multi-line ones as triple-quoted)
+        return nt_row(triple)
+
+    for chunk, truncated in _stream(iter(()), list(graph), budget, max_rows, encode):
+        yield chunk.encode()
+        if truncated:
+            yield b"# results truncated\n"
+
+
+def run_query(
+    store_file: Path,
+    query: str,
+    format: str = "json",
+    timeout: Optional[float] = None,
+    max_rows: Optional[int] = None,
+) -> Tuple[str, Iterator[bytes]]:
+    """
+    Evaluate a SPARQL query against a stored graph. Returns the media type and the response body chunks.
+
+    SELECT results are SPARQL JSON or CSV (`format`), ASK results SPARQL JSON and CONSTRUCT/DESCRIBE
+    results N-Triples. The first batch of results is computed here, so a bad query raises ValueError
+    and an exhausted time budget QueryTimeout before anything is sent. A timeout while streaming
+    ends the results early, marked as truncated.
+    """
+    if format not in RESULT_FORMATS:
+        raise ValueError(f"Unknown result format '{format}'. Available: {', '.join(RESULT_FORMATS)}")
+    timeout = min(timeout, SPARQL_TIMEOUT) if timeout else SPARQL_TIMEOUT
+    max_rows = min(max_rows, SPARQL_MAX_ROWS) if max_rows else SPARQL_MAX_ROWS
+
+    sparql.CUSTOM_EVALS.setdefault("sqlite_bgp", _evaluate_bgp)
+    graph = _open_graph(store_file)
+    prepared = _prepare(query, graph)
+    budget = _Budget(timeout)
+
+    start = time.perf_counter()
+    result = budget.run(lambda: evalQuery(graph, prepared))
+    query_type = result["type_"]
+
+    if query_type == "SELECT":
+        variables = result["vars_"]
+        rows = iter(result["bindings"])
+        first = budget.run(lambda: list(islice(rows, STREAM_BATCH_ROWS)))
+        logger.info(f"🔎 SPARQL SELECT first {len(first)} rows in {time.perf_counter() - start:.3f}s")
+        if format == "csv":
+            return MEDIA_TYPES["csv"], _select_csv(variables, rows, first, budget, max_rows)
+        return MEDIA_TYPES["json"], _select_json(variables, rows, first, budget, max_rows)
+
+    logger.info(f"🔎 SPARQL {query_type} evaluated in {time.perf_counter() - start:.3f}s")
+    if query_type == "ASK":
+        return MEDIA_TYPES["json"], iter([json.dumps({"head": {}, "boolean": result["askAnswer"]}).encode()])
+    return MEDIA_TYPES["nt"], _ntriples(result["graph"], budget, max_rows)
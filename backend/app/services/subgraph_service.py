@@ -0,0 +1,131 @@
+import asyncio
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+import numpy as np
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .compact_graph import CompactGraph
+from .graph_service import GraphService
+from .lazy_imports import lazy_import
+from .. import models
+
+cytoscape_graph = lazy_import("pyBiodatafuse.graph.cytoscape")
+
+MAX_SUBGRAPH_DEPTH = 5
+
+
+class SeedsNotFound(LookupError):
+    pass
+
+
+def resolve(graph: CompactGraph, identifiers: Iterable[str]):
+    """Map identifiers (node ids or names, e.g. gene symbols) to node positions. Returns (positions, missing identifiers)."""
+    positions, missing = set(), []
+    for identifier in identifiers:
+        if identifier in graph.position:
+            positions.add(graph.position[identifier])
+        elif str(identifier).lower() in graph.by_name:
+            positions.update(graph.by_name[str(identifier).lower()])
+        else:
+            missing.append(identifier)
+    return np.fromiter(positions, dtype=np.int64, count=len(positions)), missing
+
+
+def _mask(codes: np.ndarray, names: List[str], selected: Optional[List[str]]) -> Optional[np.ndarray]:
+    if not selected:
+        return None
+    allowed = np.array([i for i, name in enumerate(names) if name in set(selected)], dtype=np.int32)
+    return np.isin(codes, allowed)
+
+
+def k_hop(
+    graph: CompactGraph,
+    seeds: np.ndarray,
+    depth: int = 1,
+    node_types: Optional[List[str]] = None,
+    node_sources: Optional[List[str]] = None,
+    edge_types: Optional[List[str]] = None,
+):
+    """Nodes within `depth` hops of the seeds (edges traversed in both directions) and the edges among them."""
+    node_allowed = np.ones(graph.node_count, dtype=bool)
+    for mask in (
+        _mask(graph.node_type, graph.node_type_names, node_types),
+        _mask(graph.node_source, graph.node_source_names, node_sources),
+    ):
+        if mask is not None:
+            node_allowed &= mask
+    edge_allowed = _mask(graph.edge_type, graph.edge_type_names, edge_types)
+
+    visited = np.zeros(graph.node_count, dtype=bool)
+    visited[seeds] = True
+    frontier = seeds
+    for _ in range(depth):
+        incident = graph.incident(frontier)
+        if edge_allowed is not None:
+            incident = incident[edge_allowed[incident]]
+        neighbors = np.unique(np.concatenate([graph.edge_src[incident], graph.edge_dst[incident]]))
+        neighbors = neighbors[~visited[neighbors] & node_allowed[neighbors]]
+        if len(neighbors) == 0:
+            break
+        visited[neighbors] = True
+        frontier = neighbors
+
+    nodes = np.flatnonzero(visited)
+    edges = np.unique(graph.incident(nodes))
+    edges = edges[visited[graph.edge_src[edges]] & visited[graph.edge_dst[edges]]]
+    if edge_allowed is not None:
+        edges = edges[edge_allowed[edges]]
+    return nodes, edges
+
+
+class SubgraphService:
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    def _extract(self, annotation, graph_dir, seeds, depth, node_types, node_sources, edge_types):
+        graph, error = GraphService.get_compact_graph(annotation, graph_dir)
+        if error:
+            return None, f"Graph error: {error}"
+
+        seed_positions, missing = resolve(graph, seeds)
+        if len(seed_positions) == 0:
+            raise SeedsNotFound("None of the requested identifiers are present in the graph.")
+
+        nodes, edges = k_hop(
+            graph,
+            seed_positions,
+            depth=depth,
+            node_types=node_types,
+            node_sources=node_sources,
+            edge_types=edge_types,
+        )
+        raw_graph = cytoscape_graph.convert_graph_to_json(graph.to_networkx(nodes, edges))
+        return {
+            "elements": raw_graph.get("elements"),
+            "seeds": [graph.node_ids[i] for i in seed_positions],
+            "missing_identifiers": missing,
+            "node_count": len(nodes),
+            "edge_count": len(edges),
+        }, None
+
+    async def get_neighborhood(
+        self,
+        annotation: models.Annotation,
+        graph_dir: Path,
+        seeds: List[str],
+        depth: int = 1,
+        node_types: Optional[List[str]] = None,
+        node_sources: Optional[List[str]] = None,
+        edge_types: Optional[List[str]] = None,
+    ):
+        try:
+            depth = max(0, min(depth, MAX_SUBGRAPH_DEPTH))
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                None, self._extract, annotation, graph_dir, seeds, depth, node_types, node_sources, edge_types
+            )
+        except SeedsNotFound:
+            raise
+        except Exception as e:
+            return None, f"Error extracting subgraph: {str(e)}"
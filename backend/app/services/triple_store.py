@@ -0,0 +1,376 @@
+"""
+Disk-backed, indexed RDF store for generated BDF graphs.
+
+A generated graph is copied once into a SQLite file next to its other artifacts. Terms are
+dictionary-encoded and triples stored as integer ids with SPO, POS and OSP indexes, so any
+triple pattern is an index range scan. `open_bdf_graph` returns a BDFGraph backed by that
+file: opening it reads nothing, triples are fetched as SHACL/ShEx runs, exports or uploads
+ask for them, and every worker can open the same file.
+"""
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from rdflib import BNode, Graph, Literal, URIRef, Variable
+from rdflib.store import Store, VALID_STORE
+from rdflib.term import Node
+
+from pyBiodatafuse.graph.rdf import BDFGraph
+
+STORE_FILENAME = "graph.sqlite"
+LOAD_BATCH_TRIPLES = 100_000
+FETCH_ROWS = 10_000
+# Decoded terms kept per open graph (cleared when full)
+TERM_CACHE_SIZE = 500_000
+# SQLite's limit on bound parameters per statement
+_MAX_PARAMS = 900
+# SQLite's limit on tables in one join
+MAX_JOIN_PATTERNS = 64
+
+_URI, _BNODE, _LITERAL = 0, 1, 2
+
+# Deadline (time.monotonic) of the query running on this thread, see `deadline`
+_query = threading.local()
+
+
+class QueryTimeout(Exception):
+    pass
+
+
+@contextmanager
+def deadline(at: Optional[float]):
+    """Abort store reads made on this thread after time.monotonic() passes `at`."""
+    previous = getattr(_query, "deadline", None)
+    _query.deadline = at
+    try:
+        yield
+    finally:
+        _query.deadline = previous
+
+
+def _expired() -> bool:
+    at = getattr(_query, "deadline", None)
+    return at is not None and time.monotonic() > at
+
+
+def _check_deadline() -> None:
+    if _expired():
+        raise QueryTimeout("Query timed out")
+
+
+_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS terms (id INTEGER PRIMARY KEY, kind INTEGER NOT NULL, value TEXT NOT NULL, "
+    "datatype TEXT NOT NULL DEFAULT '', lang TEXT NOT NULL DEFAULT '', UNIQUE (kind, value, datatype, lang))",
+    "CREATE TABLE IF NOT EXISTS triples (s INTEGER NOT NULL, p INTEGER NOT NULL, o INTEGER NOT NULL, "
+    "PRIMARY KEY (s, p, o)) WITHOUT ROWID",
+    "CREATE TABLE IF NOT EXISTS namespaces (prefix TEXT PRIMARY KEY, uri TEXT NOT NULL)",
+]
+# Built after a bulk load, maintaining them row by row makes loading several times slower
+_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS triples_pos ON triples (p, o, s)",
+    "CREATE INDEX IF NOT EXISTS triples_osp ON triples (o, s, p)",
+]
+
+
+def _encode(term: Node) -> Tuple[int, str, str, str]:
+    if isinstance(term, Literal):
+        return _LITERAL, str(term), str(term.datatype or ""), term.language or ""
+    if isinstance(term, BNode):
+        return _BNODE, str(term), "", ""
+    return _URI, str(term), "", ""
+
+
+def _decode(kind: int, value: str, datatype: str, lang: str) -> Node:
+    if kind == _LITERAL:
+        return Literal(value, lang=lang or None, datatype=URIRef(datatype) if datatype else None)
+    if kind == _BNODE:
+        return BNode(value)
+    return URIRef(value)
+
+
+class SQLiteTripleStore(Store):
+    """rdflib Store over a SQLite file (one graph, not context aware)."""
+
+    context_aware = False
+    formula_aware = False
+    transaction_aware = False
+    graph_aware = False
+
+    def __init__(self, configuration: Optional[str] = None, identifier=None):
+        self.path: Optional[str] = None
+        self._local = threading.local()
+        self._term_ids: Dict[Node, int] = {}
+        self._terms: Dict[int, Node] = {}
+        self._next_id: Optional[int] = None
+        super().__init__(configuration, identifier)
+
+    def open(self, configuration: str, create: bool = False) -> int:
+        self.path = configuration
+        if create:
+            conn = self._conn()
+            for statement in _SCHEMA:
+                conn.execute(statement)
+            conn.commit()
+            if conn.execute("SELECT COUNT(*) FROM terms").fetchone()[0] == 0:
+                # A new store is only written by this instance, so term ids can be assigned here
+                self._next_id = 1
+        return VALID_STORE
+
+    def create_indexes(self) -> None:
+        conn = self._conn()
+        for statement in _INDEXES:
+            conn.execute(statement)
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread, graphs are read from executor threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Streamed results may be resumed on another thread than the one that started them
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Interrupts a long-running statement once the query deadline passed
+            conn.set_progress_handler(_expired, 10_000)
+            self._local.conn = conn
+        return conn
+
+    def close(self, commit_pending_transaction: bool = False) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            if commit_pending_transaction:
+                conn.commit()
+            conn.close()
+            self._local.conn = None
+
+    # Terms
+
+    def _lookup(self, term: Node) -> Optional[int]:
+        term_id = self._term_ids.get(term)
+        if term_id is None:
+            row = self._conn().execute(
+                "SELECT id FROM terms WHERE kind = ? AND value = ? AND datatype = ? AND lang = ?", _encode(term)
+            ).fetchone()
+            if row is None:
+                return None
+            term_id = self._term_ids[term] = row[0]
+        return term_id
+
+    def _intern(self, terms: Iterable[Node]) -> None:
+        missing = set(terms) - self._term_ids.keys()
+        if not missing:
+            return
+        conn = self._conn()
+        if self._next_id is not None:
+            ids = range(self._next_id, self._next_id + len(missing))
+            conn.executemany(
+                "INSERT INTO terms (id, kind, value, datatype, lang) VALUES (?, ?, ?, ?, ?)",
+                [(term_id, *_encode(term)) for term_id, term in zip(ids, missing)],
+            )
+            self._term_ids.update(zip(missing, ids))
+            self._next_id += len(missing)
+            return
+        for term in missing:
+            key = _encode(term)
+            conn.execute("INSERT OR IGNORE INTO terms (kind, value, datatype, lang) VALUES (?, ?, ?, ?)", key)
+            self._term_ids[term] = conn.execute(
+                "SELECT id FROM terms WHERE kind = ? AND value = ? AND datatype = ? AND lang = ?", key
+            ).fetchone()[0]
+
+    # Triples
+
+    def add(self, triple, context, quoted: bool = False) -> None:
+        self.addN([(*triple, context)])
+
+    def addN(self, quads) -> None:
+        quads = list(quads)
+        self._intern(term for quad in quads for term in quad[:3])
+        ids = self._term_ids
+        conn = self._conn()
+        conn.executemany(
+            "INSERT OR IGNORE INTO triples (s, p, o) VALUES (?, ?, ?)",
+            [(ids[s], ids[p], ids[o]) for s, p, o, _ in quads],
+        )
+        conn.commit()
+
+    def _where(self, pattern) -> Optional[Tuple[str, list]]:
+        clauses, params = [], []
+        for column, term in zip(("s", "p", "o"), pattern):
+            if term is None:
+                continue
+            term_id = self._lookup(term)
+            if term_id is None:
+                return None  # a term never stored cannot match
+            clauses.append(f"t.{column} = ?")
+            params.append(term_id)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def remove(self, triple_pattern, context=None) -> None:
+        where = self._where(triple_pattern)
+        if where is None:
+            return
+        conn = self._conn()
+        conn.execute(f"DELETE FROM triples AS t{where[0]}", where[1])
+        conn.commit()
+
+    def triples(self, triple_pattern, context=None) -> Iterator:
+        where = self._where(triple_pattern)
+        if where is None:
+            return
+        for triple in self._solutions("SELECT t.s, t.p, t.o FROM triples AS t" + where[0], where[1], 3):
+            yield triple, iter(())
+
+    def join(self, patterns: List[Tuple[Node, Node, Node]]) -> Tuple[List[Variable], Iterator[Tuple[Node, ...]]]:
+        """
+        Solutions of a basic graph pattern, evaluated as one SQL join over the triple indexes.
+        Variables in `patterns` are the unknowns, a variable used twice is joined on. Returns the
+        variables and an iterator of their values, one tuple per solution.
+        """
+        columns: Dict[Variable, str] = {}
+        clauses, params = [], []
+        for i, pattern in enumerate(patterns):
+            for column, term in zip(("s", "p", "o"), pattern):
+                reference = f"t{i}.{column}"
+                if isinstance(term, Variable):
+                    if term in columns:
+                        clauses.append(f"{reference} = {columns[term]}")
+                    else:
+                        columns[term] = reference
+                    continue
+                term_id = self._lookup(term)
+                if term_id is None:
+                    return list(columns), iter(())  # a term never stored cannot match
+                clauses.append(f"{reference} = ?")
+                params.append(term_id)
+
+        variables = list(columns)
+        tables = ", ".join(f"triples AS t{i}" for i in range(len(patterns)))
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        select = ", ".join(columns.values()) if columns else "1"
+        return variables, self._solutions(f"SELECT {select} FROM {tables}{where}", params, len(variables))
+
+    def _solutions(self, sql: str, params: list, width: int) -> Iterator[Tuple[Node, ...]]:
+        conn = self._conn()
+        try:
+            cursor = conn.execute(sql, params)
+            while True:
+                _check_deadline()
+                rows = cursor.fetchmany(FETCH_ROWS)
+                if not rows:
+                    return
+                if not width:
+                    yield from (() for _ in rows)
+                    continue
+                terms = self._load_terms(conn, {term_id for row in rows for term_id in row})
+                for row in rows:
+                    yield tuple(terms[term_id] for term_id in row)
+        except sqlite3.OperationalError:
+            _check_deadline()  # interrupted by the progress handler
+            raise
+
+    def _load_terms(self, conn: sqlite3.Connection, ids) -> Dict[int, Node]:
+        missing = [term_id for term_id in ids if term_id not in self._terms]
+        if len(self._terms) + len(missing) > TERM_CACHE_SIZE:
+            self._terms = {}
+            missing = list(ids)
+        for start in range(0, len(missing), _MAX_PARAMS):
+            chunk = missing[start:start + _MAX_PARAMS]
+            for term_id, *encoded in conn.execute(
+                f"SELECT id, kind, value, datatype, lang FROM terms WHERE id IN ({','.join('?' * len(chunk))})", chunk
+            ):
+                self._terms[term_id] = _decode(*encoded)
+        return self._terms
+
+    def __len__(self, context=None) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM triples").fetchone()[0]
+
+    # Namespaces
+
+    def bind(self, prefix: str, namespace: URIRef, override: bool = True) -> None:
+        conn = self._conn()
+        if override:
+            conn.execute("DELETE FROM namespaces WHERE uri = ?", (str(namespace),))
+            conn.execute("INSERT OR REPLACE INTO namespaces (prefix, uri) VALUES (?, ?)", (prefix, str(namespace)))
+        else:
+            conn.execute("INSERT OR IGNORE INTO namespaces (prefix, uri) VALUES (?, ?)", (prefix, str(namespace)))
+        conn.commit()
+
+    def namespace(self, prefix: str) -> Optional[URIRef]:
+        row = self._conn().execute("SELECT uri FROM namespaces WHERE prefix = ?", (prefix,)).fetchone()
+        return URIRef(row[0]) if row else None
+
+    def prefix(self, namespace: URIRef) -> Optional[str]:
+        row = self._conn().execute("SELECT prefix FROM namespaces WHERE uri = ?", (str(namespace),)).fetchone()
+        return row[0] if row else None
+
+    def namespaces(self):
+        for prefix, uri in self._conn().execute("SELECT prefix, uri FROM namespaces").fetchall():
+            yield prefix, URIRef(uri)
+
+
+class _StoreBackedGraph(Graph):
+    # BDFGraph calls super().__init__() without arguments, this puts our store in that call
+    def __init__(self):
+        super().__init__(store=self._backing_store)
+
+
+class PersistentBDFGraph(BDFGraph, _StoreBackedGraph):
+    """A BDFGraph whose triples live in a SQLiteTripleStore."""
+
+    def __init__(self, store: SQLiteTripleStore, **metadata):
+        self._backing_store = store
+        super().__init__(**metadata)
+
+
+def store_path(output_dir: Path) -> Path:
+    return output_dir / STORE_FILENAME
+
+
+def save_graph(graph: Graph, path: Path) -> int:
+    """Copy a generated (in-memory) graph and its prefixes into a new store file. Returns the triple count."""
+    # Unique per writer: two builds of the same store never share (or delete) a temp file
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+    store = SQLiteTripleStore()
+    store.open(str(tmp), create=True)
+    try:
+        batch = []
+        for triple in graph:
+            batch.append((*triple, None))
+            if len(batch) >= LOAD_BATCH_TRIPLES:
+                store.addN(batch)
+                batch = []
+        if batch:
+            store.addN(batch)
+        for prefix, namespace in graph.namespaces():
+            store.bind(prefix, namespace)
+        store.create_indexes()
+        count = len(store)
+    except BaseException:
+        store.close(commit_pending_transaction=False)
+        tmp.unlink(missing_ok=True)
+        raise
+    store.close(commit_pending_transaction=True)
+    # Readers only ever see a complete store
+    tmp.replace(path)
+    return count
+
+
+def open_graph(path: Path) -> Graph:
+    """Open a stored graph as a plain rdflib Graph (for querying), without loading it."""
+    if not path.exists():
+        raise FileNotFoundError(f"No stored graph at {path}")
+    store = SQLiteTripleStore()
+    store.open(str(path))
+    return Graph(store=store)
+
+
+def open_bdf_graph(path: Path, **metadata) -> PersistentBDFGraph:
+    """Open a stored graph without loading it. `metadata` are the BDFGraph constructor arguments."""
+    if not path.exists():
+        raise FileNotFoundError(f"No stored graph at {path}")
+    store = SQLiteTripleStore()
+    store.open(str(path))
+    return PersistentBDFGraph(store, **metadata)
@@ -0,0 +1,53 @@
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+_process_pool_lock = threading.Lock()
+
+# Tasks producing an artifact in this worker, by key, so concurrent requests for it share one
+_running: Dict[str, "asyncio.Future"] = {}
+# Background tasks, kept referenced until done (the event loop only holds weak references)
+_background: set = set()
+
+
+def process_pool_size() -> int:
+    """Worker processes of the pool: ANALYSIS_WORKERS, default: CPU count."""
+    return int(os.getenv("ANALYSIS_WORKERS", "0")) or os.cpu_count() or 1
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Process pool shared by the CPU-bound graph computations."""
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(max_workers=process_pool_size())
+        return _process_pool
+
+
+async def run_once(key: str, factory: Callable[[], Awaitable]):
+    """Await `factory()`, or the run of it already in progress for `key` in this worker."""
+    task = _running.get(key)
+    if task is None:
+        task = _running[key] = asyncio.ensure_future(factory())
+        task.add_done_callback(lambda _: _running.pop(key, None))
+    # Shielded: a waiter cancelled (client gone) must not cancel the run the other waiters share
+    return await asyncio.shield(task)
+
+
+def run_in_background(awaitable: Awaitable, description: str) -> None:
+    """Run without waiting for the result, failures are logged."""
+    task = asyncio.ensure_future(awaitable)
+    _background.add(task)
+
+    def done(task):
+        _background.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"⚠️ {description} failed: {task.exception()}")
+
+    task.add_done_callback(done)
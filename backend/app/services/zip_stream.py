@@ -0,0 +1,165 @@
+"""
+ZIP archives streamed while they are written.
+
+zipfile writes to an unseekable stream (sizes and CRCs go into data descriptors after each
+member), so a thread compresses the members into a bounded queue and the response sends the
+chunks as they come: the first bytes leave right away and memory stays at a few chunks. Members
+that are already compressed (PNG diagrams, .gz/.zst variants) are stored as they are.
+
+A completed archive is also kept next to the files it was built from, under a name derived
+from their names, sizes and modification times, so the next download of the same files is
+served from disk. It is a regenerable artifact, evicted under storage pressure.
+"""
+import asyncio
+import hashlib
+import logging
+import queue
+import threading
+import time
+import uuid
+import zipfile
+from pathlib import Path
+from typing import AsyncIterator, List, Optional, Tuple
+
+from . import artifact_store
+
+logger = logging.getLogger(__name__)
+
+# Stored without compression, deflating them again costs time and saves nothing
+STORED_SUFFIXES = {".png", ".jpg", ".jpeg", ".gz", ".zst", ".zip"}
+CHUNK_BYTES = 1 << 20
+# Chunks compressed ahead of the client
+QUEUE_CHUNKS = 8
+COMPRESS_LEVEL = 6
+
+_DONE = object()
+
+
+class _Cancelled(Exception):
+    pass
+
+
+class _QueueWriter:
+    """Unseekable file object for zipfile: buffers writes into chunks for the queue, copied to the cache file."""
+
+    def __init__(self, chunks: "queue.Queue", cache_file=None):
+        self.chunks = chunks
+        self.cache_file = cache_file
+        self.cancelled = threading.Event()
+        self._buffer = bytearray()
+
+    def write(self, data) -> int:
+        self._buffer += data
+        if len(self._buffer) >= CHUNK_BYTES:
+            self._put(bytes(self._buffer))
+            self._buffer.clear()
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        if self._buffer:
+            self._put(bytes(self._buffer))
+            self._buffer.clear()
+
+    def _put(self, item) -> None:
+        if isinstance(item, bytes) and self.cache_file is not None:
+            self.cache_file.write(item)
+        while True:
+            if self.cancelled.is_set():
+                raise _Cancelled()
+            try:
+                self.chunks.put(item, timeout=1)
+                return
+            except queue.Full:
+                continue
+
+    def next_chunk(self):
+        """Consumer side, run in an executor thread: the next item, _DONE once cancelled."""
+        while True:
+            try:
+                return self.chunks.get(timeout=1)
+            except queue.Empty:
+                if self.cancelled.is_set():
+                    return _DONE
+
+
+def archive_path(members: List[Tuple[Path, str]]) -> Optional[Path]:
+    """Where the archive of these members is cached, None if some member is missing."""
+    digest = hashlib.sha256()
+    for path, name in members:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        digest.update(f"{name}\0{stat.st_size}\0{stat.st_mtime_ns}\0".encode())
+    return members[0][0].parent / f".archive_{digest.hexdigest()[:24]}.zip"
+
+
+def _write_archive(members: List[Tuple[Path, str]], writer: _QueueWriter) -> None:
+    with zipfile.ZipFile(writer, "w", zipfile.ZIP_DEFLATED, compresslevel=COMPRESS_LEVEL) as archive:
+        for path, name in members:
+            stored = path.suffix.lower() in STORED_SUFFIXES
+            archive.write(path, name, compress_type=zipfile.ZIP_STORED if stored else zipfile.ZIP_DEFLATED)
+    writer.close()
+
+
+async def stream_zip(members: List[Tuple[Path, str]], cache_path: Optional[Path] = None) -> AsyncIterator[bytes]:
+    """Body of a ZIP of `members` (path, name in the archive), also written to `cache_path` if given."""
+    chunks: "queue.Queue" = queue.Queue(maxsize=QUEUE_CHUNKS)
+    tmp = cache_path.with_name(f"{cache_path.name}.{uuid.uuid4().hex}.tmp") if cache_path else None
+    cache_file = None
+    if tmp is not None:
+        try:
+            cache_file = open(tmp, "wb")
+        except OSError as e:
+            logger.warning(f"⚠️ Not caching ZIP archive {cache_path.name}: {e}")
+    writer = _QueueWriter(chunks, cache_file)
+    started = time.perf_counter()
+
+    def produce():
+        try:
+            _write_archive(members, writer)
+            if cache_file is not None:
+                cache_file.close()
+                tmp.replace(cache_path)
+                artifact_store.used(cache_path)
+            outcome = _DONE
+        except _Cancelled:
+            # Wakes a consumer thread still waiting for a chunk, it would otherwise poll until it sees the flag
+            try:
+                writer.chunks.put_nowait(_DONE)
+            except queue.Full:
+                pass
+            return
+        except Exception as e:
+            outcome = e
+        finally:
+            if cache_file is not None and not cache_file.closed:
+                cache_file.close()
+                tmp.unlink(missing_ok=True)
+        try:
+            writer._put(outcome)
+        except _Cancelled:
+            pass
+
+    # A thread of its own, a large archive would hold an executor thread for the whole download
+    threading.Thread(target=produce, name="zip-stream", daemon=True).start()
+    loop = asyncio.get_running_loop()
+    sent = 0
+    try:
+        while True:
+            item = await loop.run_in_executor(None, writer.next_chunk)
+            if item is _DONE:
+                break
+            if isinstance(item, Exception):
+                logger.error(f"❌ ZIP archive failed after {sent} bytes: {item}")
+                raise item
+            sent += len(item)
+            yield item
+        logger.info(f"📦 Streamed {len(members)} files ({sent / 1024 ** 2:.1f} MiB) in {time.perf_counter() - started:.1f}s")
+    finally:
+        # Client gone or failure: stop the writer, which removes the partial cache file, and
+        # release an executor thread left waiting for the next chunk
+        writer.cancelled.set()
@@ -0,0 +1,113 @@
+"""
+Memory and throughput of CompactGraph against nx.MultiDiGraph.
+
+Builds synthetic graphs shaped like BioDatafuse output (typed nodes from a few sources,
+labelled edges with a hash and a data source) and reports:
+  - memory held by each representation (tracemalloc)
+  - conversion time, adjacency construction, 2-hop neighborhood queries and NetworkX round trip
+
+Usage, from the backend directory:
+    python -m benchmarks.compact_graph_benchmark [--edges 100000 1000000]
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+
+import numpy as np
+import networkx as nx
+
+from app.services.compact_graph import CompactGraph
+from app.services.subgraph_service import k_hop
+
+NODE_TYPES = ["Gene", "Pathway", "Disease", "Compound", "Anatomical Entity", "GO Term"]
+SOURCES = ["Ensembl", "WikiPathways", "DisGeNET", "OpenTargets", "Bgee", "MINERVA"]
+EDGE_LABELS = ["part_of", "associated_with", "activates", "inhibits", "expressed_in"]
+
+
+def synthetic_graph(edges: int, seed: int = 42) -> nx.MultiDiGraph:
+    rng = np.random.default_rng(seed)
+    nodes = max(edges // 4, 10)
+    pygraph = nx.MultiDiGraph()
+    for i in range(nodes):
+        node_type = NODE_TYPES[i % len(NODE_TYPES)]
+        pygraph.add_node(
+            f"node:{i}",
+            id=f"node:{i}",
+            name=f"{node_type}_{i}",
+            labels=node_type,
+            datasource=SOURCES[i % len(SOURCES)],
+        )
+    # Power-law-ish endpoints, as hubs dominate annotation graphs
+    src = (rng.pareto(1.5, edges) * 10).astype(np.int64) % nodes
+    dst = rng.integers(0, nodes, edges)
+    for e, (u, v) in enumerate(zip(src.tolist(), dst.tolist())):
+        label = EDGE_LABELS[e % len(EDGE_LABELS)]
+        pygraph.add_edge(
+            f"node:{u}",
+            f"node:{v}",
+            label=label,
+            labels=label,
+            edge_hash=f"{u}-{v}-{e}",
+            datasource=SOURCES[e % len(SOURCES)],
+        )
+    return pygraph
+
+
+def timed(function, *args, repeat: int = 1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = function(*args)
+    return result, (time.perf_counter() - start) / repeat
+
+
+def run(edges: int, queries: int = 200):
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+
+    pygraph = synthetic_graph(edges)
+    nx_bytes = tracemalloc.get_traced_memory()[0] - baseline
+
+    compact = CompactGraph.from_networkx(pygraph)
+    node_ids = list(pygraph.nodes())
+    del pygraph
+    gc.collect()
+    # Node id strings and attribute values are shared, so this is everything the compact graph keeps alive
+    compact_bytes = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+
+    rng = np.random.default_rng(0)
+    seeds = rng.integers(0, compact.node_count, queries)
+
+    _, adjacency_time = timed(compact.adjacency)
+    start = time.perf_counter()
+    for seed in seeds:
+        k_hop(compact, np.array([seed]), depth=2)
+    k_hop_compact = (time.perf_counter() - start) / queries
+
+    # Conversions are timed outside tracemalloc, which slows every allocation down
+    pygraph, to_nx_time = timed(compact.to_networkx)
+    _, build_compact = timed(CompactGraph.from_networkx, pygraph)
+    undirected = pygraph.to_undirected(as_view=True)
+    start = time.perf_counter()
+    for seed in seeds:
+        nx.single_source_shortest_path_length(undirected, node_ids[seed], cutoff=2)
+    k_hop_nx = (time.perf_counter() - start) / queries
+    _, adjacency_nx = timed(nx.to_scipy_sparse_array, pygraph)
+
+    mb = 1024 * 1024
+    print(f"--- {edges:,} edges, {compact.node_count:,} nodes ---")
+    print(f"memory    networkx {nx_bytes / mb:9.1f} MB   compact {compact_bytes / mb:9.1f} MB"
+          f"   (arrays {compact.nbytes() / mb:.1f} MB)")
+    print(f"convert   from_networkx {build_compact:6.2f} s   to_networkx {to_nx_time:6.2f} s")
+    print(f"adjacency networkx {adjacency_nx * 1000:9.1f} ms   compact {adjacency_time * 1000:9.1f} ms")
+    print(f"2-hop     networkx {k_hop_nx * 1000:9.2f} ms   compact {k_hop_compact * 1000:9.2f} ms  per query")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--edges", type=int, nargs="+", default=[100_000, 1_000_000])
+    args = parser.parse_args()
+    for edge_count in args.edges:
+        run(edge_count)
@@ -0,0 +1,90 @@
+"""
+Import-time profile of the API process.
+
+Runs `python -X importtime -c "import app.main"` in a fresh interpreter and summarizes the
+log: total time, the slowest packages (cumulative and self time), and whether any module that
+should be imported lazily (see app/services/lazy_imports.py) was loaded eagerly. The summary
+is printed and, with --output, written to a file to keep as a CI artifact next to the raw log.
+
+Exits with status 1 when a lazy module was imported eagerly or the total exceeds --max-seconds.
+
+Usage, from the backend directory:
+    python -m benchmarks.import_time [--module app.main] [--top 25] [--output importtime.txt] [--max-seconds 3]
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+from typing import List, NamedTuple, Tuple
+
+# Top-level packages that must not be loaded by importing the API
+LAZY_PACKAGES = ["pyBiodatafuse", "matplotlib", "py4cytoscape", "igraph", "rdflib", "neo4j", "openpyxl", "seaborn"]
+
+_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+class ImportRecord(NamedTuple):
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def profile(module: str) -> Tuple[List[ImportRecord], str]:
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=env, check=False,
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    records = []
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            records.append(ImportRecord(name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return records, result.stderr
+
+
+def summarize(module: str, records: List[ImportRecord], top: int) -> Tuple[str, List[str]]:
+    total = next((r.cumulative_us for r in reversed(records) if r.module == module), 0)
+    roots = {}
+    for record in records:
+        root = record.module.split(".")[0]
+        roots[root] = roots.get(root, 0) + record.self_us
+    eager = sorted({r.module.split(".")[0] for r in records} & set(LAZY_PACKAGES))
+
+    lines = [f"import {module}: {total / 1e6:.2f} s, {len(records)} modules", ""]
+    lines.append("Slowest packages (self time summed over their modules):")
+    for root, self_us in sorted(roots.items(), key=lambda item: -item[1])[:top]:
+        lines.append(f"  {self_us / 1e3:9.1f} ms  {root}")
+    lines.append("")
+    lines.append("Slowest imports (cumulative):")
+    for record in sorted(records, key=lambda r: -r.cumulative_us)[:top]:
+        lines.append(f"  {record.cumulative_us / 1e3:9.1f} ms  {'  ' * record.depth}{record.module}")
+    lines.append("")
+    lines.append(f"Eagerly imported lazy packages: {', '.join(eager) if eager else 'none'}")
+    return "\n".join(lines), eager
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--top", type=int, default=25)
+    parser.add_argument("--output", type=Path, help="write the summary here and the raw log next to it (.log)")
+    parser.add_argument("--max-seconds", type=float, help="fail when the import takes longer than this")
+    args = parser.parse_args()
+
+    records, raw = profile(args.module)
+    summary, eager = summarize(args.module, records, args.top)
+    print(summary)
+    if args.output:
+        args.output.write_text(summary + "\n")
+        args.output.with_suffix(".log").write_text(raw)
+
+    total = max((r.cumulative_us for r in records if r.module == args.module), default=0) / 1e6
+    if eager or (args.max_seconds is not None and total > args.max_seconds):
+        sys.exit(1)
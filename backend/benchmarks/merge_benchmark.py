@@ -0,0 +1,96 @@
+"""
+Single-pass merge_sources against pyBiodatafuse's combine_sources for 1-15 annotation sources.
+
+Builds a synthetic BridgeDb mapping and per-source frames shaped like annotator output (one
+row per identifier/target with a list-of-dicts column, each source covering part of the
+identifiers) and reports, per number of sources:
+  - chained: combine_sources called once per added source on the growing result (the rows of
+    multi-mapped identifiers multiply with every call, so it only runs up to --max-chained sources)
+  - combine_sources: one call over all frames
+  - merge_sources: the single-pass engine, and its peak traced memory against combine_sources
+The engine's output is checked to equal the single combine_sources call.
+
+Usage, from the backend directory:
+    python -m benchmarks.merge_benchmark [--identifiers 20000] [--sources 1 5 10 15] [--max-chained 5]
+"""
+import argparse
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import pyBiodatafuse.constants as Cons
+from pyBiodatafuse.utils import combine_sources
+
+from app.services.merge_engine import merge_sources, merged_row_count
+
+
+def synthetic_mapping(identifiers: int, rng) -> pd.DataFrame:
+    rows = []
+    for i in range(identifiers):
+        # A few identifiers map to two Ensembl genes, like real symbol mappings
+        for k in range(2 if i % 50 == 0 else 1):
+            rows.append((f"GENE{i}", "HGNC", f"ENSG{i:011d}{k}", Cons.ENSEMBL))
+        rows.append((f"GENE{i}", "HGNC", str(i), "NCBI Gene"))
+    return pd.DataFrame(rows, columns=[Cons.IDENTIFIER_COL, Cons.IDENTIFIER_SOURCE_COL, Cons.TARGET_COL, Cons.TARGET_SOURCE_COL])
+
+
+def synthetic_sources(mapping: pd.DataFrame, sources: int, rng):
+    genes = mapping[mapping[Cons.TARGET_SOURCE_COL] == Cons.ENSEMBL]
+    frames = []
+    for s in range(sources):
+        subset = genes[rng.random(len(genes)) < 0.7].copy()
+        subset[f"source_{s}"] = [[{"id": f"S{s}:{j}", "score": float(j % 7)}] for j in range(len(subset))]
+        frames.append(subset.reset_index(drop=True))
+    return frames
+
+
+def chained(mapping, frames):
+    # What flask's process_selected_sources did before
+    combined = pd.DataFrame()
+    for frame in frames:
+        combined = combine_sources(mapping, [combined, frame])
+    return combined
+
+
+def measure(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    function(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def run(identifiers: int, source_counts, max_chained: int):
+    rng = np.random.default_rng(42)
+    mapping = synthetic_mapping(identifiers, rng)
+    all_frames = synthetic_sources(mapping, max(source_counts), rng)
+    mb = 1024 * 1024
+
+    print(f"{'sources':>7} {'rows':>9} {'chained':>9} {'combine':>9} {'merge':>9} {'speed-up':>9} "
+          f"{'combine MB':>11} {'merge MB':>9} {'equal':>6}")
+    for count in source_counts:
+        frames = all_frames[:count]
+        chained_time = None
+        if count <= max_chained:
+            chained_time = time.perf_counter()
+            chained(mapping, frames)
+            chained_time = time.perf_counter() - chained_time
+        expected, combine_time, combine_peak = measure(combine_sources, mapping, frames)
+        merged, merge_time, merge_peak = measure(merge_sources, mapping, frames)
+        assert merged_row_count(mapping, frames) == len(merged)
+        print(f"{count:>7} {len(merged):>9,} {f'{chained_time:.2f}s' if chained_time is not None else '-':>9} {combine_time:>8.2f}s {merge_time:>8.2f}s "
+              f"{combine_time / merge_time:>8.1f}x {combine_peak / mb:>11.1f} {merge_peak / mb:>9.1f} "
+              f"{str(expected.equals(merged)):>6}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--identifiers", type=int, default=20_000)
+    parser.add_argument("--sources", type=int, nargs="+", default=[1, 2, 5, 10, 15])
+    parser.add_argument("--max-chained", type=int, default=5)
+    args = parser.parse_args()
+    run(args.identifiers, args.sources, args.max_chained)
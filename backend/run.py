@@ -1,10 +1,15 @@
+import os
+
 import uvicorn
 
 if __name__ == "__main__":
+    workers = int(os.getenv("API_WORKERS", "1"))
+    # uvicorn ignores `workers` when reloading, so reload is only used with a single worker
+    reload = os.getenv("API_RELOAD", "true").lower() == "true" and workers == 1
     uvicorn.run(
         "app.main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True,
-        workers=1
-    )
\ No newline at end of file
+        host=os.getenv("API_HOST", "0.0.0.0"),
+        port=int(os.getenv("API_PORT", "8000")),
+        reload=reload,
+        workers=workers
+    )
@@ -0,0 +1,63 @@
+"""
+Local BridgeDb mapping against a recorded web-service response.
+
+data/bridgedb holds an excerpt of a Human mapping database's link table and an `xrefsBatch`
+response for the same genes in the web service's format. Re-record it from the live service with
+`python -m app.services.bridgedb_local record Human En identifiers.txt xrefsBatch_Human_En.tsv`.
+"""
+from pathlib import Path
+from unittest import mock
+
+import pandas as pd
+import pytest
+from pyBiodatafuse import id_mapper
+
+from app.services import bridgedb_local
+from app.services.bridgedb_local import LocalBridgeDbMapper, build_database, parity_check
+
+DATA = Path(__file__).parent / "data" / "bridgedb"
+RECORDED_RESPONSE = DATA / "xrefsBatch_Human_En.tsv"
+
+
+@pytest.fixture
+def mapper(tmp_path, monkeypatch):
+    db_path = tmp_path / "Human.sqlite"
+    build_database(DATA / "link_human_excerpt.tsv", db_path)
+    monkeypatch.setattr(bridgedb_local, "BRIDGEDB_LOCAL_DB", str(tmp_path / "{species}.sqlite"))
+    monkeypatch.setattr(bridgedb_local, "_mappers", {})
+    return LocalBridgeDbMapper(db_path)
+
+
+def test_parity_with_recorded_response(mapper):
+    report = parity_check(mapper, RECORDED_RESPONSE)
+    assert report == {"identifiers": 3, "matching": 3, "missing_xrefs": 0, "extra_xrefs": 0}
+
+
+def test_parity_reports_differences(mapper, tmp_path):
+    response = tmp_path / "response.tsv"
+    lines = RECORDED_RESPONSE.read_text().splitlines()
+    # One xref the local database lacks, one it has that the response does not list
+    lines[0] += ",L:999999"
+    lines[1] = lines[1].replace(",S:P51587", "")
+    response.write_text("\n".join(lines) + "\n")
+
+    report = parity_check(mapper, response)
+    assert report == {"identifiers": 3, "matching": 1, "missing_xrefs": 1, "extra_xrefs": 1}
+
+
+def _sorted(df: pd.DataFrame) -> pd.DataFrame:
+    return df.sort_values(list(df.columns)).reset_index(drop=True)
+
+
+def test_local_xref_matches_web_service(mapper):
+    identifiers = pd.DataFrame({"identifier": ["ENSG00000012048", "ENSG00000139618", "ENSG00000141510"]})
+    response = mock.Mock(content=RECORDED_RESPONSE.read_bytes(), url="https://webservice.bridgedb.org/Human/xrefsBatch")
+    with mock.patch.object(id_mapper.requests, "post", return_value=response), \
+            mock.patch.object(id_mapper, "get_version_webservice_bridgedb", return_value={}), \
+            mock.patch.object(id_mapper, "get_version_datasource_bridgedb", return_value=[]):
+        remote, _ = id_mapper.bridgedb_xref(identifiers.copy(), input_datasource="Ensembl")
+
+    local, metadata = bridgedb_local.local_bridgedb_xref(identifiers.copy(), input_datasource="Ensembl")
+
+    pd.testing.assert_frame_equal(_sorted(local), _sorted(remote))
+    assert metadata["query"]["input_type"] == "Ensembl"
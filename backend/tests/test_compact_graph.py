@@ -0,0 +1,94 @@
+from types import SimpleNamespace
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+from pyBiodatafuse.analyzer.summarize import BioGraph
+
+from app.services import compact_graph, graph_service
+from app.services.analysis_service import _edge_sources, _source_counts
+from app.services.compact_graph import CompactGraph
+from app.services.graph_service import GraphService
+from app.services.subgraph_service import k_hop
+
+
+def _graph() -> nx.MultiDiGraph:
+    pygraph = nx.MultiDiGraph()
+    for i in range(30):
+        pygraph.add_node(
+            f"n{i}", name=f"N{i}", labels="Gene" if i % 2 else "Pathway", datasource="WikiPathways" if i % 3 else "Bgee"
+        )
+    # Out of destination order and with parallel edges, so summing duplicates has to reorder
+    for i in range(30):
+        pygraph.add_edge(f"n{i}", f"n{(i * 7 + 3) % 30}", label="x", labels="x", datasource="StringDB")
+        pygraph.add_edge(f"n{i}", f"n{(i + 1) % 30}", label="y")
+        pygraph.add_edge(f"n{i}", f"n{(i + 1) % 30}", label="z")
+    return pygraph
+
+
+def _edges(pygraph: nx.MultiDiGraph):
+    return sorted((u, v, data["label"]) for u, v, data in pygraph.edges(data=True))
+
+
+def test_adjacency_sums_parallel_edges():
+    pygraph = _graph()
+    adjacency = CompactGraph.from_networkx(pygraph).adjacency()
+    assert adjacency.nnz == 60
+    assert adjacency.sum() == pygraph.number_of_edges()
+    assert adjacency[0, 1] == 2
+
+
+def test_adjacency_leaves_graph_unchanged():
+    pygraph = _graph()
+    graph = CompactGraph.from_networkx(pygraph)
+    seeds = np.array([graph.position["n0"]])
+    nodes_before, edges_before = k_hop(graph, seeds, depth=2)
+
+    graph.adjacency()
+
+    assert _edges(graph.to_networkx()) == _edges(pygraph)
+    nodes_after, edges_after = k_hop(graph, seeds, depth=2)
+    assert np.array_equal(nodes_before, nodes_after)
+    assert np.array_equal(edges_before, edges_after)
+
+
+def test_graph_built_once_per_annotation_version(monkeypatch):
+    builds = []
+
+    def build_networkx_graph(combined_df, disease_compound):
+        builds.append(combined_df)
+        return _graph()
+
+    monkeypatch.setattr(compact_graph, "generator", SimpleNamespace(build_networkx_graph=build_networkx_graph))
+    monkeypatch.setattr(graph_service, "_graph_cache", graph_service.OrderedDict())
+    annotation = SimpleNamespace(
+        identifier_set_id=1, id=1, combined_df={0: {"identifier": "A"}}, opentargets_df=None
+    )
+
+    first, error = GraphService.get_compact_graph(annotation, None)
+    second, _ = GraphService.get_compact_graph(annotation, None)
+
+    assert error is None
+    assert first is second
+    assert len(builds) == 1
+    assert _edges(first.to_networkx()) == _edges(_graph())
+
+
+def test_source_counts_match_biograph():
+    pygraph = _graph()
+    graph = CompactGraph.from_networkx(pygraph)
+    for _, _, data in pygraph.edges(data=True):
+        data.setdefault("labels", data["label"])
+        data.setdefault("datasource", "Unknown")
+
+    nodes = _source_counts(
+        np.asarray(graph.node_type_names, dtype=object)[graph.node_type],
+        np.asarray(graph.node_source_names, dtype=object)[graph.node_source],
+        "node",
+    )
+    edges = _source_counts(np.asarray(graph.edge_type_names, dtype=object)[graph.edge_type], _edge_sources(graph), "edge")
+
+    biograph = BioGraph(graph=pygraph)
+    pd.testing.assert_frame_equal(nodes, biograph.count_nodes_by_data_source())
+    expected = biograph.count_edge_by_data_source().sort_values(["edge_type", "edge_source"]).reset_index(drop=True)
+    pd.testing.assert_frame_equal(edges, expected)
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+import pyBiodatafuse.constants as Cons
+from pyBiodatafuse.utils import collapse_data_sources, get_identifier_of_interest
+
+from app.services import reference_data
+
+
+@pytest.fixture
+def mitocarta(tmp_path, monkeypatch):
+    """A processed MitoCarta table (as process_mitocarta returns it), stored as mitocarta_human."""
+    df = pd.DataFrame({
+        Cons.TARGET_COL: ["ENSG01", "ENSG02", "ENSG02", "ENSG03"],
+        **{column: [f"{column}_{i}" for i in range(4)] for column in Cons.MITOCART_OUTPUT},
+    })
+    df.loc[3, "hpa_location"] = np.nan
+    reference_data.write_table(df, Cons.TARGET_COL, {"source": "test"}, tmp_path / "mitocarta_human")
+    monkeypatch.setattr(reference_data, "REFERENCE_DATA_DIR", tmp_path)
+    monkeypatch.setattr(reference_data, "_tables", {})
+    return df
+
+
+def _bridgedb(targets):
+    return pd.DataFrame({
+        Cons.IDENTIFIER_COL: [f"GENE{i}" for i in range(len(targets))],
+        Cons.IDENTIFIER_SOURCE_COL: "HGNC",
+        Cons.TARGET_COL: targets,
+        Cons.TARGET_SOURCE_COL: Cons.ENSEMBL,
+    })
+
+
+def _upstream(bridgedb_df, mitocarta_df):
+    # What mitocarta.get_gene_mito_pathways does once the dataset is downloaded and processed
+    return collapse_data_sources(
+        data_df=get_identifier_of_interest(bridgedb_df, Cons.MITOCARTA_GENE_INPUT_ID),
+        source_namespace=Cons.MITOCARTA_GENE_INPUT_ID,
+        target_df=mitocarta_df,
+        common_cols=[Cons.TARGET_COL],
+        target_specific_cols=Cons.MITOCART_OUTPUT,
+        col_name=Cons.MITOCART_PATHWAY_COL,
+    )
+
+
+@pytest.mark.parametrize("targets", [["ENSG02", "ENSG09", "ENSG03"], ["ENSG08", "ENSG09"]])
+def test_mito_pathways_match_upstream(mitocarta, targets):
+    bridgedb_df = _bridgedb(targets)
+    obtained, metadata = reference_data.get_gene_mito_pathways(bridgedb_df)
+    pd.testing.assert_frame_equal(obtained, _upstream(bridgedb_df, mitocarta))
+    assert metadata == {"source": "test"}
@@ -0,0 +1,115 @@
+import json
+
+import pytest
+from rdflib import Graph, Literal, Namespace, RDF, RDFS
+
+from app.services import sparql_service, triple_store
+
+EX = Namespace("http://example.org/")
+
+QUERY = """
+PREFIX ex: <http://example.org/>
+PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+SELECT ?gene ?label ?pathway ?name WHERE {
+    ?gene a ex:Gene ;
+          rdfs:label ?label ;
+          ex:inPathway ?pathway .
+    ?pathway rdfs:label ?name .
+    OPTIONAL { ?gene ex:score ?score }
+    FILTER (!BOUND(?score) || ?score > 10)
+}
+"""
+
+
+def _graph(genes: int = 60) -> Graph:
+    graph = Graph()
+    graph.bind("ex", EX)
+    for i in range(genes):
+        gene = EX[f"gene{i}"]
+        graph.add((gene, RDF.type, EX.Gene))
+        graph.add((gene, RDFS.label, Literal(f"GENE{i}")))
+        graph.add((gene, EX.inPathway, EX[f"pathway{i % 4}"]))
+        if i % 3:
+            graph.add((gene, EX.score, Literal(i)))
+    for j in range(4):
+        graph.add((EX[f"pathway{j}"], RDFS.label, Literal(f"Pathway {j}", lang="en")))
+    return graph
+
+
+@pytest.fixture
+def store_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(sparql_service, "_graphs", sparql_service.OrderedDict())
+    monkeypatch.setattr(sparql_service, "_queries", sparql_service.OrderedDict())
+    path = tmp_path / triple_store.STORE_FILENAME
+    triple_store.save_graph(_graph(), path)
+    return path
+
+
+def _select(store_file, query, **kwargs) -> dict:
+    _, body = sparql_service.run_query(store_file, query, **kwargs)
+    return json.loads(b"".join(body))
+
+
+def _rows(bindings):
+    return sorted(tuple(sorted((name, value["value"]) for name, value in row.items())) for row in bindings)
+
+
+def test_select_matches_rdflib(store_file, monkeypatch):
+    expected = [
+        {str(name): {"value": str(term)} for name, term in row.asdict().items()} for row in _graph().query(QUERY)
+    ]
+    joins = []
+    join = triple_store.SQLiteTripleStore.join
+
+    def spy(self, patterns):
+        joins.append(patterns)
+        return join(self, patterns)
+
+    def no_scans(self, *args, **kwargs):
+        raise AssertionError("basic graph patterns must be evaluated as SQL joins")
+
+    monkeypatch.setattr(triple_store.SQLiteTripleStore, "join", spy)
+    monkeypatch.setattr(triple_store.SQLiteTripleStore, "triples", no_scans)
+
+    result = _select(store_file, QUERY)
+
+    # The 4-pattern group once, the OPTIONAL group per solution of it
+    assert len(joins[0]) == 4
+
+    assert "truncated" not in result
+    assert len(result["results"]["bindings"]) == len(expected) == 53
+    assert _rows(result["results"]["bindings"]) == _rows(expected)
+
+
+def test_blank_nodes_in_query_are_variables(store_file):
+    query = "PREFIX ex: <http://example.org/> SELECT ?gene WHERE { ?gene ex:inPathway _:p . _:p a ex:Gene }"
+    assert _select(store_file, query)["results"]["bindings"] == []
+
+    query = "PREFIX ex: <http://example.org/> SELECT ?gene WHERE { ?gene ex:inPathway _:p . _:p ?x \"Pathway 0\"@en }"
+    assert len(_select(store_file, query)["results"]["bindings"]) == 15
+
+
+def test_results_truncated_at_max_rows(store_file):
+    result = _select(store_file, QUERY, max_rows=5)
+
+    assert len(result["results"]["bindings"]) == 5
+    assert result["truncated"] is True
+
+
+def test_timeout_before_first_rows(store_file):
+    with pytest.raises(triple_store.QueryTimeout):
+        sparql_service.run_query(store_file, QUERY, timeout=1e-9)
+
+
+def test_timeout_while_streaming_truncates(store_file, monkeypatch):
+    monkeypatch.setattr(sparql_service, "STREAM_BATCH_ROWS", 10)
+    monkeypatch.setattr(triple_store, "FETCH_ROWS", 10)
+    _, body = sparql_service.run_query(store_file, QUERY)
+    first = next(body)
+
+    # The budget runs out once the first batch was sent
+    monkeypatch.setattr(triple_store, "_expired", lambda: True)
+    result = json.loads(first + b"".join(body))
+
+    assert result["truncated"] is True
+    assert 10 <= len(result["results"]["bindings"]) < 53
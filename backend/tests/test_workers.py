@@ -0,0 +1,22 @@
+import asyncio
+
+from app.services.workers import run_once
+
+
+def test_cancelled_waiter_does_not_cancel_shared_run():
+    runs = []
+
+    async def build():
+        runs.append(1)
+        await asyncio.sleep(0.1)
+        return "artifact"
+
+    async def main():
+        first = asyncio.ensure_future(run_once("artifact", build))
+        second = asyncio.ensure_future(run_once("artifact", build))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        return await second, first.cancelled()
+
+    assert asyncio.run(main()) == ("artifact", True)
+    assert len(runs) == 1
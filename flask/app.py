@@ -2,6 +2,7 @@ from flask import Flask, render_template, request, session, redirect, url_for, j
 from components.graph_creation.id_mapper import bridgedb_xref
 from components.graph_creation.id_input import process_identifiers
 from components.graph_creation.id_annotator import process_selected_sources
+from components import session_store
 import pandas as pd
 
 app = Flask(__name__)
@@ -22,7 +23,7 @@ def gc_id_input():
         file_upload = request.files.get("file_upload")
         ids_df, warnings = process_identifiers(file_upload, text_input)
         if ids_df:
-            session["ids_df"] = ids_df
+            session_store.save_frame("ids_df", pd.DataFrame(ids_df))
             ids_df = pd.DataFrame(ids_df)
             no_input_ids = len(ids_df["identifier"].unique())
             session["no_input_ids"] = no_input_ids
@@ -42,22 +43,25 @@ def gc_id_input():
 
 @app.route("/graph_creation/gc_id_mapper/", methods=["GET", "POST"])
 def gc_id_mapper():
-    ids_df = pd.DataFrame(session.get("ids_df"))
+    ids_df = session_store.load_frame("ids_df")
     id_type = session.get("id_type")
-    bridgedb_df, bridgedb_metadata = bridgedb_xref(
-        identifiers=ids_df,
-        input_species="Human",
-        input_datasource=id_type
+    # Mapped once per identifier list and type, refreshes and later steps reuse the stored result
+    bridgedb_df, bridgedb_metadata = session_store.run_stage(
+        "bridgedb_df",
+        session_store.fingerprint(ids_df, id_type, "Human"),
+        lambda: bridgedb_xref(
+            identifiers=ids_df.copy(),
+            input_species="Human",
+            input_datasource=id_type
+        ),
     )
-    session["bridgedb_df"] = bridgedb_df.to_dict("records")
-    session["bridgedb_metadata"] = bridgedb_metadata
 
     if request.method == "POST":
         return redirect(url_for("gc_datasource"))
 
     return render_template(
         "gc_id_mapper.html",
-        ids_df=session["ids_df"],
+        ids_df=session_store.load_frame("ids_df").to_dict("records"),
         id_type=session["id_type"],
         no_input_ids=session["no_input_ids"],
         bridgedb_df_empty = bridgedb_df.empty)
@@ -82,10 +86,12 @@ def gc_datasource():
 def gc_annotator():
     datasource = session["datasource"]
     api_key = session["api_key"] if "api_key" in session else ""
-    bridgedb_df = pd.DataFrame(session["bridgedb_df"])
-    combined_data, combined_metadata = process_selected_sources(bridgedb_df, datasource, api_key)
-    session["combined_data"] = combined_data.to_dict("records")
-    session["combined_metadata"] = combined_metadata
+    bridgedb_df = session_store.load_frame("bridgedb_df")
+    combined_data, combined_metadata = session_store.run_stage(
+        "combined_data",
+        session_store.fingerprint(session_store.load_value("bridgedb_df_fingerprint"), sorted(datasource), api_key),
+        lambda: process_selected_sources(bridgedb_df, datasource, api_key),
+    )
 
     if request.method == "POST":
         return redirect(url_for("gc_graph_generator"))
@@ -93,14 +99,13 @@ def gc_annotator():
         return render_template(
             "gc_annotator.html",
             datasource = datasource,
-            combined_data = session["combined_data"],
+            combined_data = combined_data.to_dict("records"),
             combined_metadata = combined_metadata 
             )
 
 @app.route("/graph_creation/get_combined_data/")
 def get_combined_data():
-    combined_data = session.get("combined_data")
-    combined_data = pd.DataFrame(combined_data)
+    combined_data = session_store.load_frame("combined_data")
     temp_file_path = "temp_combined_data.tsv"
     combined_data.to_csv(temp_file_path, sep="\t", index=False)
     
@@ -108,13 +113,12 @@ def get_combined_data():
 
 @app.route("/graph_creation/get_metadata/")
 def get_metadata():
-    combined_metadata = session.get("combined_metadata")
+    combined_metadata = session_store.load_value("combined_data_metadata", {})
     return combined_metadata
 
 @app.route("/graph_creation/gc_graph_generator/", methods=["GET", "POST"])
 def gc_graph_generator():
-    combined_data = session["combined_data"]
-    combined_data = pd.DataFrame(combined_data)
+    combined_data = session_store.load_frame("combined_data")
 
     if request.method == "POST":
         return redirect(url_for("ga_graph_statistics.html"))
@@ -127,7 +131,7 @@ def graph_analysis():
 
 @app.route("/clear_session/", methods=["POST"])
 def clear_session():
-    session.clear()
+    session_store.clear()
     return jsonify({"success": True})
 
 if __name__ == "__main__":
@@ -0,0 +1,88 @@
+"""
+Vectorized xrefsBatch parser against the previous per-line loop.
+
+Generates a synthetic BridgeDb response (N identifiers with M xrefs each), parses it with both
+implementations, checks that they produce the same rows and prints the timings.
+
+Usage, from the flask directory:
+    python -m benchmarks.bridgedb_parser_benchmark [--identifiers 50000] [--xrefs 100]
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from components.graph_creation.id_mapper import parse_xrefs_batch, read_resource_files
+
+
+def loop_parser(out: str, data_sources: pd.DataFrame) -> pd.DataFrame:
+    """The parser bridgedb_xref used before, kept for comparison."""
+    lines = out.split("\n")
+    parsed_results = []
+
+    for line in lines:
+        if line:
+            parts = line.split("\t")
+            identifier = parts[0]
+            identifier_source = parts[1]
+            targets = parts[2].split(",")
+
+        for target in targets:
+            target_parts = target.split(":")
+            target_source = target_parts[0]
+            target_id = ":".join(target_parts[1:])
+
+            parsed_results.append([identifier, identifier_source, target_id, target_source])
+
+    bridgedb = pd.DataFrame(
+        parsed_results,
+        columns=["identifier", "identifier.source", "target", "target.source"],
+    )
+    bridgedb["target.source"] = bridgedb["target.source"].map(
+        data_sources.set_index("systemCode")["source"]
+    )
+    return bridgedb
+
+
+def synthetic_response(identifiers: int, xrefs: int, data_sources: pd.DataFrame, seed: int = 42) -> str:
+    rng = np.random.default_rng(seed)
+    codes = data_sources["systemCode"].tolist()
+    lines = []
+    for i in range(identifiers):
+        picked = rng.integers(0, len(codes), xrefs)
+        # Some ids contain ':' themselves (e.g. HGNC:1100), the parser must keep them whole
+        targets = ",".join(f"{codes[c]}:{'HGNC:' if c % 7 == 0 else ''}{i}_{j}" for j, c in enumerate(picked))
+        lines.append(f"GENE{i}\tH\t{targets}")
+    return "\n".join(lines) + "\n"
+
+
+def run(identifiers: int, xrefs: int):
+    data_sources = read_resource_files()
+    response = synthetic_response(identifiers, xrefs, data_sources)
+
+    start = time.perf_counter()
+    expected = loop_parser(response, data_sources)
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    parsed = parse_xrefs_batch(response, data_sources)
+    vectorized_time = time.perf_counter() - start
+
+    # The loop re-appends the last line's targets for the trailing blank line, drop_duplicates removed those
+    expected = expected.drop_duplicates().reset_index(drop=True)
+    same = expected.equals(parsed.astype(object).drop_duplicates().reset_index(drop=True).astype(expected.dtypes))
+
+    mb = 1024 * 1024
+    print(f"--- {identifiers:,} identifiers x {xrefs} xrefs = {len(parsed):,} rows, {len(response) / mb:.0f} MB ---")
+    print(f"loop        {loop_time:8.2f} s   {expected.memory_usage(deep=True).sum() / mb:8.1f} MB")
+    print(f"vectorized  {vectorized_time:8.2f} s   {parsed.memory_usage(deep=True).sum() / mb:8.1f} MB")
+    print(f"speed-up    {loop_time / vectorized_time:8.1f}x   identical rows: {same}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--identifiers", type=int, default=50_000)
+    parser.add_argument("--xrefs", type=int, default=100)
+    args = parser.parse_args()
+    run(args.identifiers, args.xrefs)
@@ -1,7 +1,10 @@
 import pandas as pd
 from collections import defaultdict
 from pyBiodatafuse.annotators import wikipathways, disgenet, opentargets, stringdb
-from pyBiodatafuse.utils import combine_sources
+from .merge_engine import merge_sources
+from .metadata_cache import cache_annotator_versions
+
+cache_annotator_versions()
 
 
 def process_selected_sources(
@@ -13,7 +16,7 @@ def process_selected_sources(
     @param selected_sources_list: list of selected databases
     """
     # Initialize variables
-    combined_data = pd.DataFrame()
+    source_frames = []
     combined_metadata = defaultdict(lambda: defaultdict(str))
     # Dictionary to map the datasource names to their corresponding functions
     data_source_functions = {
@@ -43,6 +46,9 @@ def process_selected_sources(
             if tmp_data.empty:
                 warnings.append(f"No annotation available for {source}")
             if not tmp_data.empty:
-                combined_data = combine_sources(bridgedb_df, [combined_data, tmp_data])
+                source_frames.append(tmp_data)
+
+    # All sources are merged at once, re-merging the growing table per source was quadratic
+    combined_data = merge_sources(bridgedb_df, source_frames) if source_frames else pd.DataFrame()
 
     return combined_data, combined_metadata
@@ -8,6 +8,10 @@ from typing import List, Optional, Tuple
 import pandas as pd
 import requests
 
+from .metadata_cache import ttl_cache
+
+
+@ttl_cache
 def read_resource_files() -> pd.DataFrame:
     """Read the datasource file.
 
@@ -19,6 +23,7 @@ def read_resource_files() -> pd.DataFrame:
     return identifier_options
 
 
+@ttl_cache
 def get_version_webservice_bridgedb() -> dict:
     """Get version of BridgeDb web service.
 
@@ -48,6 +53,7 @@ def get_version_webservice_bridgedb() -> dict:
     return bridgedb_version
 
 
+@ttl_cache
 def get_version_datasource_bridgedb(input_species: Optional[str] = None) -> List[str]:
     """Get version of BridgeDb datasource.
 
@@ -73,6 +79,45 @@ def get_version_datasource_bridgedb(input_species: Optional[str] = None) -> List
     return datasource_version
 
 
+def parse_xrefs_batch(response_text: str, data_sources: pd.DataFrame) -> pd.DataFrame:
+    """Parse a BridgeDb xrefsBatch response into one row per (identifier, xref).
+
+    Each response line is ``identifier<TAB>system code<TAB>code:id,code:id,...``. The lines are
+    split with pandas string methods, exploded to one row per target and the target codes mapped
+    to source names once per distinct code, through a categorical that does not leave the parser.
+    Blank lines are skipped (they used to repeat the previous line's targets).
+
+    :param response_text: raw text returned by the xrefsBatch endpoint
+    :param data_sources: the datasource table, used to turn target system codes into source names
+    :returns: a DataFrame with identifier, identifier.source, target and target.source columns
+    """
+    columns = ["identifier", "identifier.source", "target", "target.source"]
+    lines = pd.Series(response_text.splitlines(), dtype=object)
+    lines = lines[lines != ""]
+    if lines.empty:
+        return pd.DataFrame(columns=columns)
+
+    parts = lines.str.split("\t", n=2, expand=True).reindex(columns=range(3)).fillna("")
+    xrefs = parts[2].str.split(",").explode()
+    # Ids may contain ':' themselves (e.g. HGNC:1100), only the first one separates the code.
+    # expand=True would build the frame row by row, from the tuples it is several times faster
+    code_id = pd.DataFrame(xrefs.str.partition(":", expand=False).tolist(), index=xrefs.index)
+    source_names = data_sources.set_index("systemCode")["source"].to_dict()
+    # Unknown codes (e.g. N/A) map to NaN
+    target_sources = code_id[0].astype("category").map(source_names).astype(object)
+
+    bridgedb = pd.DataFrame(
+        {
+            "identifier": parts.loc[xrefs.index, 0].to_numpy(),
+            "identifier.source": parts.loc[xrefs.index, 1].to_numpy(),
+            "target": code_id[2].to_numpy(),
+            "target.source": target_sources.to_numpy(),
+        },
+        columns=columns,
+    )
+    return bridgedb
+
+
 def bridgedb_xref(
     identifiers: pd.DataFrame,
     input_species: Optional[str] = None,
@@ -135,38 +180,11 @@ def bridgedb_xref(
 
     # Extracting the content in the raw text format
     out = s.content.decode()
-    lines = out.split("\n")
 
     # Record the end time
     end_time = datetime.datetime.now()
 
-    # Processing each line and splitting values
-    parsed_results = []
-
-    for line in lines:
-        if line:
-            parts = line.split("\t")
-            identifier = parts[0]
-            identifier_source = parts[1]
-            targets = parts[2].split(",")
-
-        for target in targets:
-            target_parts = target.split(":")
-            target_source = target_parts[0]
-            target_id = ":".join(target_parts[1:])
-
-            parsed_results.append([identifier, identifier_source, target_id, target_source])
-
-    # Create a DataFrame
-    bridgedb = pd.DataFrame(
-        parsed_results,
-        columns=["identifier", "identifier.source", "target", "target.source"],
-    )
-
-    # Replace 'target.source' values with complete source names from 'data_sources'
-    bridgedb["target.source"] = bridgedb["target.source"].map(
-        data_sources.set_index("systemCode")["source"]
-    )
+    bridgedb = parse_xrefs_batch(out, data_sources)
 
     # Subset based on the output_datasource
     if not output_datasource == "All":
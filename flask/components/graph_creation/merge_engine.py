@@ -0,0 +1,162 @@
+"""
+Single-pass merge of per-source annotation frames onto the BridgeDb mapping.
+
+`pyBiodatafuse.utils.combine_sources` outer-merges the frames one after another, copying the
+growing table once per source. Here every frame is indexed by identifier once, the size of the
+result is computed from the per-identifier row counts before anything is materialized, and each
+frame's rows are then gathered into the result in one pass. The output is the same table
+`combine_sources(bridgedb_df, df_list)` returns.
+"""
+import logging
+import os
+from typing import Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+from pandas.api.extensions import take
+import pyBiodatafuse.constants as Cons
+
+logger = logging.getLogger(__name__)
+
+# Refuse merges larger than this many rows (0 = no limit), see merged_row_count
+MERGE_MAX_ROWS = int(os.getenv("MERGE_MAX_ROWS", "0"))
+
+# Columns combine_sources drops from every annotation frame before merging
+_MAPPING_COLUMNS = [Cons.TARGET_SOURCE_COL, Cons.IDENTIFIER_SOURCE_COL, Cons.TARGET_COL]
+
+
+def _base_frame(bridgedb_df: pd.DataFrame) -> pd.DataFrame:
+    base = bridgedb_df[
+        (bridgedb_df[Cons.TARGET_SOURCE_COL] == Cons.ENSEMBL)
+        | (bridgedb_df[Cons.TARGET_SOURCE_COL] == Cons.PUBCHEM_COMPOUND)
+    ]
+    if base.empty:  # Failed databases: KEGG
+        logger.warning(
+            f"Target source column does not contain any of the following: {Cons.ENSEMBL} or {Cons.PUBCHEM_COMPOUND}"
+        )
+        base = bridgedb_df
+    return base
+
+
+def _payload(df: pd.DataFrame) -> pd.DataFrame:
+    return df.drop(
+        columns=_MAPPING_COLUMNS + [col for col in df.columns if col.endswith("_dea")],
+        errors="ignore",
+    )
+
+
+class _KeyIndex:
+    """Rows of every table grouped by identifier, identifiers numbered once across all tables."""
+
+    def __init__(self, tables: List[pd.DataFrame]):
+        keys = [table[Cons.IDENTIFIER_COL].to_numpy(dtype=object) for table in tables]
+        codes, self.keys = pd.factorize(np.concatenate(keys), use_na_sentinel=False)
+        n_keys = len(self.keys)
+
+        self.counts, self.starts, self.orders = [], [], []
+        offset = 0
+        for table_keys in keys:
+            table_codes = codes[offset:offset + len(table_keys)]
+            offset += len(table_keys)
+            counts = np.bincount(table_codes, minlength=n_keys)
+            starts = np.zeros(n_keys, dtype=np.int64)
+            np.cumsum(counts[:-1], out=starts[1:])
+            self.counts.append(counts)
+            self.starts.append(starts)
+            # Rows of one identifier are contiguous in `order` and keep their original order
+            self.orders.append(np.argsort(table_codes, kind="stable"))
+
+        # An outer join keeps identifiers missing from a table once, with empty columns
+        self.radix = [np.maximum(counts, 1) for counts in self.counts]
+        self.sizes = np.prod(self.radix, axis=0)
+
+    def row_count(self) -> int:
+        return int(self.sizes.sum())
+
+    def row_keys(self) -> np.ndarray:
+        """Identifier code of every result row.
+
+        Identifiers come in order of first appearance across the tables, the order chained
+        pd.merge(how="outer") calls produce.
+        """
+        return np.repeat(np.arange(len(self.sizes)), self.sizes)
+
+    def gather(self, row_keys: np.ndarray) -> Iterator[np.ndarray]:
+        """Per table, the row each result row takes from it (-1 where the table has none).
+
+        A key's block of result rows is the cartesian product of the tables' rows for that key,
+        the last table varying fastest (like chained merges). Tables are yielded one at a time,
+        so only one row array is alive besides the result columns.
+        """
+        first_rows = np.cumsum(self.sizes) - self.sizes
+        local = np.arange(len(row_keys), dtype=np.int64) - first_rows[row_keys]
+        remaining = self.sizes.copy()
+        for counts, starts, order, radix in zip(self.counts, self.starts, self.orders, self.radix):
+            remaining //= radix
+            block = remaining[row_keys]
+            position = local // block
+            local -= position * block
+            if len(order) == 0:
+                yield np.full(len(row_keys), -1, dtype=np.int64)
+                continue
+            picked = order[np.minimum(starts[row_keys] + position, len(order) - 1)]
+            yield np.where(counts[row_keys] > 0, picked, -1)
+
+
+def _tables(bridgedb_df: pd.DataFrame, df_list: List[pd.DataFrame]) -> List[pd.DataFrame]:
+    return [_base_frame(bridgedb_df)] + [_payload(df) for df in df_list if not df.empty]
+
+
+def merged_row_count(bridgedb_df: pd.DataFrame, df_list: List[pd.DataFrame]) -> int:
+    """Number of rows `merge_sources` will return, computed from the identifier counts only."""
+    tables = _tables(bridgedb_df, df_list)
+    if len(tables) == 1:
+        return len(tables[0])
+    return _KeyIndex(tables).row_count()
+
+
+def merge_sources(
+    bridgedb_df: pd.DataFrame, df_list: List[pd.DataFrame], max_rows: Optional[int] = None
+) -> pd.DataFrame:
+    """
+    Combine the annotation frames of several sources with the BridgeDb output, as
+    `combine_sources` does, in a single pass over each frame.
+
+    :param bridgedb_df: BridgeDb output.
+    :param df_list: per-source annotation frames.
+    :param max_rows: raise ValueError instead of building a result larger than this (default MERGE_MAX_ROWS).
+    """
+    tables = _tables(bridgedb_df, df_list)
+    if len(tables) == 1:
+        base = tables[0]
+        return base.loc[:, ~base.columns.duplicated()]
+
+    index = _KeyIndex(tables)
+    total = index.row_count()
+    max_rows = MERGE_MAX_ROWS if max_rows is None else max_rows
+    if max_rows and total > max_rows:
+        raise ValueError(f"Combining {len(tables) - 1} sources would produce {total:,} rows (limit {max_rows:,})")
+
+    row_keys = index.row_keys()
+    keys = pd.Series(index.keys, dtype=tables[0][Cons.IDENTIFIER_COL].dtype).take(row_keys).to_numpy()
+
+    columns, names = [], []
+    for t, (table, rows) in enumerate(zip(tables, index.gather(row_keys))):
+        table_names = [name for name in table.columns if t == 0 or name != Cons.IDENTIFIER_COL]
+        if t > 0:
+            # Same names pd.merge gives to columns both sides have
+            overlap = set(table_names) & set(names)
+            names = [f"{name}_x" if name in overlap else name for name in names]
+            table_names = [f"{name}_y" if name in overlap else name for name in table_names]
+        for position, name in enumerate(table.columns):
+            if name == Cons.IDENTIFIER_COL:
+                if t == 0:
+                    columns.append(keys)
+                continue
+            # Columns are gathered one at a time, missing rows become NaN as in an outer merge
+            columns.append(take(table.iloc[:, position].array, rows, allow_fill=True))
+        names += table_names
+
+    merged = pd.DataFrame(dict(enumerate(columns)), copy=False)
+    merged.columns = names
+    return merged.loc[:, ~merged.columns.duplicated()]
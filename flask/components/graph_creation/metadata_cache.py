@@ -0,0 +1,84 @@
+"""
+TTL cache for the annotator version lookups of the Flask app.
+
+The backend has its own (backend/app/services/metadata_cache.py): the two apps are deployed
+separately, the backend image is built from ./backend alone, so neither can import the other.
+"""
+import copy
+import functools
+import logging
+import threading
+import time
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Seconds a cached value is fresh, and how long a stale value may be served while it is refreshed
+METADATA_TTL = 900
+METADATA_MAX_STALE = 86400
+
+# Annotator version functions used by id_annotator.py
+ANNOTATOR_VERSION_FUNCTIONS = {
+    "pyBiodatafuse.annotators.disgenet": "get_version_disgenet",
+    "pyBiodatafuse.annotators.opentargets": "get_version_opentargets",
+    "pyBiodatafuse.annotators.stringdb": "get_version_stringdb",
+    "pyBiodatafuse.annotators.wikipathways": "get_version_wikipathways",
+}
+
+_entries = {}
+_refreshing = set()
+_lock = threading.Lock()
+
+
+def _refresh(key, loader):
+    try:
+        value = loader()
+        with _lock:
+            _entries[key] = (value, time.monotonic())
+    except Exception as e:
+        # Keep serving the stale value, the next call past the TTL retries
+        logger.warning(f"Refreshing cached metadata {key[:2]} failed: {e}")
+    finally:
+        with _lock:
+            _refreshing.discard(key)
+
+
+def ttl_cache(function):
+    """Cache results for METADATA_TTL seconds, then refresh them in the background."""
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        key = (function.__module__, function.__name__, args, tuple(sorted(kwargs.items())))
+        loader = functools.partial(function, *args, **kwargs)
+        with _lock:
+            entry = _entries.get(key)
+
+        if entry is not None and time.monotonic() - entry[1] < METADATA_MAX_STALE:
+            value, loaded_at = entry
+            if time.monotonic() - loaded_at >= METADATA_TTL:
+                with _lock:
+                    start = key not in _refreshing
+                    _refreshing.add(key)
+                if start:
+                    threading.Thread(target=_refresh, args=(key, loader), daemon=True).start()
+        else:
+            value = loader()
+            with _lock:
+                _entries[key] = (value, time.monotonic())
+
+        return value.copy() if isinstance(value, pd.DataFrame) else copy.deepcopy(value)
+
+    wrapper.__ttl_cached__ = True
+    return wrapper
+
+
+def cache_annotator_versions():
+    """Wrap the pyBiodatafuse annotator version lookups with ttl_cache."""
+    import importlib
+
+    for module_name, name in ANNOTATOR_VERSION_FUNCTIONS.items():
+        module = importlib.import_module(module_name)
+        function = getattr(module, name, None)
+        if function is not None and not getattr(function, "__ttl_cached__", False):
+            setattr(module, name, ttl_cache(function))
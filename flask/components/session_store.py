@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Optional, Tuple
+
+import pandas as pd
+from flask import session
+
+# Large per-user data (identifier, mapping and annotation tables) lives on the server,
+# the cookie only carries the session id and small form values
+SESSION_STORE_DIR = Path(os.getenv("FLASK_SESSION_STORE", Path(tempfile.gettempdir()) / "bdf_flask_sessions"))
+SESSION_TTL = int(os.getenv("FLASK_SESSION_TTL", str(6 * 3600)))
+SWEEP_INTERVAL = 600
+
+_SESSION_ID = re.compile(r"^[0-9a-f]{32}$")
+_sweep_lock = threading.Lock()
+_last_sweep = 0.0
+
+
+class SessionStore:
+    """DataFrames (pickled) and JSON values per session id, expired SESSION_TTL seconds after last use."""
+
+    def __init__(self, root: Path = SESSION_STORE_DIR, ttl: int = SESSION_TTL):
+        self.root = root
+        self.ttl = ttl
+
+    def _dir(self, sid: str) -> Path:
+        if not _SESSION_ID.match(sid):
+            raise ValueError("Invalid session id")
+        return self.root / sid
+
+    def _touch(self, directory: Path) -> None:
+        os.utime(directory)
+
+    def _write(self, path: Path, write) -> None:
+        # Write to a temporary file first, so a concurrent reader never sees a partial file
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+        os.close(fd)
+        try:
+            write(tmp)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+        self._touch(path.parent)
+        self.sweep()
+
+    def put_frame(self, sid: str, name: str, df: pd.DataFrame) -> None:
+        self._write(self._dir(sid) / f"{name}.pkl", df.to_pickle)
+
+    def get_frame(self, sid: str, name: str) -> Optional[pd.DataFrame]:
+        path = self._dir(sid) / f"{name}.pkl"
+        if not path.exists():
+            return None
+        self._touch(path.parent)
+        return pd.read_pickle(path)
+
+    def put_value(self, sid: str, name: str, value: Any) -> None:
+        def write(tmp):
+            with open(tmp, "w") as f:
+                json.dump(value, f, default=str)
+        self._write(self._dir(sid) / f"{name}.json", write)
+
+    def get_value(self, sid: str, name: str, default: Any = None) -> Any:
+        path = self._dir(sid) / f"{name}.json"
+        if not path.exists():
+            return default
+        self._touch(path.parent)
+        with open(path) as f:
+            return json.load(f)
+
+    def clear(self, sid: str) -> None:
+        shutil.rmtree(self._dir(sid), ignore_errors=True)
+
+    def sweep(self, force: bool = False) -> None:
+        """Delete sessions unused for longer than the TTL (at most once every SWEEP_INTERVAL seconds)."""
+        global _last_sweep
+        now = time.time()
+        with _sweep_lock:
+            if not force and now - _last_sweep < SWEEP_INTERVAL:
+                return
+            _last_sweep = now
+        if not self.root.exists():
+            return
+        for directory in self.root.iterdir():
+            try:
+                if directory.is_dir() and now - directory.stat().st_mtime > self.ttl:
+                    shutil.rmtree(directory, ignore_errors=True)
+            except FileNotFoundError:
+                continue
+
+
+store = SessionStore()
+
+
+def session_id() -> str:
+    """Id of the current user's server-side session, created on first use."""
+    sid = session.get("sid")
+    if not sid or not _SESSION_ID.match(sid):
+        sid = session["sid"] = uuid.uuid4().hex
+    return sid
+
+
+def save_frame(name: str, df: pd.DataFrame) -> None:
+    store.put_frame(session_id(), name, df)
+
+
+def load_frame(name: str) -> pd.DataFrame:
+    """The stored frame, or an empty one if this session has none (e.g. it expired)."""
+    df = store.get_frame(session_id(), name)
+    return df if df is not None else pd.DataFrame()
+
+
+def save_value(name: str, value: Any) -> None:
+    store.put_value(session_id(), name, value)
+
+
+def load_value(name: str, default: Any = None) -> Any:
+    return store.get_value(session_id(), name, default)
+
+
+def clear() -> None:
+    if session.get("sid"):
+        store.clear(session["sid"])
+    session.clear()
+
+
+def fingerprint(*parts: Any) -> str:
+    """Content hash of stage inputs (DataFrames and JSON-serializable values)."""
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, pd.DataFrame):
+            digest.update(json.dumps([str(c) for c in part.columns]).encode())
+            digest.update(pd.util.hash_pandas_object(part, index=False).to_numpy().tobytes())
+        else:
+            digest.update(json.dumps(part, sort_keys=True, default=str).encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def run_stage(name: str, key: str, compute: Callable[[], Tuple[pd.DataFrame, Any]]) -> Tuple[pd.DataFrame, Any]:
+    """
+    Result of a pipeline stage, computed only when its input fingerprint `key` changed.
+    The frame is stored as `name` and its metadata as `name`_metadata.
+    """
+    if load_value(f"{name}_fingerprint") == key:
+        df = store.get_frame(session_id(), name)
+        if df is not None:
+            return df, load_value(f"{name}_metadata", {})
+
+    # The fingerprint is dropped first and written last, so an interrupted stage is recomputed
+    # instead of served half-stored
+    save_value(f"{name}_fingerprint", None)
+    df, metadata = compute()
+    save_frame(name, df)
+    save_value(f"{name}_metadata", metadata)
+    save_value(f"{name}_fingerprint", key)
+    return df, load_value(f"{name}_metadata", {})
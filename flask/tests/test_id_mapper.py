@@ -0,0 +1,51 @@
+from unittest import mock
+
+import pandas as pd
+import pyBiodatafuse.constants as Cons
+from pyBiodatafuse.utils import collapse_data_sources
+
+from components.graph_creation import id_mapper
+
+RESPONSE = (
+    "ENSG00000012048\tEn\tEn:ENSG00000012048,L:672,S:P38398,H:BRCA1,Hac:HGNC:1100\n"
+    "ENSG00000139618\tEn\tEn:ENSG00000139618,L:675,S:P51587,H:BRCA2,Hac:HGNC:1101\n"
+    "ENSG00000141510\tEn\tEn:ENSG00000141510,L:7157,S:P04637,H:TP53,Hac:HGNC:11998\n"
+    "ENSG00000000000\tEn\tN/A\n"
+)
+
+
+def _bridgedb_xref(identifiers):
+    response = mock.Mock(content=RESPONSE.encode(), url="https://webservice.bridgedb.org/Human/xrefsBatch")
+    with mock.patch.object(id_mapper.requests, "post", return_value=response), \
+            mock.patch.object(id_mapper, "get_version_webservice_bridgedb", return_value={}), \
+            mock.patch.object(id_mapper, "get_version_datasource_bridgedb", return_value=[]):
+        return id_mapper.bridgedb_xref(pd.DataFrame({"identifier": identifiers}), input_datasource="Ensembl")
+
+
+def test_parse_keeps_colons_in_ids_and_skips_blank_lines():
+    parsed = id_mapper.parse_xrefs_batch(RESPONSE + "\n", id_mapper.read_resource_files())
+
+    assert len(parsed) == 16
+    hgnc = parsed[parsed["target.source"] == "HGNC Accession Number"]
+    assert hgnc["target"].tolist() == ["HGNC:1100", "HGNC:1101", "HGNC:11998"]
+    assert parsed.loc[parsed["identifier"] == "ENSG00000000000", "target.source"].isna().all()
+
+
+def test_mapped_output_collapses_one_row_per_identifier():
+    identifiers = ["ENSG00000012048", "ENSG00000139618", "ENSG00000141510"]
+    bridgedb, _ = _bridgedb_xref(identifiers)
+
+    assert (bridgedb.dtypes == object).all()
+
+    target_df = pd.DataFrame({Cons.TARGET_COL: identifiers, "score": [1, 2, 3]})
+    collapsed = collapse_data_sources(
+        data_df=bridgedb,
+        source_namespace=Cons.ENSEMBL,
+        target_df=target_df,
+        common_cols=[Cons.TARGET_COL],
+        target_specific_cols=["score"],
+        col_name="test",
+    )
+
+    assert sorted(collapsed[Cons.IDENTIFIER_COL]) == identifiers
+    assert collapsed["test"].tolist() == [[{"score": 1}], [{"score": 2}], [{"score": 3}]]
@@ -1,12 +1,36 @@
-import type { Core } from 'cytoscape'
+import type { Core, NodeCollection } from 'cytoscape'
 
 export class NetworkAnalysis {
   private cy: Core
+  private serverMetrics: Record<string, Map<string, number>> = {}
 
   constructor(cy: Core) {
     this.cy = cy
   }
 
+  // Fetch only the metric arrays that are displayed; they are computed and cached on the backend
+  public async loadServerMetrics(setId: number | string, metrics: string[]) {
+    const missing = metrics.filter(metric => !this.serverMetrics[metric])
+    if (missing.length === 0) return this.serverMetrics
+
+    const params = new URLSearchParams()
+    missing.forEach(metric => params.append('metrics', metric))
+    const res = await fetch(`/api/visualize&analysis/metrics/${setId}?${params.toString()}`)
+    if (!res.ok) throw new Error(`Failed to load network metrics (${res.status})`)
+    const data = await res.json()
+
+    missing.forEach(metric => {
+      const values = new Map<string, number>()
+      data.node_ids.forEach((id: string, i: number) => values.set(id, data.metrics[metric][i]))
+      this.serverMetrics[metric] = values
+    })
+    return this.serverMetrics
+  }
+
+  public getServerMetric(metric: string, nodeId: string): number | undefined {
+    return this.serverMetrics[metric]?.get(nodeId)
+  }
+
   public getStatistics() {
     const nodes = this.cy.nodes(':visible')
     const edges = this.cy.edges(':visible')
@@ -18,7 +42,7 @@ export class NetworkAnalysis {
       edges: edgeCount,
       density: this.calculateDensity(nodeCount, edgeCount),
       avgDegree: this.calculateAverageDegree(nodeCount, edgeCount),
-      clusters: this.detectClusters().length,
+      clusters: this.countComponents(nodes),
       nodeTypes: this.getNodeTypeCounts(),
       edgeTypes: this.getEdgeTypeCounts()
     }
@@ -35,43 +59,16 @@ export class NetworkAnalysis {
     return (2 * edgeCount) / nodeCount
   }
 
-  public detectClusters(): any[] {
-    // Implement community detection algorithm
-    // This is a simple example using connected components
-    const clusters: Set<any>[] = []
-    const visited = new Set()
-
-    this.cy.nodes().forEach(node => {
-      if (!visited.has(node.id())) {
-        const cluster = this.getBFS(node, visited)
-        if (cluster.size > 0) {
-          clusters.push(cluster)
-        }
-      }
+  // Connected components of the server `component` metric that have a node among `nodes`
+  private countComponents(nodes: NodeCollection): number {
+    const components = this.serverMetrics.component
+    if (!components) return 0
+    const seen = new Set<number>()
+    nodes.forEach(node => {
+      const component = components.get(node.id())
+      if (component !== undefined) seen.add(component)
     })
-
-    return clusters
-  }
-
-  private getBFS(startNode: any, visited: Set<string>): Set<string> {
-    const cluster = new Set<string>()
-    const queue = [startNode]
-    
-    while (queue.length > 0) {
-      const node = queue.shift()
-      if (!visited.has(node.id())) {
-        visited.add(node.id())
-        cluster.add(node.id())
-        
-        node.neighborhood('node').forEach(neighbor => {
-          if (!visited.has(neighbor.id())) {
-            queue.push(neighbor)
-          }
-        })
-      }
-    }
-
-    return cluster
+    return seen.size
   }
 
   public getNodeTypeCounts(): Record<string, number> {
@@ -100,10 +97,12 @@ export class NetworkAnalysis {
     return dijkstra.pathTo(this.cy.$(`#${target}`))
   }
 
+  // Needs the server `betweenness` metric loaded first
   public findCentralNodes(count = 5) {
-    const centrality = this.cy.nodes().betweennessCentrality()
+    const betweenness = this.serverMetrics.betweenness
+    if (!betweenness) return this.cy.collection()
     return this.cy.nodes()
-      .sort((a, b) => centrality.betweenness(b) - centrality.betweenness(a))
+      .sort((a, b) => (betweenness.get(b.id()) ?? 0) - (betweenness.get(a.id()) ?? 0))
       .slice(0, count)
   }
 
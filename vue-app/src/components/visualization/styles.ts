@@ -119,6 +119,12 @@ export const layouts = {
     padding: 30,
     avoidOverlap: true,
     nodeDimensionsIncludeLabels: true
+  },
+  // Positions precomputed by the backend (elements carry a `position` field)
+  preset: {
+    name: 'preset',
+    fit: true,
+    padding: 30
   }
 }
 